@@ -21,7 +21,9 @@ from src.discount_calculator import DiscountCalculator
 # Importar componentes del agente
 from src.agent import create_agent
 from src.memory import create_short_term_memory, create_long_term_memory, ConversationContext
-from src.utils import create_logger, create_tracker
+from src.utils import create_logger, create_tracker, warm_up_embeddings
+from src.monitoring.tracing import get_tracer, span
+from src.monitoring.metrics import get_observability_metrics
 
 # Configuración inicial
 load_dotenv()
@@ -135,12 +137,17 @@ class IntelligentPasteleriaApp:
         self.conversation_context = ConversationContext()
         self.logger = None
         self.tracker = create_tracker()
+        self.metrics = get_observability_metrics()
         self.initialized = False
     
     def initialize_system(self, api_key: str):
         """Inicializa todos los componentes del sistema"""
         try:
             with st.spinner("🔄 Inicializando agente inteligente..."):
+                # Precargar el modelo de embeddings compartido en segundo plano
+                # (solo la primera sesión del proceso paga la carga)
+                warm_up_embeddings()
+                
                 # Inicializar logger
                 self.logger = create_logger(console_output=False)
                 self.logger.logger.info("=== INICIANDO SISTEMA DE AGENTE INTELIGENTE ===")
@@ -174,7 +181,8 @@ class IntelligentPasteleriaApp:
                     model_name="gpt-4o" if use_github else "gpt-3.5-turbo",
                     temperature=0.3,
                     max_iterations=10,
-                    verbose=False
+                    verbose=False,
+                    metrics=self.metrics
                 )
                 
                 self.initialized = True
@@ -189,18 +197,75 @@ class IntelligentPasteleriaApp:
     
     def process_query(self, query: str, customer_id: str = None):
         """Procesa una consulta usando el agente inteligente"""
+        # Traza de la consulta: cada etapa (memoria, agente, LLM, herramientas) es un span hijo
+        with get_tracer().trace("process_query", customer_id=customer_id or "anonymous") as root:
+            try:
+                # Log de la consulta
+                with span("logger.log_query"):
+                    self.logger.log_query(query, customer_id or "anonymous")
+                
+                # Iniciar tracking
+                self.tracker.start_execution(query)
+                
+                # Obtener contexto de memoria de corto plazo
+                chat_history = self.short_term_memory.get_messages()
+                
+                # Ejecutar agente
+                result = self.agent.execute(query, chat_history)
+                
+                return self._finish_query(query, customer_id, result, root)
+                
+            except Exception as e:
+                root.set_error(e)
+                return self._query_error(e)
+    
+    def process_query_stream(self, query: str, customer_id: str = None):
+        """
+        Procesa una consulta en modo streaming
+        Entrega los eventos del agente a medida que ocurren; el último es {"type": "final", "response": ...}
+        """
+        # El span raíz no se activa en este generador (quedaría activo entre yields): cada tramo
+        # corre con context.run en una copia del contexto donde es el span activo
+        root, context = get_tracer().start_detached("process_query_stream", customer_id=customer_id or "anonymous")
         try:
-            # Log de la consulta
-            self.logger.log_query(query, customer_id or "anonymous")
-            
-            # Iniciar tracking
-            self.tracker.start_execution(query)
+            context.run(self._log_query_start, query, customer_id)
+            chat_history = context.run(self.short_term_memory.get_messages)
+            
+            events = context.run(self.agent.stream, query, chat_history)
+            while True:
+                event = context.run(next, events, None)
+                if event is None:
+                    break
+                if event["type"] == "token":
+                    self.tracker.mark_first_token()
+                elif event["type"] == "final":
+                    result = context.run(self._finish_query, query, customer_id, event["response"], root)
+                    if result.get("time_to_first_token") is not None:
+                        root.set_attribute("time_to_first_token", result["time_to_first_token"])
+                        self.logger.log_metrics({"time_to_first_token": result["time_to_first_token"]})
+                        self.metrics.record_time_to_first_token(result["time_to_first_token"])
+                    yield {"type": "final", "response": result}
+                    return
+                yield event
             
-            # Obtener contexto de memoria de corto plazo
-            chat_history = self.short_term_memory.get_messages()
-            
-            # Ejecutar agente
-            result = self.agent.execute(query, chat_history)
+        except Exception as e:
+            root.set_error(e)
+            yield {"type": "final", "response": self._query_error(e)}
+        finally:
+            root.end()
+    
+    def _log_query_start(self, query: str, customer_id: str = None):
+        """Registra la consulta en el log e inicia el tracking de la ejecución"""
+        with span("logger.log_query"):
+            self.logger.log_query(query, customer_id or "anonymous")
+        self.tracker.start_execution(query)
+    
+    def _finish_query(self, query: str, customer_id: str, result: dict, root=None):
+        """Guarda en memoria, cierra el tracking y registra la respuesta"""
+        try:
+            if root is not None and root.trace_id:
+                result["trace_id"] = root.trace_id
+                root.set_attribute("tools_used", list(result.get("tools_used", [])))
             
             # Guardar en memoria
             answer = result.get("answer", "")
@@ -221,30 +286,35 @@ class IntelligentPasteleriaApp:
             )
             
             # Log de respuesta
-            self.logger.log_answer(answer)
-            self.logger.log_execution_trace(result.get("execution_trace", []))
+            with span("logger.log_answer"):
+                self.logger.log_answer(answer)
+                self.logger.log_execution_trace(result.get("execution_trace", []))
             
             return result
             
         except Exception as e:
-            import traceback
-            error_msg = str(e)
-            error_trace = traceback.format_exc()
-            self.logger.log_error(f"{error_msg}\n{error_trace}")
-            self.tracker.finish_execution(result="", error=error_msg)
-            
-            # Mostrar error detallado en desarrollo
-            print("❌ ERROR DETALLADO:")
-            print(error_trace)
-            
-            return {
-                "success": False,
-                "answer": f"❌ **Error técnico detectado:**\n\n```\n{error_msg}\n```\n\n💡 **Detalles**: Revisa la consola para más información.",
-                "execution_trace": [],
-                "tools_used": [],
-                "error": error_msg,
-                "error_trace": error_trace
-            }
+            return self._query_error(e)
+    
+    def _query_error(self, e: Exception):
+        """Registra un error de procesamiento y arma la respuesta para la UI"""
+        import traceback
+        error_msg = str(e)
+        error_trace = traceback.format_exc()
+        self.logger.log_error(f"{error_msg}\n{error_trace}")
+        self.tracker.finish_execution(result="", error=error_msg)
+        
+        # Mostrar error detallado en desarrollo
+        print("❌ ERROR DETALLADO:")
+        print(error_trace)
+        
+        return {
+            "success": False,
+            "answer": f"❌ **Error técnico detectado:**\n\n```\n{error_msg}\n```\n\n💡 **Detalles**: Revisa la consola para más información.",
+            "execution_trace": [],
+            "tools_used": [],
+            "error": error_msg,
+            "error_trace": error_trace
+        }
 
 
 def render_sidebar(app: IntelligentPasteleriaApp):
@@ -394,7 +464,7 @@ def render_tools_used(tools_used):
 
 def render_metrics(result):
     """Renderiza métricas de ejecución"""
-    col1, col2, col3 = st.columns(3)
+    col1, col2, col3, col4 = st.columns(4)
     
     with col1:
         st.metric(
@@ -409,9 +479,21 @@ def render_metrics(result):
         )
     
     with col3:
+        estado = "Éxito" if result.get('success') else "Error"
+        if result.get('cached'):
+            estado += " ⚡ cache"
+        elif result.get('fast_path'):
+            estado += " 🚀 directo"
         st.metric(
             "✅ Estado",
-            "Éxito" if result.get('success') else "Error"
+            estado
+        )
+    
+    with col4:
+        ttft = result.get('time_to_first_token')
+        st.metric(
+            "⚡ Primer token",
+            f"{ttft:.2f}s" if ttft is not None else "-"
         )
 
 
@@ -617,28 +699,35 @@ def main():
             with st.chat_message("user"):
                 st.markdown(query)
             
-            # Procesar con el agente
+            # Procesar con el agente (streaming: pasos y respuesta se muestran a medida que ocurren)
             with st.chat_message("assistant"):
-                with st.status("🤖 Agente pensando...", expanded=True) as status:
-                    st.write("🔄 Analizando consulta...")
-                    time.sleep(0.5)
-                    
-                    st.write("🛠️ Seleccionando herramientas...")
-                    time.sleep(0.5)
-                    
-                    st.write("💭 Razonando y ejecutando...")
-                    
-                    # Ejecutar agente
-                    result = app.process_query(
-                        query,
-                        customer_id=st.session_state.customer_id
-                    )
+                status = st.status("🤖 Agente pensando...", expanded=True)
+                answer_placeholder = st.empty()
+                streamed_answer = ""
+                result = {}
+                
+                for event in app.process_query_stream(query, customer_id=st.session_state.customer_id):
+                    event_type = event["type"]
                     
-                    status.update(label="✅ Respuesta generada", state="complete")
+                    if event_type == "thought":
+                        status.write(f"💭 {event['content']}")
+                    elif event_type == "tool_start":
+                        status.write(f"🛠️ Ejecutando `{event['tool']}`...")
+                    elif event_type == "tool_end":
+                        status.write(f"📋 `{event['tool']}` respondió")
+                    elif event_type == "token":
+                        if not streamed_answer:
+                            status.update(label="✍️ Redactando respuesta...")
+                        streamed_answer += event["content"]
+                        answer_placeholder.markdown(streamed_answer + "▌")
+                    elif event_type == "final":
+                        result = event["response"]
+                
+                status.update(label="✅ Respuesta generada", state="complete", expanded=False)
                 
                 # Mostrar respuesta
                 answer = result.get("answer", "")
-                st.markdown(answer)
+                answer_placeholder.markdown(answer)
                 
                 # Herramientas usadas
                 if result.get("tools_used"):
@@ -0,0 +1,164 @@
+"""
+Benchmark de concurrencia del agente: execute (síncrono) vs aexecute (asíncrono)
+Usa DemoPasteleriaLLM con latencia simulada, sin consumir API
+
+Uso:
+    python benchmark_async.py --latency 0.5 --concurrency 1 5 10 25 50
+"""
+
+import argparse
+import asyncio
+import contextlib
+import io
+import os
+import time
+
+os.environ["USE_DEMO_MODE"] = "true"
+
+from src.data_loader import PasteleriaDataLoader
+from src.discount_calculator import DiscountCalculator
+from src.agent import create_agent
+
+
+CONSULTAS = [
+    "¿Tienen tortas de chocolate?",
+    "Quiero ver productos veganos",
+    "¿Hay stock de la torta de frutas TC002?",
+    "¿Cuánto cuesta la torta TC001 con descuento para 55 años?",
+    "Muéstrame las tortas disponibles"
+]
+
+
+# Consultas que resuelve la ruta rápida (herramientas sin LLM)
+CONSULTAS_RUTA_RAPIDA = [
+    "¿Cuánto cuesta la torta TC001 con descuento para 55 años?",
+    "¿Hay stock de la torta TC002?",
+    "Muéstrame los productos veganos"
+]
+
+
+def crear_agente(latency: float, cache_y_ruta: bool = False):
+    """
+    Agente en modo DEMO
+    Por defecto sin cache ni ruta rápida (cada consulta llega al LLM); con cache_y_ruta se activan ambos
+    """
+    with contextlib.redirect_stdout(io.StringIO()):
+        agente = create_agent(
+            PasteleriaDataLoader(),
+            DiscountCalculator(),
+            "DEMO_MODE",
+            verbose=False,
+            use_response_cache=cache_y_ruta,
+            use_intent_router=cache_y_ruta
+        )
+    agente.llm.latency = latency
+    return agente
+
+
+def medir_sincrono(agente, n: int) -> float:
+    """n consultas secuenciales con execute (un worker bloqueado por consulta)"""
+    start = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        for i in range(n):
+            agente.execute(CONSULTAS[i % len(CONSULTAS)])
+    return time.perf_counter() - start
+
+
+async def medir_asincrono(agente, n: int, timeout: float) -> tuple:
+    """n conversaciones concurrentes con aexecute en un solo event loop"""
+    start = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        respuestas = await asyncio.gather(*[
+            agente.aexecute(CONSULTAS[i % len(CONSULTAS)], timeout=timeout)
+            for i in range(n)
+        ])
+    elapsed = time.perf_counter() - start
+    exitosas = sum(1 for r in respuestas if r["success"])
+    return elapsed, exitosas
+
+
+async def medir_ruta_rapida(agente, n: int) -> tuple:
+    """
+    n consultas concurrentes por cache y ruta rápida, midiendo el mayor retraso del event loop
+    (si esos caminos corrieran en el loop, el retraso crecería con n)
+    """
+    lag_max = 0.0
+    terminado = asyncio.Event()
+
+    async def latido():
+        nonlocal lag_max
+        while not terminado.is_set():
+            antes = time.perf_counter()
+            await asyncio.sleep(0.001)
+            lag_max = max(lag_max, time.perf_counter() - antes - 0.001)
+
+    monitor = asyncio.create_task(latido())
+    start = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        respuestas = await asyncio.gather(*[
+            agente.aexecute(CONSULTAS_RUTA_RAPIDA[i % len(CONSULTAS_RUTA_RAPIDA)])
+            for i in range(n)
+        ])
+    elapsed = time.perf_counter() - start
+    terminado.set()
+    await monitor
+    sin_llm = sum(1 for r in respuestas if r.get("fast_path") or r.get("cached"))
+    return elapsed, sin_llm, lag_max
+
+
+async def medir_cancelacion(agente) -> bool:
+    """Verifica que cancelar la tarea detenga la consulta en curso"""
+    with contextlib.redirect_stdout(io.StringIO()):
+        tarea = asyncio.create_task(agente.aexecute(CONSULTAS[0]))
+        await asyncio.sleep(agente.llm.latency / 2)
+        tarea.cancel()
+        try:
+            await tarea
+        except asyncio.CancelledError:
+            return True
+    return False
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark de concurrencia del agente")
+    parser.add_argument("--latency", type=float, default=0.5, help="Latencia simulada del LLM (s)")
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 5, 10, 25, 50])
+    parser.add_argument("--timeout", type=float, default=30.0, help="Timeout por consulta (s)")
+    args = parser.parse_args()
+
+    agente = crear_agente(args.latency)
+
+    print("=" * 64)
+    print(f"📊 BENCHMARK DE CONCURRENCIA - latencia LLM simulada: {args.latency}s")
+    print("=" * 64)
+    print(f"{'Consultas':>10} | {'Síncrono (s)':>13} | {'Asíncrono (s)':>14} | {'Speedup':>8} | {'OK':>4}")
+    print("-" * 64)
+
+    for n in args.concurrency:
+        t_sync = medir_sincrono(agente, n)
+        t_async, exitosas = asyncio.run(medir_asincrono(agente, n, args.timeout))
+        speedup = t_sync / t_async if t_async else 0
+        print(f"{n:>10} | {t_sync:>13.2f} | {t_async:>14.2f} | {speedup:>7.1f}x | {exitosas:>4}")
+
+    print("-" * 64)
+
+    # Timeout: con un límite menor a la latencia la consulta debe cortarse
+    with contextlib.redirect_stdout(io.StringIO()):
+        respuesta = asyncio.run(agente.aexecute(CONSULTAS[0], timeout=args.latency / 2))
+    print(f"⏱️ Timeout respetado: {'✅' if respuesta.get('timeout') else '❌'}")
+
+    cancelada = asyncio.run(medir_cancelacion(agente))
+    print(f"🛑 Cancelación propagada: {'✅' if cancelada else '❌'}")
+
+    # Cache y ruta rápida: sin LLM, pero corren en hilos para no frenar el event loop
+    agente_rapido = crear_agente(args.latency, cache_y_ruta=True)
+    print("-" * 64)
+    print(f"{'Consultas':>10} | {'Asíncrono (s)':>14} | {'Sin LLM':>8} | {'Lag loop (ms)':>14}")
+    print("-" * 64)
+    for n in args.concurrency:
+        t_async, sin_llm, lag = asyncio.run(medir_ruta_rapida(agente_rapido, n))
+        print(f"{n:>10} | {t_async:>14.3f} | {sin_llm:>8} | {lag * 1000:>14.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,181 @@
+"""
+Benchmark del esquema de documentos de la memoria de largo plazo: legado vs compacto
+Mide tamaño en disco (Chroma + índice sqlite de metadata que LongTermMemory mantiene junto
+al esquema compacto) y latencia de búsqueda + decodificación
+
+Usa embeddings determinísticos de la misma dimensión que MiniLM (384) para aislar el costo
+de almacenamiento del costo del modelo.
+
+Uso:
+    python benchmark_memory_schema.py --conversations 100000
+"""
+
+import argparse
+import json
+import os
+import random
+import shutil
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+from langchain.schema import Document
+from langchain.vectorstores import Chroma
+from langchain_core.embeddings import DeterministicFakeEmbedding
+
+from src.memory.conversation_schema import conversation_timestamp, decode_conversation, encode_conversation
+from src.memory.metadata_store import ConversationMetadataStore
+
+CONSULTAS = [
+    "¿Tienen tortas de chocolate para 20 personas?",
+    "Quiero algo vegano y sin azúcar para un cumpleaños",
+    "¿Cuánto cuesta la torta TC001 con descuento para 55 años?",
+    "Necesito una torta de boda, algo premium",
+    "¿Hay stock de la torta de frutas TC002?"
+]
+
+RESPUESTAS = [
+    "¡Claro! Tenemos la Torta Cuadrada de Chocolate (TC001) a $45.000, ideal para 20 personas. "
+    "Está hecha con bizcocho húmedo de cacao, relleno de ganache y cobertura de chocolate belga.",
+    "Te recomiendo la Torta Vegana de Frutos Rojos y el Brownie sin azúcar. Ambos están disponibles "
+    "y se pueden decorar para cumpleaños sin costo adicional. ¿Quieres que calcule el precio?",
+    "¡He calculado tu descuento! 💰 Precio original: $45.000. Descuento por edad (50%): -$22.500. "
+    "Total a pagar: $22.500. ¿Te gustaría agregar algo más a tu pedido? 🍰",
+]
+
+
+def generar_conversaciones(n: int, semilla: int = 7):
+    rng = random.Random(semilla)
+    inicio = datetime(2024, 1, 1)
+    for i in range(n):
+        respuesta = rng.choice(RESPUESTAS)
+        if rng.random() < 0.1:
+            # Respuestas largas (listados de catálogo)
+            respuesta = "\n".join(rng.choice(RESPUESTAS) for _ in range(8))
+        yield (
+            f"{rng.choice(CONSULTAS)} (#{i})",
+            respuesta,
+            {
+                "customer_id": f"CLI{rng.randint(1, 2000):05d}",
+                "tools_used": rng.sample(["search_products", "calculate_discount", "check_inventory"], k=rng.randint(0, 2)),
+                "execution_time": round(rng.uniform(0.2, 4.0), 3)
+            },
+            inicio + timedelta(seconds=i * 37)
+        )
+
+
+def documento_legado(i, usuario, respuesta, metadata, fecha):
+    """Formato anterior: texto en page_content y repetido en metadata, listas como JSON"""
+    doc_metadata = {
+        "timestamp": fecha.isoformat(),
+        "conversation_id": i,
+        "user_message": usuario,
+        "agent_response": respuesta,
+        "customer_id": metadata["customer_id"],
+        "tools_used": json.dumps(metadata["tools_used"]) if metadata["tools_used"] else "",
+        "execution_time": metadata["execution_time"]
+    }
+    return Document(page_content=f"Usuario: {usuario}\nAsistente: {respuesta}", metadata=doc_metadata)
+
+
+def documento_compacto(i, usuario, respuesta, metadata, fecha):
+    page_content, doc_metadata = encode_conversation(
+        usuario, respuesta, {"conversation_id": i, **metadata}, timestamp=fecha
+    )
+    return Document(page_content=page_content, metadata=doc_metadata)
+
+
+def tamano_directorio(path: str) -> int:
+    return sum(
+        os.path.getsize(os.path.join(raiz, archivo))
+        for raiz, _, archivos in os.walk(path)
+        for archivo in archivos
+    )
+
+
+def medir(nombre, construir, n, embeddings, lote, consultas, con_indice=False):
+    directorio = tempfile.mkdtemp(prefix=f"bench_{nombre}_")
+    try:
+        store = Chroma(collection_name="bench", embedding_function=embeddings, persist_directory=directorio)
+        indice = ConversationMetadataStore(os.path.join(directorio, "bench.metadata.sqlite")) if con_indice else None
+
+        def escribir(documentos):
+            ids = store.add_documents(documentos)
+            if indice is not None:
+                indice.add_many(
+                    {
+                        "doc_id": doc_id,
+                        "customer_id": doc.metadata.get("customer_id"),
+                        "timestamp": conversation_timestamp(doc.metadata)
+                    }
+                    for doc_id, doc in zip(ids, documentos)
+                )
+
+        inicio = time.perf_counter()
+        documentos = []
+        for i, (usuario, respuesta, metadata, fecha) in enumerate(generar_conversaciones(n)):
+            documentos.append(construir(i, usuario, respuesta, metadata, fecha))
+            if len(documentos) >= lote:
+                escribir(documentos)
+                documentos = []
+        if documentos:
+            escribir(documentos)
+        escritura = time.perf_counter() - inicio
+        if indice is not None:
+            indice.close()
+
+        latencias = []
+        for j in range(consultas):
+            t = time.perf_counter()
+            resultados = store.similarity_search(
+                CONSULTAS[j % len(CONSULTAS)], k=5, filter={"customer_id": f"CLI{(j % 2000) + 1:05d}"}
+            )
+            for doc in resultados:
+                decode_conversation(doc.page_content, doc.metadata)
+            latencias.append((time.perf_counter() - t) * 1000)
+        latencias.sort()
+
+        indice_path = os.path.join(directorio, "bench.metadata.sqlite")
+        return {
+            "disco_mb": tamano_directorio(directorio) / 1e6,
+            "indice_mb": os.path.getsize(indice_path) / 1e6 if con_indice else 0.0,
+            "escritura_s": escritura,
+            "p50_ms": latencias[len(latencias) // 2],
+            "p95_ms": latencias[int(len(latencias) * 0.95)]
+        }
+    finally:
+        shutil.rmtree(directorio, ignore_errors=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark del esquema de la memoria de largo plazo")
+    parser.add_argument("--conversations", type=int, default=100000)
+    parser.add_argument("--batch-size", type=int, default=1000)
+    parser.add_argument("--queries", type=int, default=200)
+    args = parser.parse_args()
+
+    embeddings = DeterministicFakeEmbedding(size=384)
+
+    print("=" * 86)
+    print(f"📊 ESQUEMA DE MEMORIA DE LARGO PLAZO - {args.conversations} conversaciones")
+    print("=" * 86)
+    print(f"{'Esquema':>10} | {'Disco (MB)':>11} | {'Índice (MB)':>11} | {'Escritura (s)':>13} | "
+          f"{'Búsqueda p50':>13} | {'p95 (ms)':>9}")
+    print("-" * 86)
+
+    resultados = {}
+    for nombre, construir, con_indice in (("legado", documento_legado, False),
+                                          ("compacto", documento_compacto, True)):
+        r = medir(nombre, construir, args.conversations, embeddings, args.batch_size, args.queries, con_indice)
+        resultados[nombre] = r
+        print(f"{nombre:>10} | {r['disco_mb']:>11.1f} | {r['indice_mb']:>11.1f} | {r['escritura_s']:>13.1f} | "
+              f"{r['p50_ms']:>10.2f} ms | {r['p95_ms']:>9.2f}")
+
+    print("-" * 86)
+    print("(Disco incluye el índice sqlite de metadata del esquema compacto)")
+    ahorro = 1 - resultados["compacto"]["disco_mb"] / resultados["legado"]["disco_mb"]
+    print(f"💾 Reducción de disco: {ahorro:.0%}")
+
+
+if __name__ == "__main__":
+    main()
@@ -21,8 +21,9 @@ import socket
 sys.path.insert(0, str(Path(__file__).parent.parent))
 
 from src.monitoring.metrics import ObservabilityMetrics
-from src.monitoring.logs_analyzer import LogsAnalyzer
+from src.monitoring.logs_analyzer import get_logs_analyzer
 from src.monitoring.anomaly_detector import AnomalyDetector, ImprovementRecommender
+from src.monitoring.tracing import load_traces
 from src.security.validators import SecurityValidator
 
 
@@ -73,19 +74,18 @@ def count_total_queries() -> int:
 
 
 def load_metrics():
-    """Carga métricas del sistema"""
+    """Carga métricas del sistema (snapshot + eventos del journal aún no compactados)"""
     metrics_file = Path("./metrics/metrics.json")
-    if metrics_file.exists():
-        with open(metrics_file, 'r') as f:
-            return json.load(f)
+    if metrics_file.exists() or metrics_file.with_suffix(".journal.jsonl").exists():
+        return ObservabilityMetrics.read_current(str(metrics_file))
     return {}
 
 
 def load_analysis_report():
     """Carga reporte de análisis de logs - GENERA EN TIEMPO REAL"""
     try:
-        # Generar reporte en tiempo real desde los logs actuales
-        logs_analyzer = LogsAnalyzer(log_dir="./logs")
+        # Generar reporte en tiempo real desde los logs actuales (solo se parsean las líneas nuevas)
+        logs_analyzer = get_logs_analyzer(log_dir="./logs")
         
         report = {
             'errors_summary': logs_analyzer.get_errors_summary(),
@@ -108,6 +108,34 @@ def load_analysis_report():
         }
 
 
+def render_trace_waterfall(trace: dict):
+    """Waterfall de una traza: una barra por span, desplazada según su inicio"""
+    spans = trace['spans']
+    origin = trace['start_ns']
+    labels = [f"{'  ' * s['depth']}{s['name']} ({i})" for i, s in enumerate(spans)]
+    colors = ['#d62728' if s['status'] == 2 else '#1f77b4' if s['name'].startswith('tool.')
+              else '#ff7f0e' if s['name'] == 'llm' else '#2ca02c' for s in spans]
+    
+    fig = go.Figure(go.Bar(
+        y=labels,
+        x=[s['duration_ms'] for s in spans],
+        base=[(s['start_ns'] - origin) / 1e6 for s in spans],
+        orientation='h',
+        marker_color=colors,
+        text=[f"{s['duration_ms']:.1f} ms" for s in spans],
+        textposition='auto',
+        hovertext=[json.dumps(s['attributes'], ensure_ascii=False) for s in spans]
+    ))
+    fig.update_layout(
+        title=f"{trace['name']} · {trace['duration_ms']:.1f} ms",
+        xaxis_title="Milisegundos desde el inicio",
+        yaxis=dict(autorange="reversed"),
+        height=max(250, 32 * len(spans) + 120),
+        template="plotly_dark"
+    )
+    st.plotly_chart(fig, use_container_width=True)
+
+
 def create_dashboard():
     """Crea dashboard principal de observabilidad"""
     
@@ -248,13 +276,14 @@ def create_dashboard():
     st.markdown("---")
     
     # Tabs principales
-    tab1, tab2, tab3, tab4, tab5, tab6 = st.tabs([
+    tab1, tab2, tab3, tab4, tab5, tab6, tab7 = st.tabs([
         "📈 Métricas",
         "🔧 Análisis de Logs",
         "⚠️ Anomalías",
         "🛡️ Seguridad",
         "💡 Recomendaciones",
-        "📝 Historial de Consultas"
+        "📝 Historial de Consultas",
+        "🧭 Trazas"
     ])
     
     # ============= TAB 1: MÉTRICAS =============
@@ -298,7 +327,7 @@ def create_dashboard():
             )
         
         with col4:
-            error_count = len(metrics.get('errors', []))
+            error_count = metrics.get('error_count', len(metrics.get('errors', [])))
             st.metric(
                 "Errores Registrados",
                 f"{error_count}",
@@ -315,14 +344,34 @@ def create_dashboard():
             if latency_stats:
                 st.write("**Estadísticas de Latencia**")
                 df_latency = pd.DataFrame({
-                    'Métrica': ['Mínima', 'Máxima', 'Promedio'],
+                    'Métrica': ['Mínima', 'Máxima', 'Promedio', 'p50', 'p90', 'p99', 'p99.9'],
                     'Milisegundos': [
                         latency_stats.get('min_ms', 0),
                         latency_stats.get('max_ms', 0),
-                        latency_stats.get('avg_ms', 0)
+                        latency_stats.get('avg_ms', 0),
+                        latency_stats.get('p50_ms', 0),
+                        latency_stats.get('p90_ms', 0),
+                        latency_stats.get('p99_ms', 0),
+                        latency_stats.get('p999_ms', 0)
                     ]
                 })
                 st.dataframe(df_latency, use_container_width=True)
+            
+            # Percentiles por ventana, tipo de consulta y herramienta
+            percentiles = metrics.get('latency_percentiles', {})
+            rows = []
+            for window, view in percentiles.get('overall', {}).get('windows', {}).items():
+                rows.append({'Grupo': f'Global ({window})', **view})
+            for group, prefix in (('by_type', 'Tipo'), ('by_tool', 'Herramienta')):
+                for name, stats in percentiles.get(group, {}).items():
+                    rows.append({'Grupo': f'{prefix}: {name}', **{
+                        k: v for k, v in stats.items() if k != 'windows'
+                    }})
+            if rows:
+                st.write("**Percentiles de Latencia (ms)**")
+                df_percentiles = pd.DataFrame(rows)
+                columns = ['Grupo'] + [c for c in ('p50_ms', 'p90_ms', 'p99_ms', 'p999_ms') if c in df_percentiles]
+                st.dataframe(df_percentiles[columns], use_container_width=True)
         
         with col2:
             resource_stats = metrics.get('resource_stats', {})
@@ -740,6 +789,44 @@ def create_dashboard():
         else:
             st.info("ℹ️ No hay consultas registradas aún. Realiza consultas en el chatbot para ver el historial.")
     
+    # ============= TAB 7: TRAZAS =============
+    with tab7:
+        col_refresh, col_title = st.columns([1, 5])
+        with col_refresh:
+            if st.button("🔄", key="refresh_traces", help="Actualizar trazas"):
+                st.rerun()
+        with col_title:
+            st.subheader("🧭 Trazas por Etapa")
+        
+        traces = load_traces(os.getenv("TRACES_PATH", "./logs/traces.jsonl"), limit=50)
+        if traces:
+            # Tiempo por etapa sumado en todas las trazas cargadas
+            stage_totals = {}
+            for trace in traces:
+                for s in trace['spans']:
+                    if s['depth'] > 0:
+                        stage_totals[s['name']] = stage_totals.get(s['name'], 0) + s['duration_ms']
+            if stage_totals:
+                df_stages = pd.DataFrame(
+                    sorted(stage_totals.items(), key=lambda item: item[1], reverse=True),
+                    columns=['Etapa', 'Milisegundos']
+                )
+                st.plotly_chart(px.bar(
+                    df_stages, x='Milisegundos', y='Etapa', orientation='h',
+                    title=f"Tiempo total por etapa (últimas {len(traces)} trazas)",
+                    template="plotly_dark"
+                ), use_container_width=True)
+            
+            options = {
+                f"{datetime.fromtimestamp(t['start_ns'] / 1e9).strftime('%H:%M:%S')} · "
+                f"{t['name']} · {t['duration_ms']:.0f} ms · {t['trace_id'][:8]}": t
+                for t in traces
+            }
+            selected = st.selectbox("Traza", list(options.keys()))
+            render_trace_waterfall(options[selected])
+        else:
+            st.info("ℹ️ No hay trazas registradas aún. Realiza consultas en el chatbot para verlas aquí.")
+    
     # Footer
     st.markdown("---")
     
@@ -753,7 +840,7 @@ def create_dashboard():
     with col3:
         error_count = 0
         try:
-            logs_analyzer = LogsAnalyzer(log_dir="./logs")
+            logs_analyzer = get_logs_analyzer(log_dir="./logs")
             error_summary = logs_analyzer.get_errors_summary()
             error_count = error_summary.get('total_errors', 0)
         except:
@@ -0,0 +1,49 @@
+"""
+Migra una colección de memoria de largo plazo al esquema compacto de documentos
+Conserva ids y vectores (no recalcula embeddings)
+
+Uso:
+    python migrate_memory_schema.py --persist-directory ./data/chroma_db --dry-run
+    python migrate_memory_schema.py --persist-directory ./data/chroma_db
+"""
+
+import argparse
+import os
+
+from src.memory.long_term import LongTermMemory
+
+
+def tamano_directorio(path: str) -> int:
+    total = 0
+    for raiz, _, archivos in os.walk(path):
+        for archivo in archivos:
+            total += os.path.getsize(os.path.join(raiz, archivo))
+    return total
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Migración de la memoria de largo plazo al esquema compacto")
+    parser.add_argument("--persist-directory", default="./data/chroma_db")
+    parser.add_argument("--collection", default="pasteleria_conversations")
+    parser.add_argument("--batch-size", type=int, default=500)
+    parser.add_argument("--dry-run", action="store_true", help="Solo contar los documentos a migrar")
+    args = parser.parse_args()
+
+    antes = tamano_directorio(args.persist_directory)
+    memoria = LongTermMemory(
+        persist_directory=args.persist_directory,
+        collection_name=args.collection,
+        async_writes=False
+    )
+    resultado = memoria.migrate_to_compact_schema(batch_size=args.batch_size, dry_run=args.dry_run)
+
+    print(f"📄 Documentos: {resultado['total']} | migrados: {resultado['migrated']} "
+          f"| ya compactos: {resultado['already_compact']}")
+    if not args.dry_run and resultado["migrated"]:
+        # sqlite no devuelve espacio al disco sin VACUUM
+        print(f"💾 Tamaño antes: {antes / 1e6:.1f} MB | después: {tamano_directorio(args.persist_directory) / 1e6:.1f} MB"
+              " (ejecutar VACUUM sobre chroma.sqlite3 para recuperar el espacio liberado)")
+
+
+if __name__ == "__main__":
+    main()
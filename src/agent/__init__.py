@@ -7,7 +7,9 @@ from .tools import (
     CalculateDiscountTool,
     CheckInventoryTool,
     CustomerHistoryTool,
-    initialize_tools
+    ToolResultCache,
+    initialize_tools,
+    get_tools_cache_statistics
 )
 
 from .agent_executor import (
@@ -15,6 +17,16 @@ from .agent_executor import (
     create_agent
 )
 
+from .response_cache import ResponseCache
+
+from .intent_router import IntentRouter
+
+from .streaming import AgentEventStreamHandler
+
+from .tracing import TracingCallbackHandler
+
+from .parallel_tools import MultiActionReActParser, ParallelAgentExecutor
+
 from .prompts import (
     AGENT_SYSTEM_PROMPT,
     INTENT_ANALYSIS_PROMPT,
@@ -26,8 +38,16 @@ __all__ = [
     'CalculateDiscountTool', 
     'CheckInventoryTool',
     'CustomerHistoryTool',
+    'ToolResultCache',
     'initialize_tools',
+    'get_tools_cache_statistics',
     'PasteleriaAgentExecutor',
     'create_agent',
+    'ResponseCache',
+    'IntentRouter',
+    'AgentEventStreamHandler',
+    'TracingCallbackHandler',
+    'MultiActionReActParser',
+    'ParallelAgentExecutor',
     'AGENT_SYSTEM_PROMPT'
 ]
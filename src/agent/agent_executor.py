@@ -7,14 +7,27 @@ from langchain.agents import AgentExecutor, create_react_agent
 from langchain_openai import ChatOpenAI
 from langchain.prompts import PromptTemplate
 from langchain.schema import AgentAction, AgentFinish
-from typing import List, Dict, Any, Optional, Tuple
+from typing import List, Dict, Any, Iterator, Optional, Tuple
+import asyncio
+import contextvars
 import json
+import queue
+import threading
+import time
 from datetime import datetime
 import os
 
-from .tools import initialize_tools
+from .tools import initialize_tools, get_tools_cache_statistics
 from .prompts import AGENT_SYSTEM_PROMPT
 from .demo_llm import DemoPasteleriaLLM
+from .response_cache import ResponseCache
+from .intent_router import IntentRouter
+from .streaming import AgentEventStreamHandler, drain, split_tokens
+from .prompt_budget import PromptAssembler, PromptBudget
+from ..utils.tokens import get_token_counter
+from .parallel_tools import MultiActionReActParser, ParallelAgentExecutor, PARALLEL_FORMAT_INSTRUCTIONS
+from .tracing import TracingCallbackHandler
+from ..monitoring.tracing import NOOP_SPAN, get_tracer, span
 
 
 class PasteleriaAgentExecutor:
@@ -31,7 +44,16 @@ class PasteleriaAgentExecutor:
         model_name: str = "gpt-3.5-turbo",
         temperature: float = 0.3,
         max_iterations: int = 10,
-        verbose: bool = True
+        verbose: bool = True,
+        use_response_cache: bool = True,
+        response_cache: Optional[ResponseCache] = None,
+        parallel_tools: bool = True,
+        max_parallel_tools: int = 4,
+        use_intent_router: bool = True,
+        token_budget: Optional[int] = None,
+        prompt_budget: Optional[PromptBudget] = None,
+        max_output_tokens: Optional[int] = None,
+        metrics: Any = None
     ):
         """
         Inicializa el agente con todas sus dependencias
@@ -44,67 +66,125 @@ class PasteleriaAgentExecutor:
             temperature: Control de creatividad (0.0-1.0)
             max_iterations: Máximo de iteraciones del agente
             verbose: Si True, muestra logs detallados
+            use_response_cache: Si True, responde consultas repetidas desde el cache
+            response_cache: Cache a usar (ej: con nivel semántico); por defecto solo nivel exacto
+            parallel_tools: Si True, el agente puede pedir varias herramientas independientes por paso
+                y se ejecutan concurrentemente
+            max_parallel_tools: Máximo de herramientas ejecutándose a la vez en un paso
+            use_intent_router: Si True, consultas determinísticas (precio/descuento, disponibilidad,
+                listados) se responden llamando directo a las herramientas, sin LLM
+            token_budget: Tope de tokens por llamada al LLM (prompt + respuesta); None = AGENT_TOKEN_BUDGET
+                o 4096, acotado por la ventana de contexto del modelo
+            prompt_budget: Reparto detallado del presupuesto (si se indica, reemplaza token_budget)
+            max_output_tokens: Tope de tokens de cada respuesta del LLM (None = AGENT_MAX_OUTPUT_TOKENS;
+                sin ninguno de los dos la respuesta no se limita y el presupuesto reserva
+                PromptBudget.reserved_output para ella)
+            metrics: Destino de la latencia de cada herramienta (ej: ObservabilityMetrics); None = no se registra
         """
         self.data_loader = data_loader
         self.discount_calculator = discount_calculator
         self.verbose = verbose
+        self.parallel_tools = parallel_tools
         
-        # Detectar modo DEMO o usar API
-        use_demo = os.getenv("USE_DEMO_MODE", "false").lower() == "true"
+        # Detectar modo DEMO, GitHub Models o OpenAI
+        use_demo = os.getenv("USE_DEMO_MODE", "false").lower() == "true" or openai_api_key == "DEMO_MODE"
+        github_token = os.getenv("GITHUB_TOKEN")
+        use_github = not use_demo and bool(github_token) and not openai_api_key.startswith("sk-")
+        if use_github:
+            # GitHub Models usa gpt-4o (define el tokenizer y la ventana de contexto)
+            model_name = "gpt-4o"
         
-        if use_demo or openai_api_key == "DEMO_MODE":
+        # Tope opcional de la respuesta del LLM; si se fija, es también lo que reserva el presupuesto
+        if max_output_tokens is None and os.getenv("AGENT_MAX_OUTPUT_TOKENS"):
+            max_output_tokens = int(os.getenv("AGENT_MAX_OUTPUT_TOKENS"))
+        budget_kwargs = {"reserved_output": max_output_tokens} if max_output_tokens else {}
+        
+        # Presupuesto de tokens por request (historial compactado y scratchpad recortado)
+        self.prompt_budget = prompt_budget or PromptBudget.for_model(model_name, token_budget, **budget_kwargs)
+        
+        if use_demo:
             # Usar LLM Demo (sin consumir API)
             print("🎭 Usando MODO DEMO (sin consumir API)")
             self.llm = DemoPasteleriaLLM()
+        elif use_github:
+            # Usar GitHub Models (GRATIS)
+            print("🔄 Usando GitHub Models (gratis)")
+            self.llm = ChatOpenAI(
+                model=model_name,
+                temperature=temperature,
+                max_tokens=max_output_tokens,
+                api_key=github_token,
+                base_url=os.getenv("GITHUB_BASE_URL", "https://models.inference.ai.azure.com")
+            )
         else:
-            # Detectar si usar GitHub Models o OpenAI
-            github_token = os.getenv("GITHUB_TOKEN")
-            github_base_url = os.getenv("GITHUB_BASE_URL", "https://models.inference.ai.azure.com")
-            
-            if github_token and not openai_api_key.startswith("sk-"):
-                # Usar GitHub Models (GRATIS)
-                print("🔄 Usando GitHub Models (gratis)")
-                self.llm = ChatOpenAI(
-                    model="gpt-4o",
-                    temperature=temperature,
-                    api_key=github_token,
-                    base_url=github_base_url
-                )
-            else:
-                # Usar OpenAI
-                print("🔄 Usando OpenAI API")
-                self.llm = ChatOpenAI(
-                    model=model_name,
-                    temperature=temperature,
-                    openai_api_key=openai_api_key
-                )
+            # Usar OpenAI
+            print("🔄 Usando OpenAI API")
+            self.llm = ChatOpenAI(
+                model=model_name,
+                temperature=temperature,
+                max_tokens=max_output_tokens,
+                openai_api_key=openai_api_key
+            )
         
         # Inicializar herramientas
-        self.tools = initialize_tools(data_loader, discount_calculator)
+        self.tools = initialize_tools(data_loader, discount_calculator, metrics=metrics)
         
         # Crear el prompt del agente
         self.prompt = self._create_agent_prompt()
         
+        # Presupuesto de tokens: historial compactado y scratchpad recortado para un prompt acotado
+        self.prompt_assembler = PromptAssembler(
+            fixed_prompt=self.prompt.format(input="", agent_scratchpad=""),
+            counter=get_token_counter(model_name),
+            budget=self.prompt_budget,
+            system_prompt=AGENT_SYSTEM_PROMPT,
+            tools_description=self._format_tools_description()
+        )
+        
         # Crear el agente ReAct
         self.agent = create_react_agent(
             llm=self.llm,
             tools=self.tools,
-            prompt=self.prompt
+            prompt=self.prompt,
+            output_parser=MultiActionReActParser() if parallel_tools else None
         )
         
         # Crear el executor
-        self.agent_executor = AgentExecutor(
-            agent=self.agent,
-            tools=self.tools,
-            max_iterations=max_iterations,
-            verbose=verbose,
-            handle_parsing_errors=True,
-            return_intermediate_steps=True
-        )
+        if parallel_tools:
+            self.agent_executor = ParallelAgentExecutor(
+                agent=self.agent,
+                tools=self.tools,
+                max_iterations=max_iterations,
+                verbose=verbose,
+                handle_parsing_errors=True,
+                return_intermediate_steps=True,
+                trim_intermediate_steps=self.prompt_assembler.trim_intermediate_steps,
+                max_parallel_tools=max_parallel_tools
+            )
+        else:
+            self.agent_executor = AgentExecutor(
+                agent=self.agent,
+                tools=self.tools,
+                max_iterations=max_iterations,
+                verbose=verbose,
+                handle_parsing_errors=True,
+                return_intermediate_steps=True,
+                trim_intermediate_steps=self.prompt_assembler.trim_intermediate_steps
+            )
+        
+        # Ruta rápida sin LLM para intenciones inequívocas
+        self.intent_router = IntentRouter(self.tools, data_loader) if use_intent_router else None
         
         # Tracking de ejecución
         self.execution_log = []
         
+        # Cache de respuestas, invalidado cuando cambian catálogo o reglas de descuento
+        self.response_cache = None
+        if use_response_cache:
+            self.response_cache = response_cache or ResponseCache()
+            if self.response_cache.state_fn is None:
+                self.response_cache.bind_state(self._cache_state)
+        
         print(f"✅ Agente inteligente inicializado con {len(self.tools)} herramientas")
         print(f"🤖 Modelo: {model_name} | Temperatura: {temperature}")
     
@@ -127,7 +207,7 @@ Observation: el resultado de la acción
 ... (este Thought/Action/Action Input/Observation puede repetirse N veces)
 Thought: Ahora sé la respuesta final
 Final Answer: la respuesta final al cliente
-
+{parallel_instructions}
 ¡Importante! Siempre usa el formato exacto arriba.
 
 Pregunta: {input}
@@ -140,10 +220,17 @@ Thought: {agent_scratchpad}
             input_variables=["input", "agent_scratchpad"],
             partial_variables={
                 "tools": self._format_tools_description(),
-                "tool_names": ", ".join([tool.name for tool in self.tools])
+                "tool_names": ", ".join([tool.name for tool in self.tools]),
+                "parallel_instructions": PARALLEL_FORMAT_INSTRUCTIONS if self.parallel_tools else ""
             }
         )
     
+    def _cache_state(self) -> Tuple[Any, Any]:
+        """Versión del estado del que dependen las respuestas (catálogo, reglas de descuento)"""
+        catalogo = getattr(self.data_loader, "version_catalogo", None)
+        reglas = self.discount_calculator.version_reglas() if hasattr(self.discount_calculator, "version_reglas") else None
+        return catalogo, reglas
+    
     def _format_tools_description(self) -> str:
         """Formatea la descripción de las herramientas disponibles"""
         descriptions = []
@@ -154,7 +241,8 @@ Thought: {agent_scratchpad}
     def execute(
         self, 
         query: str, 
-        chat_history: Optional[List[Dict[str, str]]] = None
+        chat_history: Optional[List[Dict[str, str]]] = None,
+        callbacks: Optional[List[Any]] = None
     ) -> Dict[str, Any]:
         """
         Ejecuta el agente para responder una consulta
@@ -162,79 +250,320 @@ Thought: {agent_scratchpad}
         Args:
             query: Consulta del cliente
             chat_history: Historial de conversación (opcional)
+            callbacks: Callbacks de LangChain para observar la ejecución (ej: streaming)
         
         Returns:
             Dict con la respuesta y metadata de ejecución
         """
         start_time = datetime.now()
         
-        try:
-            # Preparar input con contexto
-            agent_input = {
-                "input": query
-            }
-            
-            # Si hay historial, agregarlo al contexto
-            if chat_history:
-                context = self._format_chat_history(chat_history)
-                agent_input["input"] = f"Contexto previo: {context}\n\nPregunta actual: {query}"
-            
-            # Ejecutar el agente
-            result = self.agent_executor.invoke(agent_input)
-            
-            # Extraer información de la ejecución
-            output = result.get("output", "")
-            intermediate_steps = result.get("intermediate_steps", [])
-            
-            # Procesar pasos intermedios
-            execution_trace = self._process_intermediate_steps(intermediate_steps)
-            
-            # Calcular tiempo de ejecución
-            execution_time = (datetime.now() - start_time).total_seconds()
-            
-            # Construir respuesta
-            response = {
-                "success": True,
-                "answer": output,
-                "execution_trace": execution_trace,
-                "tools_used": [step["tool"] for step in execution_trace],
-                "execution_time": execution_time,
-                "iterations": len(intermediate_steps),
-                "timestamp": datetime.now().isoformat()
-            }
+        with span("agent.execute", query_chars=len(query)) as agent_span:
+            try:
+                agent_input, context = self._prepare_input(query, chat_history)
+                
+                # Versión del catálogo/reglas con que se calcula la respuesta (no se cachea si cambia)
+                cache_state = self._current_cache_state()
+                
+                # Respuesta cacheada para la misma consulta en el mismo contexto
+                cached = self._cached_response(query, context, start_time)
+                if cached is not None:
+                    return cached
+                
+                # Intención determinística: se responde sin pasar por el LLM
+                routed = self._fast_path_response(query, start_time, chat_history)
+                if routed is not None:
+                    return routed
+                
+                # Ejecutar el agente (las llamadas al LLM y herramientas cuelgan de este span)
+                with span("agent.invoke") as invoke_span:
+                    result = self.agent_executor.invoke(
+                        agent_input, config=self._run_config(self._trace_callbacks(callbacks, invoke_span))
+                    )
+                
+                return self._build_response(query, context, result, start_time, cache_state)
+                
+            except Exception as e:
+                agent_span.set_error(e)
+                return self._build_error_response(e, start_time)
+    
+    async def aexecute(
+        self,
+        query: str,
+        chat_history: Optional[List[Dict[str, str]]] = None,
+        timeout: Optional[float] = None,
+        callbacks: Optional[List[Any]] = None
+    ) -> Dict[str, Any]:
+        """
+        Versión asíncrona de execute: LLM y herramientas no bloquean el event loop,
+        así un mismo proceso atiende muchas conversaciones mientras espera al LLM
+        
+        Args:
+            query: Consulta del cliente
+            chat_history: Historial de conversación (opcional)
+            timeout: Segundos máximos para la consulta (None = sin límite)
+            callbacks: Callbacks de LangChain para observar la ejecución
+        
+        Returns:
+            Dict con la respuesta y metadata de ejecución
+        
+        Si la tarea que espera esta corrutina es cancelada, la cancelación se propaga
+        al agente (llamada al LLM y herramientas en curso) y se relanza CancelledError.
+        """
+        start_time = datetime.now()
+        
+        with span("agent.aexecute", query_chars=len(query)) as agent_span:
+            try:
+                # wait_for cancela la consulta (cache, ruta rápida y agente) si se excede el timeout
+                return await asyncio.wait_for(
+                    self._aexecute_steps(query, chat_history, callbacks, start_time),
+                    timeout=timeout
+                )
             
-            # Log de ejecución
+            except asyncio.TimeoutError as e:
+                print(f"⏱️ Timeout de {timeout}s alcanzado para la consulta")
+                agent_span.set_error("timeout")
+                response = self._build_error_response(e, start_time, log_trace=False)
+                response["error"] = f"Timeout de {timeout}s excedido"
+                response["timeout"] = True
+                return response
+                
+            except Exception as e:
+                agent_span.set_error(e)
+                return self._build_error_response(e, start_time)
+    
+    async def _aexecute_steps(
+        self,
+        query: str,
+        chat_history: Optional[List[Dict[str, str]]],
+        callbacks: Optional[List[Any]],
+        start_time: datetime
+    ) -> Dict[str, Any]:
+        """
+        Pasos de aexecute; el cache (embed_query del nivel semántico) y la ruta rápida
+        (búsqueda BM25, cálculo de descuentos) son síncronos y corren en un hilo
+        """
+        agent_input, context = self._prepare_input(query, chat_history)
+        cache_state = self._current_cache_state()
+        
+        cached = await asyncio.to_thread(self._cached_response, query, context, start_time)
+        if cached is not None:
+            return cached
+        
+        routed = await asyncio.to_thread(self._fast_path_response, query, start_time, chat_history)
+        if routed is not None:
+            return routed
+        
+        with span("agent.invoke") as invoke_span:
+            result = await self.agent_executor.ainvoke(
+                agent_input, config=self._run_config(self._trace_callbacks(callbacks, invoke_span))
+            )
+        
+        return self._build_response(query, context, result, start_time, cache_state)
+    
+    def stream(
+        self,
+        query: str,
+        chat_history: Optional[List[Dict[str, str]]] = None
+    ) -> Iterator[Dict[str, Any]]:
+        """
+        Ejecuta el agente emitiendo eventos a medida que ocurren
+        
+        Args:
+            query: Consulta del cliente
+            chat_history: Historial de conversación (opcional)
+        
+        Yields:
+            Eventos thought / tool_start / tool_end / token y, al final,
+            {"type": "final", "response": ...} con la misma respuesta que execute
+            más "time_to_first_token" (segundos hasta el primer token de la respuesta)
+        """
+        start = time.perf_counter()
+        events = queue.Queue()
+        handler = AgentEventStreamHandler(events, start_time=start)
+        finished = object()
+        outcome = {}
+        
+        def _run():
+            try:
+                outcome["response"] = self.execute(query, chat_history, callbacks=[handler])
+            finally:
+                events.put(finished)
+        
+        # El hilo hereda el contexto para que sus spans cuelguen de la traza activa
+        context = contextvars.copy_context()
+        threading.Thread(target=context.run, args=(_run,), name="agent-stream", daemon=True).start()
+        
+        yield from drain(events, finished)
+        
+        response = outcome["response"]
+        
+        # Cache, ruta rápida o LLM sin streaming: la respuesta completa se entrega por palabras
+        if not handler.tokens_emitted:
+            for token in split_tokens(response.get("answer", "")):
+                yield handler.token_event(token)
+        
+        response["time_to_first_token"] = handler.time_to_first_token
+        yield {"type": "final", "response": response}
+    
+    def _run_config(self, callbacks: Optional[List[Any]]) -> Optional[Dict[str, Any]]:
+        return {"callbacks": callbacks} if callbacks else None
+    
+    def _trace_callbacks(self, callbacks: Optional[List[Any]], parent) -> Optional[List[Any]]:
+        """Agrega el callback de trazas si la consulta está dentro de una traza activa"""
+        if parent is NOOP_SPAN:
+            return callbacks
+        return list(callbacks or []) + [TracingCallbackHandler(get_tracer(), parent)]
+    
+    def _prepare_input(
+        self,
+        query: str,
+        chat_history: Optional[List[Dict[str, str]]]
+    ) -> Tuple[Dict[str, str], str]:
+        """Arma el input del agente y el contexto conversacional"""
+        agent_input = {
+            "input": query
+        }
+        
+        # Si hay historial, agregarlo al contexto
+        context = ""
+        if chat_history:
+            with span("agent.build_history", messages=len(chat_history)):
+                context = self.prompt_assembler.build_history(chat_history, query)
+            agent_input["input"] = f"Contexto previo: {context}\n\nPregunta actual: {query}"
+        
+        return agent_input, context
+    
+    def _current_cache_state(self) -> Any:
+        return self.response_cache.current_state() if self.response_cache is not None else None
+    
+    def _cached_response(self, query: str, context: str, start_time: datetime) -> Optional[Dict[str, Any]]:
+        """Busca la respuesta en el cache y la registra en el log si hay hit"""
+        if self.response_cache is None:
+            return None
+        
+        with span("response_cache.get") as cache_span:
+            cached = self.response_cache.get(query, context)
+            cache_span.set_attribute("hit", cached is not None)
+        if cached is not None:
+            cached["execution_time"] = (datetime.now() - start_time).total_seconds()
+            cached["timestamp"] = datetime.now().isoformat()
             self.execution_log.append({
                 "query": query,
-                "response": response,
+                "response": cached,
                 "timestamp": datetime.now().isoformat()
             })
-            
-            return response
-            
-        except Exception as e:
-            import traceback
-            error_msg = str(e)
-            error_trace = traceback.format_exc()
-            
+        return cached
+    
+    def _fast_path_response(
+        self,
+        query: str,
+        start_time: datetime,
+        chat_history: Optional[List[Dict[str, str]]] = None
+    ) -> Optional[Dict[str, Any]]:
+        """Respuesta del router de intenciones (None si la consulta necesita al agente)"""
+        if self.intent_router is None:
+            return None
+        
+        with span("intent_router.route") as route_span:
+            routed = self.intent_router.route(query, chat_history)
+            route_span.set_attribute("fast_path", routed is not None)
+        if routed is None:
+            return None
+        
+        observation = routed["observation"]
+        response = {
+            "success": True,
+            "answer": routed["answer"],
+            "execution_trace": [{
+                "step": 1,
+                "thought": f"Ruta rápida: intención '{routed['intent']}' resuelta sin LLM",
+                "tool": routed["tool"],
+                "tool_input": routed["tool_input"],
+                "observation": observation[:500] + "..." if len(observation) > 500 else observation
+            }],
+            "tools_used": [routed["tool"]],
+            "execution_time": (datetime.now() - start_time).total_seconds(),
+            "iterations": 0,
+            "fast_path": True,
+            "intent": routed["intent"],
+            "timestamp": datetime.now().isoformat()
+        }
+        
+        self.execution_log.append({
+            "query": query,
+            "response": response,
+            "timestamp": datetime.now().isoformat()
+        })
+        return response
+    
+    def _build_response(
+        self,
+        query: str,
+        context: str,
+        result: Dict[str, Any],
+        start_time: datetime,
+        cache_state: Any = None
+    ) -> Dict[str, Any]:
+        """
+        Construye la respuesta a partir del resultado del agente, la registra y la cachea
+        cache_state: versión del estado tomada antes de ejecutar (si cambió, la respuesta no se cachea)
+        """
+        # Extraer información de la ejecución
+        output = result.get("output", "")
+        intermediate_steps = result.get("intermediate_steps", [])
+        
+        # Procesar pasos intermedios
+        execution_trace = self._process_intermediate_steps(intermediate_steps)
+        
+        # Calcular tiempo de ejecución
+        execution_time = (datetime.now() - start_time).total_seconds()
+        
+        # Construir respuesta
+        response = {
+            "success": True,
+            "answer": output,
+            "execution_trace": execution_trace,
+            "tools_used": [step["tool"] for step in execution_trace],
+            "execution_time": execution_time,
+            "iterations": len(intermediate_steps),
+            "timestamp": datetime.now().isoformat()
+        }
+        
+        # Log de ejecución
+        self.execution_log.append({
+            "query": query,
+            "response": response,
+            "timestamp": datetime.now().isoformat()
+        })
+        
+        if self.response_cache is not None:
+            self.response_cache.put(query, response, context, state=cache_state)
+        
+        return response
+    
+    def _build_error_response(self, e: Exception, start_time: datetime, log_trace: bool = True) -> Dict[str, Any]:
+        """Construye la respuesta amigable ante un error"""
+        import traceback
+        error_msg = str(e)
+        error_trace = traceback.format_exc()
+        
+        if log_trace:
             # Imprimir error detallado en consola
             print("❌ ERROR EN AGENT EXECUTOR:")
             print(f"Tipo: {type(e).__name__}")
             print(f"Mensaje: {error_msg}")
             print(f"Trace:\n{error_trace}")
-            
-            error_response = {
-                "success": False,
-                "answer": self._generate_error_response(str(e)),
-                "error": str(e),
-                "error_trace": error_trace,
-                "execution_trace": [],
-                "tools_used": [],
-                "execution_time": (datetime.now() - start_time).total_seconds(),
-                "timestamp": datetime.now().isoformat()
-            }
-            
-            return error_response
+        
+        return {
+            "success": False,
+            "answer": self._generate_error_response(error_msg),
+            "error": error_msg,
+            "error_trace": error_trace,
+            "execution_trace": [],
+            "tools_used": [],
+            "execution_time": (datetime.now() - start_time).total_seconds(),
+            "timestamp": datetime.now().isoformat()
+        }
     
     def _process_intermediate_steps(
         self, 
@@ -263,15 +592,6 @@ Thought: {agent_scratchpad}
         
         return trace
     
-    def _format_chat_history(self, chat_history: List[Dict[str, str]]) -> str:
-        """Formatea el historial de chat para contexto"""
-        formatted = []
-        for msg in chat_history[-5:]:  # Últimos 5 mensajes
-            role = msg.get("role", "user")
-            content = msg.get("content", "")
-            formatted.append(f"{role.capitalize()}: {content}")
-        return "\n".join(formatted)
-    
     def _generate_error_response(self, error: str) -> str:
         """Genera una respuesta amigable ante errores"""
         return f"""
@@ -324,9 +644,25 @@ Thought: {agent_scratchpad}
             "success_rate": (successful / total_queries * 100) if total_queries > 0 else 0,
             "avg_execution_time": total_time / total_queries if total_queries > 0 else 0,
             "most_used_tools": most_used[:3],
-            "total_tool_calls": len(all_tools)
+            "total_tool_calls": len(all_tools),
+            "cached_responses": sum(1 for log in self.execution_log if log["response"].get("cached")),
+            "response_cache": self.response_cache.get_statistics() if self.response_cache else None,
+            "tool_cache": get_tools_cache_statistics(self.tools),
+            "parallel_tools": dict(self.agent_executor.parallel_stats) if self.parallel_tools else None,
+            "fast_path_responses": sum(1 for log in self.execution_log if log["response"].get("fast_path")),
+            "intent_router": self.intent_router.get_statistics() if self.intent_router else None,
+            "avg_time_to_first_token": self._avg_time_to_first_token(),
+            "prompt_budget": self.prompt_assembler.get_statistics()
         }
     
+    def _avg_time_to_first_token(self) -> Optional[float]:
+        """Promedio de TTFT de las consultas ejecutadas en modo streaming"""
+        ttfts = [
+            log["response"]["time_to_first_token"] for log in self.execution_log
+            if log["response"].get("time_to_first_token") is not None
+        ]
+        return round(sum(ttfts) / len(ttfts), 4) if ttfts else None
+    
     def reset_log(self):
         """Reinicia el log de ejecución"""
         self.execution_log = []
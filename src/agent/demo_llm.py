@@ -4,12 +4,19 @@ Simula respuestas inteligentes del agente basadas en patrones
 """
 
 from langchain.llms.base import LLM
-from typing import Optional, List, Any
+from langchain_core.outputs import GenerationChunk
+from typing import Optional, List, Any, Iterator, AsyncIterator
+import asyncio
+import re
+import time
 
 
 class DemoPasteleriaLLM(LLM):
     """LLM simulado para demostración del agente sin consumir API"""
     
+    # Latencia simulada por llamada (segundos), para medir concurrencia sin API real
+    latency: float = 0.0
+    
     @property
     def _llm_type(self) -> str:
         return "demo-pasteleria"
@@ -20,6 +27,55 @@ class DemoPasteleriaLLM(LLM):
         stop: Optional[List[str]] = None,
         **kwargs: Any,
     ) -> str:
+        """Genera respuesta simulada (bloquea durante la latencia simulada)"""
+        if self.latency:
+            time.sleep(self.latency)
+        return self._simular_respuesta(prompt)
+    
+    async def _acall(
+        self,
+        prompt: str,
+        stop: Optional[List[str]] = None,
+        **kwargs: Any,
+    ) -> str:
+        """Versión asíncrona: la latencia simulada no bloquea el event loop"""
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        return self._simular_respuesta(prompt)
+    
+    def _stream(
+        self,
+        prompt: str,
+        stop: Optional[List[str]] = None,
+        run_manager: Any = None,
+        **kwargs: Any,
+    ) -> Iterator[GenerationChunk]:
+        """Entrega la respuesta simulada palabra por palabra (como un LLM con streaming)"""
+        if self.latency:
+            time.sleep(self.latency)
+        for token in re.findall(r"\S+\s*|\s+", self._simular_respuesta(prompt)):
+            chunk = GenerationChunk(text=token)
+            if run_manager:
+                run_manager.on_llm_new_token(token, chunk=chunk)
+            yield chunk
+    
+    async def _astream(
+        self,
+        prompt: str,
+        stop: Optional[List[str]] = None,
+        run_manager: Any = None,
+        **kwargs: Any,
+    ) -> AsyncIterator[GenerationChunk]:
+        """Versión asíncrona del streaming simulado"""
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        for token in re.findall(r"\S+\s*|\s+", self._simular_respuesta(prompt)):
+            chunk = GenerationChunk(text=token)
+            if run_manager:
+                await run_manager.on_llm_new_token(token, chunk=chunk)
+            yield chunk
+    
+    def _simular_respuesta(self, prompt: str) -> str:
         """Genera respuesta simulada basada en el prompt"""
         
         prompt_lower = prompt.lower()
@@ -317,12 +373,4 @@ Soy tu asistente virtual y puedo ayudarte con:
 📦 **Verificar disponibilidad** - Stock y tiempos
 
 ¿En qué puedo ayudarte hoy?"""
-    
-    async def _acall(
-        self,
-        prompt: str,
-        stop: Optional[List[str]] = None,
-        **kwargs: Any,
-    ) -> str:
-        """Versión asíncrona"""
-        return self._call(prompt, stop, **kwargs)
+
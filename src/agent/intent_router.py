@@ -0,0 +1,314 @@
+"""
+Router de intenciones determinísticas (ruta rápida sin LLM)
+Extrae slots con patrones compilados y, si la intención es inequívoca,
+llama directamente a la herramienta y arma una respuesta por plantilla
+"""
+
+import re
+import threading
+import time
+from collections import deque
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional
+
+from ..text_utils import normalizar_texto, tokenizar
+from ..monitoring.tracing import span
+from .tools import SEARCH_NO_RESULTS, SEARCH_TOP_K
+
+
+# ============= PATRONES =============
+
+PRODUCT_CODE_RE = re.compile(r"\b([A-Za-z]{2,3}\d{3})\b")
+EMAIL_RE = re.compile(r"\b[\w.+-]+@[\w-]+(?:\.[\w-]+)+\b")
+# Sobre texto normalizado (sin acentos, minúsculas)
+AGE_RE = re.compile(r"\b(?:tengo|edad(?: de)?|mayor(?:es)? de)\s+(\d{1,3})\b|\b(\d{1,3})\s*anos\b")
+PROMO_RE = re.compile(r"\b(?:codigo|cupon)(?:\s+promocional)?\s*:?\s*([a-z]+\d+)\b|\b(felices50)\b")
+QUANTITY_RE = re.compile(r"\b(\d{1,3})\s*(?:unidades|tortas?|postres?|productos?)\b|\bcantidad\s*:?\s*(\d{1,3})\b")
+CAPACITY_RE = re.compile(r"\bpara\s+(\d{1,3})\s*personas\b")
+MAX_PRICE_RE = re.compile(
+    r"\b(?:menos de|hasta|maximo|menor a|bajo|no mas de)\s*\$?\s*(\d[\d.,]*)\s*(mil|k)?\b"
+)
+
+PRICE_WORDS = frozenset({"precio", "cuanto", "cuesta", "cuestan", "vale", "valor", "descuento", "total", "pagar", "costo"})
+STOCK_WORDS = frozenset({"stock", "disponible", "disponibilidad", "inventario", "capacidad"})
+LISTING_WORDS = frozenset({"muestrame", "muestra", "mostrar", "lista", "listar", "catalogo", "ver", "opciones", "tienen", "cuales", "hay"})
+
+# Palabras de relleno que no cambian una búsqueda por categoría/precio (comparadas como stems)
+FILLER_STEMS = frozenset(tokenizar(
+    " ".join(LISTING_WORDS) + " producto torta postre opcion precio peso clp mil hola favor"
+    " quisiera necesito busco gustaria ver todo disponible cuesten valgan menos hasta maximo bajo",
+    quitar_stopwords=False
+))
+GENERIC_CATEGORY_STEMS = frozenset({"product"})
+# Palabras de la propia intención (precio/stock): no son contexto adicional
+INTENT_STEMS = frozenset(tokenizar(" ".join(PRICE_WORDS | STOCK_WORDS) + " codigo cupon promocional", quitar_stopwords=False))
+
+
+@dataclass
+class Slots:
+    """Slots extraídos de la consulta"""
+    product_codes: List[str] = field(default_factory=list)
+    customer_age: Optional[int] = None
+    promo_code: Optional[str] = None
+    customer_email: Optional[str] = None
+    quantity: Optional[int] = None
+    capacity: Optional[int] = None
+    category: Optional[str] = None
+    categories_matched: int = 0
+    max_price: Optional[float] = None
+    residual: List[str] = field(default_factory=list)
+
+
+class IntentRouter:
+    """
+    Ruta rápida para consultas de precio/descuento, disponibilidad y listados de catálogo
+    Ante cualquier ambigüedad retorna None y la consulta sigue al agente ReAct
+    """
+
+    def __init__(self, tools: List[Any], data_loader, max_latency_samples: int = 1000):
+        """
+        Args:
+            tools: Herramientas inicializadas (se usan por nombre)
+            data_loader: Para validar códigos y conocer las categorías
+            max_latency_samples: Muestras de latencia guardadas para percentiles
+        """
+        self.tools = {tool.name: tool for tool in tools}
+        self.data_loader = data_loader
+        self._category_stems: Dict[str, List[str]] = {}
+        self._categories_version = object()
+
+        self._lock = threading.Lock()
+        self._latencies = deque(maxlen=max_latency_samples)
+        self.stats = {
+            "total": 0,
+            "fast_path": 0,
+            "fallback": 0,
+            "by_intent": {}
+        }
+
+    # ============= EXTRACCIÓN DE SLOTS =============
+
+    def _refresh_categories(self):
+        """Recalcula los stems de categorías si cambió la versión del catálogo"""
+        version = getattr(self.data_loader, "version_catalogo", None)
+        if version != self._categories_version or not self._category_stems:
+            self._category_stems = {
+                categoria: [s for s in tokenizar(categoria) if s not in GENERIC_CATEGORY_STEMS]
+                for categoria in self.data_loader.obtener_categorias()
+            }
+            self._categories_version = getattr(self.data_loader, "version_catalogo", None)
+
+    def extract_slots(self, query: str) -> Slots:
+        self._refresh_categories()
+        normalized = normalizar_texto(query)
+        slots = Slots()
+
+        slots.product_codes = list(dict.fromkeys(code.upper() for code in PRODUCT_CODE_RE.findall(query)))
+
+        email = EMAIL_RE.search(query)
+        if email:
+            slots.customer_email = email.group(0)
+            normalized = normalized.replace(normalizar_texto(email.group(0)), " ")
+
+        age = AGE_RE.search(normalized)
+        if age:
+            slots.customer_age = int(age.group(1) or age.group(2))
+
+        promo = PROMO_RE.search(normalized)
+        if promo:
+            slots.promo_code = (promo.group(1) or promo.group(2)).upper()
+
+        quantity = QUANTITY_RE.search(normalized)
+        if quantity:
+            slots.quantity = int(quantity.group(1) or quantity.group(2))
+
+        capacity = CAPACITY_RE.search(normalized)
+        if capacity:
+            slots.capacity = int(capacity.group(1))
+
+        max_price = MAX_PRICE_RE.search(normalized)
+        if max_price:
+            amount = float(re.sub(r"[.,]", "", max_price.group(1)))
+            slots.max_price = amount * 1000 if max_price.group(2) else amount
+
+        # Categoría: todos sus stems distintivos deben aparecer en la consulta
+        query_stems = set(tokenizar(normalized))
+        matched = [c for c, stems in self._category_stems.items() if stems and set(stems) <= query_stems]
+        slots.categories_matched = len(matched)
+        if len(matched) == 1:
+            slots.category = matched[0]
+
+        # Palabras que no explica ningún slot: si quedan, la consulta no es un listado puro
+        explained = set(FILLER_STEMS) | INTENT_STEMS
+        explained.update(tokenizar(" ".join(slots.product_codes), quitar_stopwords=False))
+        for categoria in matched:
+            explained.update(self._category_stems[categoria])
+        slot_text = " ".join(m.group(0) for m in re.finditer(
+            f"{MAX_PRICE_RE.pattern}|{AGE_RE.pattern}|{QUANTITY_RE.pattern}|{CAPACITY_RE.pattern}|{PROMO_RE.pattern}",
+            normalized
+        ))
+        explained.update(tokenizar(slot_text, quitar_stopwords=False))
+        slots.residual = [s for s in tokenizar(normalized) if s not in explained]
+
+        return slots
+
+    # ============= CLASIFICACIÓN =============
+
+    def classify(self, query: str, slots: Slots) -> Optional[str]:
+        """Retorna la intención si es inequívoca; None si hay que pasar por el agente"""
+        words = set(_palabras(query))
+        has_discount_slot = any([slots.customer_age, slots.promo_code, slots.customer_email])
+        asks_price = bool(words & PRICE_WORDS) or has_discount_slot
+        asks_stock = bool(words & STOCK_WORDS) or slots.capacity is not None
+
+        if len(slots.product_codes) > 1 or slots.categories_matched > 1:
+            return None
+
+        # Contexto que ningún slot explica (ej: "soy estudiante", "para mi abuela"): lo resuelve el agente
+        if slots.residual:
+            return None
+
+        if len(slots.product_codes) == 1:
+            if self.data_loader.obtener_producto(slots.product_codes[0]) is None:
+                return None
+            if asks_price and not asks_stock:
+                return "calculate_discount"
+            if asks_stock and not asks_price:
+                return "check_inventory"
+            return None
+
+        if (slots.category or slots.max_price) and not asks_stock and not has_discount_slot \
+                and words & LISTING_WORDS:
+            return "search_products"
+
+        return None
+
+    # ============= EJECUCIÓN =============
+
+    def route(self, query: str, chat_history: Optional[List[Dict[str, str]]] = None) -> Optional[Dict[str, Any]]:
+        """
+        Intenta responder sin LLM
+
+        Args:
+            query: Consulta del cliente
+            chat_history: Historial de la conversación; si hay, la consulta puede depender
+                de turnos anteriores ("¿y esa cuánto cuesta?") y la resuelve el agente
+
+        Returns:
+            Dict con answer, intent, tool, tool_input y observation; None si no aplica
+        """
+        start = time.perf_counter()
+        intent = None
+        if not chat_history:
+            slots = self.extract_slots(query)
+            intent = self.classify(query, slots)
+
+        result = None
+        if intent is not None and intent in self.tools:
+            tool_input = self._tool_input(intent, slots)
+            with span(f"tool.{intent}", tool=intent):
+                observation = self.tools[intent].run(tool_input)
+            # Errores de herramienta: mejor que el agente lo resuelva
+            if not observation.startswith("❌"):
+                result = {
+                    "intent": intent,
+                    "tool": intent,
+                    "tool_input": tool_input,
+                    "observation": observation,
+                    "answer": self._render(intent, observation, tool_input)
+                }
+
+        latency_ms = (time.perf_counter() - start) * 1000
+        with self._lock:
+            self.stats["total"] += 1
+            if result is None:
+                self.stats["fallback"] += 1
+            else:
+                self.stats["fast_path"] += 1
+                self.stats["by_intent"][intent] = self.stats["by_intent"].get(intent, 0) + 1
+                self._latencies.append(latency_ms)
+
+        if result is not None:
+            result["latency_ms"] = round(latency_ms, 3)
+        return result
+
+    def _tool_input(self, intent: str, slots: Slots) -> Dict[str, Any]:
+        if intent == "calculate_discount":
+            return {
+                "product_code": slots.product_codes[0],
+                "customer_age": slots.customer_age,
+                "promo_code": slots.promo_code,
+                "customer_email": slots.customer_email,
+                "quantity": slots.quantity or 1
+            }
+        if intent == "check_inventory":
+            return {"product_code": slots.product_codes[0], "capacity_needed": slots.capacity}
+        return {"query": "", "category": slots.category, "max_price": slots.max_price}
+
+    def _render(self, intent: str, observation: str, tool_input: Dict[str, Any]) -> str:
+        """Respuesta por plantilla sobre la salida de la herramienta"""
+        cierre = {
+            "calculate_discount": "¿Te gustaría agregar algo más a tu pedido? 🍰",
+            "check_inventory": "¿Quieres que calcule el precio con algún descuento? 💰",
+            "search_products": "¿Te gustaría ver el precio con descuento de alguno de estos productos? 🍰"
+        }[intent]
+        if intent == "search_products":
+            if observation.startswith(SEARCH_NO_RESULTS):
+                return (
+                    f"No hay productos {_describe_filters(tool_input)} en este momento. 😔\n\n"
+                    "¿Quieres que busque con otro presupuesto o en otra categoría? 🍰"
+                )
+            observation = observation.replace("relacionado(s) con ''", "disponible(s)")
+            total = self._count_listing(tool_input)
+            if total > SEARCH_TOP_K:
+                observation = (
+                    f"{observation.strip()}\n\n"
+                    f"Te muestro {SEARCH_TOP_K} de {total} productos {_describe_filters(tool_input)}; "
+                    "indícame un precio máximo o una categoría más específica para ver el resto."
+                )
+        return f"{observation.strip()}\n\n{cierre}"
+
+    def _count_listing(self, tool_input: Dict[str, Any]) -> int:
+        """Productos que cumplen los filtros del listado (search_products muestra hasta SEARCH_TOP_K)"""
+        indice = self.data_loader.obtener_indice_busqueda()
+        return len(indice.buscar(
+            "", category=tool_input["category"], max_price=tool_input["max_price"], top_k=len(indice.productos)
+        ))
+
+    # ============= ESTADÍSTICAS =============
+
+    def get_statistics(self) -> Dict[str, Any]:
+        """Fracción de tráfico servida sin LLM y distribución de latencia de la ruta rápida"""
+        with self._lock:
+            stats = {k: (dict(v) if isinstance(v, dict) else v) for k, v in self.stats.items()}
+            latencies = sorted(self._latencies)
+
+        stats["fast_path_rate"] = round(stats["fast_path"] / stats["total"] * 100, 2) if stats["total"] else 0.0
+        if latencies:
+            def pct(p):
+                return round(latencies[min(len(latencies) - 1, int(p / 100 * len(latencies)))], 3)
+            stats["latency_ms"] = {
+                "avg": round(sum(latencies) / len(latencies), 3),
+                "p50": pct(50),
+                "p95": pct(95),
+                "p99": pct(99),
+                "max": round(latencies[-1], 3)
+            }
+        else:
+            stats["latency_ms"] = {}
+        return stats
+
+
+def _describe_filters(tool_input: Dict[str, Any]) -> str:
+    """'en la categoría Tortas Cuadradas de hasta $30,000 CLP'"""
+    filtros = []
+    if tool_input.get("category"):
+        filtros.append(f"en la categoría {tool_input['category']}")
+    if tool_input.get("max_price"):
+        filtros.append(f"de hasta ${tool_input['max_price']:,.0f} CLP")
+    return " ".join(filtros) or "con esos filtros"
+
+
+def _palabras(query: str) -> List[str]:
+    """Palabras normalizadas sin stemming (para comparar con los vocabularios de intención)"""
+    return tokenizar(query, stemming=False, quitar_stopwords=False)
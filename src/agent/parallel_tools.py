@@ -0,0 +1,130 @@
+"""
+Ejecución paralela de herramientas dentro de un paso ReAct
+Permite que el LLM emita varias acciones independientes en un mismo paso
+y que todas se ejecuten concurrentemente antes de la siguiente llamada al LLM
+"""
+
+import re
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, Iterator, List, Optional, Tuple, Union
+
+from langchain.agents import AgentExecutor
+from langchain.agents.output_parsers import ReActSingleInputOutputParser
+from langchain_core.agents import AgentAction, AgentFinish, AgentStep
+from langchain_core.exceptions import OutputParserException
+
+
+# Cada bloque "Action: ... Action Input: ..." termina donde empieza el siguiente "Action:"
+ACTION_BLOCK_RE = re.compile(
+    r"Action\s*\d*\s*:[\s]*(.*?)[\s]*Action\s*\d*\s*Input\s*\d*\s*:[\s]*(.*?)(?=\n\s*Action\s*\d*\s*:|\Z)",
+    re.DOTALL
+)
+
+PARALLEL_FORMAT_INSTRUCTIONS = """
+Si necesitas varias herramientas que NO dependen entre sí (ej: buscar un producto,
+verificar capacidad y calcular un descuento), puedes pedirlas todas en el mismo paso
+escribiendo varios pares Action / Action Input seguidos, antes de cualquier Observation.
+Recibirás todas las observaciones juntas.
+"""
+
+
+class MultiActionReActParser(ReActSingleInputOutputParser):
+    """
+    Parser ReAct que acepta uno o varios pares Action / Action Input por paso
+    Con una sola acción se comporta igual que ReActSingleInputOutputParser
+    """
+
+    def parse(self, text: str) -> Union[AgentAction, List[AgentAction], AgentFinish]:
+        matches = list(ACTION_BLOCK_RE.finditer(text))
+        if len(matches) < 2:
+            return super().parse(text)
+
+        if "Final Answer:" in text:
+            raise OutputParserException(
+                f"La salida contiene acciones y una respuesta final a la vez: {text}"
+            )
+
+        actions = []
+        for idx, match in enumerate(matches):
+            # El log de cada acción es su propio tramo de texto (el primero incluye el Thought),
+            # así el scratchpad queda como pasos Action/Observation consecutivos
+            start = 0 if idx == 0 else match.start()
+            tool_input = match.group(2).strip().strip(" ").strip('"')
+            actions.append(AgentAction(match.group(1).strip(), tool_input, text[start:match.end()]))
+        return actions
+
+    @property
+    def _type(self) -> str:
+        return "react-multi-action"
+
+
+class ParallelAgentExecutor(AgentExecutor):
+    """
+    AgentExecutor que ejecuta concurrentemente las acciones de un mismo paso
+
+    La ruta síncrona usa un pool de hilos (las herramientas son I/O o CPU liviano);
+    la ruta asíncrona (ainvoke) ya ejecuta las acciones con asyncio.gather.
+    """
+
+    max_parallel_tools: int = 4
+    parallel_stats: Dict[str, int] = {
+        "steps": 0,
+        "parallel_steps": 0,
+        "actions": 0,
+        "max_actions_per_step": 0
+    }
+    pending_actions: Dict[int, Any] = {}
+
+    def _iter_next_step(
+        self,
+        name_to_tool_map: Dict[str, Any],
+        color_mapping: Dict[str, str],
+        inputs: Dict[str, str],
+        intermediate_steps: List[Tuple[AgentAction, str]],
+        run_manager: Optional[Any] = None
+    ) -> Iterator[Union[AgentFinish, AgentAction, AgentStep]]:
+        """
+        El paso base entrega primero todas las acciones y luego ejecuta cada una;
+        al recibir cada acción se lanza en el pool, y _perform_agent_action solo espera su resultado
+        """
+        pool = None
+        submitted: List[int] = []
+        try:
+            for output in super()._iter_next_step(
+                name_to_tool_map, color_mapping, inputs, intermediate_steps, run_manager
+            ):
+                if isinstance(output, AgentAction):
+                    if pool is None:
+                        pool = ThreadPoolExecutor(max_workers=self.max_parallel_tools)
+                    self.pending_actions[id(output)] = pool.submit(
+                        super()._perform_agent_action,
+                        name_to_tool_map, color_mapping, output, run_manager
+                    )
+                    submitted.append(id(output))
+                yield output
+        finally:
+            for action_id in submitted:
+                self.pending_actions.pop(action_id, None)
+            if pool is not None:
+                pool.shutdown(wait=False)
+            if submitted:
+                self._record_step(len(submitted))
+
+    def _perform_agent_action(
+        self,
+        name_to_tool_map: Dict[str, Any],
+        color_mapping: Dict[str, str],
+        agent_action: AgentAction,
+        run_manager: Optional[Any] = None
+    ) -> AgentStep:
+        future = self.pending_actions.pop(id(agent_action), None)
+        if future is not None:
+            return future.result()
+        return super()._perform_agent_action(name_to_tool_map, color_mapping, agent_action, run_manager)
+
+    def _record_step(self, n_actions: int):
+        self.parallel_stats["steps"] += 1
+        self.parallel_stats["actions"] += n_actions
+        if n_actions > 1:
+            self.parallel_stats["parallel_steps"] += 1
+        self.parallel_stats["max_actions_per_step"] = max(self.parallel_stats["max_actions_per_step"], n_actions)
@@ -0,0 +1,265 @@
+"""
+Armado del prompt con presupuesto de tokens
+Reparte un máximo de tokens por request entre prompt fijo (sistema + herramientas), historial y scratchpad,
+compactando los turnos antiguos en un resumen y descartando los menos relevantes para la consulta
+"""
+
+import os
+import re
+import threading
+from typing import Any, Dict, List, Optional, Tuple
+
+from ..text_utils import tokenizar
+from ..utils.tokens import TokenCounter, get_context_window
+
+SUMMARY_HEADER = "Resumen de la conversación anterior:"
+RECENT_HEADER = "Mensajes recientes:"
+
+_SENTENCE_RE = re.compile(r"(?<=[.!?])\s")
+
+# Tope de tokens por request si no se indica otro (variable de entorno AGENT_TOKEN_BUDGET);
+# la ventana de contexto del modelo es solo el límite superior
+DEFAULT_TOKEN_BUDGET = 4096
+
+
+class PromptBudget:
+    """Reparto del presupuesto de tokens de cada request"""
+
+    def __init__(
+        self,
+        total_tokens: int = 4096,
+        reserved_output: int = 500,
+        scratchpad_share: float = 0.45,
+        summary_share: float = 0.3,
+        summary_line_tokens: int = 40,
+        min_observation_tokens: int = 60
+    ):
+        """
+        Args:
+            total_tokens: Máximo de tokens del prompt + respuesta por llamada al LLM
+            reserved_output: Tokens reservados para la respuesta del modelo
+            scratchpad_share: Fracción del espacio variable para el scratchpad (pasos del agente)
+            summary_share: Fracción del presupuesto de historial para el resumen de turnos antiguos
+            summary_line_tokens: Máximo de tokens por turno compactado
+            min_observation_tokens: Mínimo al que se recorta una observación antigua del scratchpad
+        """
+        self.total_tokens = total_tokens
+        self.reserved_output = reserved_output
+        self.scratchpad_share = scratchpad_share
+        self.summary_share = summary_share
+        self.summary_line_tokens = summary_line_tokens
+        self.min_observation_tokens = min_observation_tokens
+
+    @classmethod
+    def for_model(cls, model_name: str, max_tokens: Optional[int] = None, **kwargs) -> "PromptBudget":
+        """
+        Presupuesto fijo por request, acotado por la ventana de contexto del modelo
+
+        Args:
+            model_name: Modelo del LLM (ej: gpt-3.5-turbo, gpt-4o)
+            max_tokens: Tope por request; None = AGENT_TOKEN_BUDGET o DEFAULT_TOKEN_BUDGET.
+                Nunca supera la ventana del modelo
+            **kwargs: Resto de parámetros de PromptBudget (reserved_output, scratchpad_share, ...)
+        """
+        if max_tokens is None:
+            max_tokens = int(os.getenv("AGENT_TOKEN_BUDGET") or DEFAULT_TOKEN_BUDGET)
+        return cls(total_tokens=min(max_tokens, get_context_window(model_name)), **kwargs)
+
+
+class PromptAssembler:
+    """
+    Construye el contexto conversacional dentro del presupuesto y recorta el scratchpad
+
+    - Turnos recientes: textuales, del más nuevo al más antiguo mientras quepan
+    - Turnos antiguos: una línea compacta por mensaje (resumen móvil)
+    - Si el resumen no cabe: se conservan los turnos más relevantes para la consulta actual
+    """
+
+    def __init__(self, fixed_prompt: str, counter: TokenCounter, budget: Optional[PromptBudget] = None,
+                 system_prompt: str = "", tools_description: str = ""):
+        """
+        Args:
+            fixed_prompt: Prompt completo sin input ni scratchpad (sistema + herramientas + formato)
+            counter: Contador de tokens del modelo
+            budget: Reparto de tokens (por defecto PromptBudget())
+            system_prompt: Parte de sistema (solo para el desglose de estadísticas)
+            tools_description: Descripción de herramientas (solo para el desglose)
+        """
+        self.counter = counter
+        self.budget = budget or PromptBudget()
+
+        self.fixed_tokens = counter.count(fixed_prompt)
+        self.system_tokens = counter.count(system_prompt)
+        self.tools_tokens = counter.count(tools_description)
+
+        available = self.budget.total_tokens - self.budget.reserved_output - self.fixed_tokens
+        if available <= 0:
+            print(f"⚠️ El prompt fijo ({self.fixed_tokens} tokens) excede el presupuesto de {self.budget.total_tokens}")
+        self.available_tokens = max(0, available)
+        self.scratchpad_budget = int(self.available_tokens * self.budget.scratchpad_share)
+
+        self._lock = threading.Lock()
+        self.last_breakdown: Dict[str, Any] = {}
+        self.stats = {
+            "requests": 0,
+            "history_tokens": 0,
+            "raw_history_tokens": 0,
+            "compacted_messages": 0,
+            "dropped_messages": 0,
+            "scratchpad_trims": 0
+        }
+
+    # ============= HISTORIAL =============
+
+    def _format_message(self, message: Dict[str, str]) -> str:
+        role = message.get("role", "user")
+        return f"{role.capitalize()}: {message.get('content', '')}"
+
+    def _compact_message(self, message: Dict[str, str]) -> str:
+        """Primera oración del mensaje, acotada a summary_line_tokens"""
+        content = " ".join(message.get("content", "").split())
+        first_sentence = _SENTENCE_RE.split(content, maxsplit=1)[0]
+        role = "Cliente" if message.get("role", "user") == "user" else "Agente"
+        return "- " + self.counter.truncate(f"{role}: {first_sentence}", self.budget.summary_line_tokens)
+
+    def _relevance(self, text: str, query_terms: set) -> float:
+        terms = set(tokenizar(text))
+        if not terms or not query_terms:
+            return 0.0
+        return len(terms & query_terms) / len(terms | query_terms)
+
+    def build_history(self, chat_history: List[Dict[str, str]], query: str) -> str:
+        """
+        Contexto conversacional que cabe en el presupuesto de historial de esta consulta
+
+        Args:
+            chat_history: Mensajes [{role, content}] en orden cronológico
+            query: Consulta actual (define la relevancia de los turnos antiguos)
+        """
+        query_tokens = self.counter.count(query)
+        history_budget = max(0, self.available_tokens - self.scratchpad_budget - query_tokens)
+        recent_budget = int(history_budget * (1 - self.budget.summary_share))
+
+        raw_tokens = sum(self.counter.count(self._format_message(m)) for m in chat_history)
+
+        # Turnos recientes textuales (desde el final)
+        recent: List[str] = []
+        used = self.counter.count(RECENT_HEADER)
+        cut = len(chat_history)
+        for idx in range(len(chat_history) - 1, -1, -1):
+            line = self._format_message(chat_history[idx])
+            tokens = self.counter.count(line)
+            if used + tokens > recent_budget:
+                if not recent and recent_budget - used > 0:
+                    # El último mensaje siempre aporta contexto, aunque sea recortado
+                    recent.append(self.counter.truncate(line, recent_budget - used))
+                    used = recent_budget
+                    cut = idx
+                break
+            recent.append(line)
+            used += tokens
+            cut = idx
+        recent.reverse()
+
+        # Turnos antiguos: compactados y, si no caben, filtrados por relevancia
+        older = chat_history[:cut]
+        summary_lines = [self._compact_message(m) for m in older]
+        summary_budget = history_budget - used - self.counter.count(SUMMARY_HEADER)
+        dropped = 0
+
+        if summary_lines and sum(self.counter.count(l) for l in summary_lines) > summary_budget:
+            query_terms = set(tokenizar(query))
+            # Más relevante primero; a igual relevancia, el más reciente
+            ranked = sorted(
+                range(len(summary_lines)),
+                key=lambda i: (self._relevance(older[i].get("content", ""), query_terms), i),
+                reverse=True
+            )
+            keep, spent = set(), 0
+            for i in ranked:
+                tokens = self.counter.count(summary_lines[i])
+                if spent + tokens <= summary_budget:
+                    keep.add(i)
+                    spent += tokens
+            dropped = len(summary_lines) - len(keep)
+            summary_lines = [line for i, line in enumerate(summary_lines) if i in keep]
+
+        parts = []
+        if summary_lines:
+            parts.append(SUMMARY_HEADER + "\n" + "\n".join(summary_lines))
+        if recent:
+            parts.append(RECENT_HEADER + "\n" + "\n".join(recent) if summary_lines else "\n".join(recent))
+        context = "\n\n".join(parts)
+
+        history_tokens = self.counter.count(context)
+        with self._lock:
+            self.stats["requests"] += 1
+            self.stats["history_tokens"] += history_tokens
+            self.stats["raw_history_tokens"] += raw_tokens
+            self.stats["compacted_messages"] += len(older) - dropped
+            self.stats["dropped_messages"] += dropped
+            self.last_breakdown = {
+                "total_budget": self.budget.total_tokens,
+                "reserved_output": self.budget.reserved_output,
+                "system": self.system_tokens,
+                "tools": self.tools_tokens,
+                "fixed": self.fixed_tokens,
+                "query": query_tokens,
+                "history": history_tokens,
+                "history_budget": history_budget,
+                "scratchpad_budget": self.scratchpad_budget
+            }
+
+        return context
+
+    # ============= SCRATCHPAD =============
+
+    def trim_intermediate_steps(self, steps: List[Tuple[Any, str]]) -> List[Tuple[Any, str]]:
+        """
+        Recorta las observaciones (primero las más antiguas) para que el scratchpad quepa en su presupuesto
+        La observación más reciente se conserva completa: es la que el LLM necesita para decidir el
+        siguiente paso; solo se recorta si no cabe en todo el espacio variable de la ventana
+        Se usa como trim_intermediate_steps del AgentExecutor; el resultado devuelto al usuario no cambia
+        """
+        def step_tokens(step):
+            action, observation = step
+            return self.counter.count(getattr(action, "log", "")) + self.counter.count(str(observation))
+
+        total = sum(step_tokens(s) for s in steps)
+        if total <= self.scratchpad_budget:
+            return steps
+
+        trimmed = list(steps)
+        for idx in range(len(trimmed) - 1):
+            if total <= self.scratchpad_budget:
+                break
+            action, observation = trimmed[idx]
+            before = step_tokens(trimmed[idx])
+            short = self.counter.truncate(str(observation), self.budget.min_observation_tokens)
+            trimmed[idx] = (action, short)
+            total -= before - step_tokens(trimmed[idx])
+
+        # La última observación solo se recorta si ni siquiera cabe en el espacio variable completo
+        if total > self.available_tokens and trimmed:
+            action, observation = trimmed[-1]
+            rest = total - step_tokens(trimmed[-1])
+            room = max(self.budget.min_observation_tokens,
+                       self.available_tokens - rest - self.counter.count(getattr(action, "log", "")))
+            trimmed[-1] = (action, self.counter.truncate(str(observation), room))
+
+        with self._lock:
+            self.stats["scratchpad_trims"] += 1
+        return trimmed
+
+    # ============= ESTADÍSTICAS =============
+
+    def get_statistics(self) -> Dict[str, Any]:
+        with self._lock:
+            stats = dict(self.stats)
+            stats["last_breakdown"] = dict(self.last_breakdown)
+        requests = stats["requests"]
+        stats["avg_history_tokens"] = round(stats["history_tokens"] / requests, 1) if requests else 0
+        stats["avg_raw_history_tokens"] = round(stats["raw_history_tokens"] / requests, 1) if requests else 0
+        stats["history_tokens_saved"] = stats["raw_history_tokens"] - stats["history_tokens"]
+        stats["exact_token_count"] = self.counter.exact
+        return stats
@@ -0,0 +1,229 @@
+"""
+Cache de respuestas del agente
+Nivel exacto (consulta normalizada + huella de contexto) y nivel semántico opcional por embeddings
+"""
+
+import copy
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Optional
+
+import numpy as np
+
+from ..text_utils import tokenizar
+
+# Valor por defecto de put(state=...): sin versión capturada no se compara
+_UNSET = object()
+
+
+def normalize_query(query: str) -> str:
+    """'¿Tienen  Tortas veganas?' -> 'tienen tortas veganas'"""
+    return " ".join(tokenizar(query, stemming=False, quitar_stopwords=False))
+
+
+def context_fingerprint(context: str) -> str:
+    """Huella del contexto conversacional que ve el agente ('' si no hay historial)"""
+    if not context:
+        return ""
+    return hashlib.sha1(normalize_query(context).encode("utf-8")).hexdigest()[:16]
+
+
+class ResponseCache:
+    """
+    Cache de respuestas completas de PasteleriaAgentExecutor.execute
+
+    - Nivel exacto: clave = consulta normalizada + huella de contexto
+    - Nivel semántico (opcional): similitud coseno de embeddings >= umbral, mismo contexto
+    - TTL por entrada e invalidación total cuando cambia el estado (catálogo / reglas de descuento)
+    """
+
+    def __init__(
+        self,
+        ttl_seconds: float = 3600.0,
+        max_entries: int = 1000,
+        embeddings: Any = None,
+        similarity_threshold: float = 0.95,
+        state_fn: Optional[Callable[[], Any]] = None
+    ):
+        """
+        Args:
+            ttl_seconds: Vida de cada respuesta cacheada
+            max_entries: Máximo de respuestas (LRU)
+            embeddings: Objeto con embed_query (activa el nivel semántico); None = solo exacto
+            similarity_threshold: Similitud coseno mínima para un hit semántico
+            state_fn: Retorna la versión del estado del que dependen las respuestas
+        """
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self.embeddings = embeddings
+        self.similarity_threshold = similarity_threshold
+        self.state_fn = state_fn
+
+        self._entries: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._state = state_fn() if state_fn else None
+
+        self.stats = {
+            "lookups": 0,
+            "exact_hits": 0,
+            "semantic_hits": 0,
+            "misses": 0,
+            "expired": 0,
+            "invalidations": 0,
+            "stores": 0,
+            "stale_skips": 0
+        }
+
+    def bind_state(self, state_fn: Callable[[], Any]):
+        """Asocia la función de versión de estado y toma el estado actual como referencia"""
+        with self._lock:
+            self.state_fn = state_fn
+            self._state = state_fn()
+
+    @staticmethod
+    def _key(normalized: str, fingerprint: str) -> str:
+        return hashlib.sha1(f"{fingerprint}\x00{normalized}".encode("utf-8")).hexdigest()
+
+    def current_state(self) -> Any:
+        """
+        Versión del estado ahora (None si no hay state_fn)
+        El executor la toma antes de calcular una respuesta y la pasa a put
+        """
+        return self.state_fn() if self.state_fn else None
+
+    def _check_state(self):
+        """Si cambió el catálogo o las reglas, todas las respuestas previas quedan inválidas"""
+        if self.state_fn is None:
+            return
+        state = self.state_fn()
+        if state != self._state:
+            if self._entries:
+                self.stats["invalidations"] += 1
+            self._entries.clear()
+            self._state = state
+
+    def _embed(self, normalized: str) -> Optional[np.ndarray]:
+        if self.embeddings is None:
+            return None
+        vector = np.asarray(self.embeddings.embed_query(normalized), dtype=np.float32)
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else vector
+
+    def _mark_cached(self, response: Dict[str, Any], tier: str, similarity: Optional[float]) -> Dict[str, Any]:
+        cached = copy.deepcopy(response)
+        cached["cached"] = True
+        cached["cache_tier"] = tier
+        if similarity is not None:
+            cached["cache_similarity"] = round(similarity, 4)
+        for step in cached.get("execution_trace", []):
+            step["cached"] = True
+        return cached
+
+    # ============= API =============
+
+    def get(self, query: str, context: str = "") -> Optional[Dict[str, Any]]:
+        """
+        Busca una respuesta cacheada
+
+        Returns:
+            Copia de la respuesta marcada como cacheada, o None
+        """
+        normalized = normalize_query(query)
+        fingerprint = context_fingerprint(context)
+        key = self._key(normalized, fingerprint)
+        now = time.monotonic()
+
+        with self._lock:
+            self.stats["lookups"] += 1
+            self._check_state()
+
+            # Nivel 1: coincidencia exacta
+            entry = self._entries.get(key)
+            if entry is not None:
+                if entry["expires_at"] <= now:
+                    del self._entries[key]
+                    self.stats["expired"] += 1
+                else:
+                    self._entries.move_to_end(key)
+                    self.stats["exact_hits"] += 1
+                    return self._mark_cached(entry["response"], "exact", None)
+
+            if self.embeddings is None:
+                self.stats["misses"] += 1
+                return None
+
+            candidates = [
+                (k, e) for k, e in self._entries.items()
+                if e["fingerprint"] == fingerprint and e["vector"] is not None and e["expires_at"] > now
+            ]
+            state = self._state
+
+        # Nivel 2: similitud semántica (el embedding se calcula fuera del lock)
+        if candidates:
+            vector = self._embed(normalized)
+            matrix = np.stack([e["vector"] for _, e in candidates])
+            similarities = matrix @ vector
+            best = int(np.argmax(similarities))
+            if float(similarities[best]) >= self.similarity_threshold:
+                best_key, best_entry = candidates[best]
+                with self._lock:
+                    # El estado pudo cambiar (o la entrada invalidarse) mientras se comparaban vectores
+                    self._check_state()
+                    if self._state == state and self._entries.get(best_key) is best_entry:
+                        self._entries.move_to_end(best_key)
+                        self.stats["semantic_hits"] += 1
+                        return self._mark_cached(best_entry["response"], "semantic", float(similarities[best]))
+
+        with self._lock:
+            self.stats["misses"] += 1
+        return None
+
+    def put(self, query: str, response: Dict[str, Any], context: str = "", state: Any = _UNSET):
+        """
+        Guarda una respuesta exitosa
+
+        Args:
+            state: Versión del estado con que se calculó la respuesta (current_state() antes de calcularla);
+                si el catálogo o las reglas cambiaron entretanto, la respuesta no se guarda
+        """
+        if not response.get("success"):
+            return
+
+        normalized = normalize_query(query)
+        fingerprint = context_fingerprint(context)
+        vector = self._embed(normalized)
+
+        with self._lock:
+            self._check_state()
+            if state is not _UNSET and state != self._state:
+                self.stats["stale_skips"] += 1
+                return
+            self._entries[self._key(normalized, fingerprint)] = {
+                "response": copy.deepcopy(response),
+                "fingerprint": fingerprint,
+                "vector": vector,
+                "expires_at": time.monotonic() + self.ttl_seconds
+            }
+            self.stats["stores"] += 1
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def invalidate(self):
+        """Invalida manualmente todas las respuestas"""
+        with self._lock:
+            self._entries.clear()
+            self.stats["invalidations"] += 1
+
+    def get_statistics(self) -> Dict[str, Any]:
+        """Hit rate total y por nivel"""
+        with self._lock:
+            stats = dict(self.stats)
+            stats["entries"] = len(self._entries)
+        lookups = stats["lookups"]
+        hits = stats["exact_hits"] + stats["semantic_hits"]
+        stats["hit_rate"] = round(hits / lookups * 100, 2) if lookups else 0.0
+        stats["exact_hit_rate"] = round(stats["exact_hits"] / lookups * 100, 2) if lookups else 0.0
+        stats["semantic_hit_rate"] = round(stats["semantic_hits"] / lookups * 100, 2) if lookups else 0.0
+        return stats
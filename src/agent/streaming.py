@@ -0,0 +1,102 @@
+"""
+Streaming de eventos del agente
+Convierte los callbacks de LangChain en eventos (pensamiento, herramientas, tokens de la respuesta final)
+que la interfaz puede renderizar a medida que ocurren
+"""
+
+import queue
+import re
+import time
+from typing import Any, Dict, Iterator, List, Optional
+
+from langchain_core.callbacks import BaseCallbackHandler
+
+FINAL_ANSWER_MARKER = "Final Answer:"
+
+_CHUNK_RE = re.compile(r"\S+\s*|\s+")
+
+
+def split_tokens(text: str) -> List[str]:
+    """Divide un texto en palabras (con su espacio) para emitirlo de forma incremental"""
+    return _CHUNK_RE.findall(text)
+
+
+class AgentEventStreamHandler(BaseCallbackHandler):
+    """
+    Callback que publica en una cola los eventos del agente
+
+    Eventos (dicts con "type"):
+        - thought: {"content"}
+        - tool_start: {"tool", "tool_input"}
+        - tool_end: {"tool", "observation"}
+        - token: {"content"} (solo la parte posterior a "Final Answer:")
+    """
+
+    def __init__(self, events: "queue.Queue", start_time: Optional[float] = None):
+        self.events = events
+        self.start_time = start_time if start_time is not None else time.perf_counter()
+        self.first_token_at: Optional[float] = None
+        self.tokens_emitted = 0
+        self._buffers: Dict[Any, str] = {}
+        self._answer_runs = set()
+
+    # ============= TOKENS =============
+
+    def token_event(self, token: str) -> Dict[str, Any]:
+        """Registra el token (y el tiempo al primero) y retorna su evento"""
+        if self.first_token_at is None:
+            self.first_token_at = time.perf_counter()
+        self.tokens_emitted += 1
+        return {"type": "token", "content": token}
+
+    @property
+    def time_to_first_token(self) -> Optional[float]:
+        if self.first_token_at is None:
+            return None
+        return round(self.first_token_at - self.start_time, 4)
+
+    def on_llm_start(self, serialized: Dict[str, Any], prompts: List[str], *, run_id=None, **kwargs: Any):
+        self._buffers[run_id] = ""
+
+    def on_chat_model_start(self, serialized: Dict[str, Any], messages: Any, *, run_id=None, **kwargs: Any):
+        self._buffers[run_id] = ""
+
+    def on_llm_new_token(self, token: str, *, run_id=None, **kwargs: Any):
+        if run_id in self._answer_runs:
+            self.events.put(self.token_event(token))
+            return
+
+        # Solo se transmite la respuesta final; el razonamiento llega como eventos de paso
+        buffer = self._buffers.get(run_id, "") + token
+        self._buffers[run_id] = buffer
+        if FINAL_ANSWER_MARKER in buffer:
+            self._answer_runs.add(run_id)
+            rest = buffer.split(FINAL_ANSWER_MARKER, 1)[1].lstrip()
+            if rest:
+                self.events.put(self.token_event(rest))
+
+    def on_llm_end(self, response: Any, *, run_id=None, **kwargs: Any):
+        self._buffers.pop(run_id, None)
+
+    # ============= PASOS DEL AGENTE =============
+
+    def on_agent_action(self, action: Any, **kwargs: Any):
+        thought = getattr(action, "log", "").split("Action:")[0].replace("Thought:", "").strip()
+        if thought:
+            self.events.put({"type": "thought", "content": thought})
+        self.events.put({"type": "tool_start", "tool": action.tool, "tool_input": action.tool_input})
+
+    def on_tool_end(self, output: Any, **kwargs: Any):
+        self.events.put({"type": "tool_end", "tool": kwargs.get("name"), "observation": str(output)})
+
+    def on_tool_error(self, error: BaseException, **kwargs: Any):
+        self.events.put({"type": "tool_end", "tool": kwargs.get("name"), "observation": f"❌ {error}"})
+
+
+def drain(events: "queue.Queue", sentinel: Any) -> Iterator[Dict[str, Any]]:
+    """Entrega eventos de la cola hasta recibir el centinela"""
+    while True:
+        event = events.get()
+        if event is sentinel:
+            return
+        yield event
@@ -6,11 +6,161 @@ Cada herramienta es una acción específica que el agente puede ejecutar de form
 from langchain.tools import BaseTool
 from typing import Optional, Type, List, Dict, Any
 from pydantic import BaseModel, Field
+from collections import OrderedDict
+import asyncio
+import functools
+import inspect
 import json
+import threading
+import time
 import pandas as pd
 from datetime import datetime
 
 
+
+# ==================== MEMOIZACIÓN DE RESULTADOS ====================
+
+# TTL (segundos) por herramienta: el inventario y el historial cambian más seguido
+TOOL_CACHE_TTLS = {
+    "search_products": 600,
+    "calculate_discount": 600,
+    "check_inventory": 60,
+    "customer_history": 30
+}
+
+
+class ToolResultCache:
+    """
+    Cache LRU con TTL para resultados de una herramienta
+    Se vacía completo cuando cambia la versión del catálogo
+    """
+    
+    def __init__(self, ttl_seconds: float = 300, max_entries: int = 256):
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._catalog_version = None
+        self.stats = {"hits": 0, "misses": 0, "expired": 0, "invalidations": 0}
+    
+    def get(self, key: str, catalog_version: Any) -> Optional[str]:
+        with self._lock:
+            if catalog_version != self._catalog_version:
+                if self._entries:
+                    self.stats["invalidations"] += 1
+                self._entries.clear()
+                self._catalog_version = catalog_version
+            
+            entry = self._entries.get(key)
+            if entry is not None:
+                value, expires_at = entry
+                if expires_at > time.monotonic():
+                    self._entries.move_to_end(key)
+                    self.stats["hits"] += 1
+                    return value
+                del self._entries[key]
+                self.stats["expired"] += 1
+            
+            self.stats["misses"] += 1
+            return None
+    
+    def put(self, key: str, value: str, catalog_version: Any):
+        with self._lock:
+            if catalog_version != self._catalog_version:
+                self._entries.clear()
+                self._catalog_version = catalog_version
+            self._entries[key] = (value, time.monotonic() + self.ttl_seconds)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+    
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.stats["invalidations"] += 1
+    
+    def get_statistics(self) -> Dict[str, Any]:
+        with self._lock:
+            stats = dict(self.stats)
+            stats["entries"] = len(self._entries)
+        total = stats["hits"] + stats["misses"]
+        stats["hit_rate"] = round(stats["hits"] / total * 100, 2) if total else 0.0
+        return stats
+
+
+def memoize_tool(run_fn):
+    """
+    Decorador para _run de herramientas con campo result_cache
+    La clave se deriva del args_schema (valores validados y con defaults aplicados),
+    así 'TC001' con quantity=1 explícito o implícito comparten resultado
+    Si la herramienta tiene campo metrics, cada llamada (también los aciertos de cache) registra su latencia
+    """
+    signature = inspect.signature(run_fn)
+    
+    @functools.wraps(run_fn)
+    def wrapper(self, *args, **kwargs):
+        metrics = getattr(self, "metrics", None)
+        if metrics is None:
+            return cached_run(self, *args, **kwargs)
+        
+        start = time.perf_counter()
+        try:
+            return cached_run(self, *args, **kwargs)
+        finally:
+            try:
+                metrics.record_tool_latency(self.name, time.perf_counter() - start)
+            except Exception as e:
+                print(f"⚠️ No se pudo registrar la latencia de {self.name}: {e}")
+    
+    def cached_run(self, *args, **kwargs):
+        cache = getattr(self, "result_cache", None)
+        if cache is None:
+            return run_fn(self, *args, **kwargs)
+        
+        bound = signature.bind(self, *args, **kwargs)
+        bound.apply_defaults()
+        arguments = {k: v for k, v in bound.arguments.items() if k != "self"}
+        try:
+            validated = self.args_schema(**arguments)
+            arguments = validated.model_dump() if hasattr(validated, "model_dump") else validated.dict()
+        except Exception:
+            pass  # Si no valida, se usa la clave con los argumentos tal cual
+        key = json.dumps(arguments, sort_keys=True, ensure_ascii=False, default=str)
+        
+        catalog_version = getattr(self.data_loader, "version_catalogo", None)
+        cached = cache.get(key, catalog_version)
+        if cached is not None:
+            return cached
+        
+        result = run_fn(self, *args, **kwargs)
+        
+        # No se memoizan errores: el siguiente intento debe reejecutar
+        # La versión se relee: la primera ejecución puede haber construido el catálogo
+        if isinstance(result, str) and not result.startswith("❌"):
+            cache.put(key, result, getattr(self.data_loader, "version_catalogo", None))
+        return result
+    
+    return wrapper
+
+
+def get_tools_cache_statistics(tools: List[BaseTool]) -> Dict[str, Dict[str, Any]]:
+    """Hit rate de la memoización por herramienta"""
+    return {
+        tool.name: tool.result_cache.get_statistics()
+        for tool in tools
+        if getattr(tool, "result_cache", None) is not None
+    }
+
+
+# ==================== BÚSQUEDA: LÍMITES Y MENSAJES ====================
+
+# Máximo de productos que lista search_products
+SEARCH_TOP_K = 10
+
+# Inicio del mensaje de search_products cuando no hay coincidencias
+SEARCH_NO_RESULTS = "No se encontraron productos"
+
+
 # ==================== SCHEMA DE INPUTS PARA TOOLS ====================
 
 class SearchProductsInput(BaseModel):
@@ -61,56 +211,25 @@ class SearchProductsTool(BaseTool):
     args_schema: Type[BaseModel] = SearchProductsInput
     data_loader: Any = Field(default=None)
     
+    result_cache: Any = Field(default=None)
+    metrics: Any = Field(default=None)
+    
+    @memoize_tool
     def _run(self, query: str, category: Optional[str] = None, max_price: Optional[float] = None) -> str:
         """Ejecuta la búsqueda de productos"""
         try:
-            # Cargar todos los productos (obtener los diccionarios directamente)
-            self.data_loader.cargar_productos()  # Esto carga self.productos
-            productos = self.data_loader.productos  # Acceder a la lista de diccionarios
-            
-            # Convertir a formato estructurado
-            query_lower = query.lower()
-            resultados = []
-            
-            for producto in productos:
-                if not isinstance(producto, dict):
-                    continue
-                    
-                match = False
-                
-                # Filtrar por categoría si se especifica
-                if category:
-                    cat_producto = producto.get('categoria', '').lower()
-                    if category.lower() not in cat_producto and cat_producto not in category.lower():
-                        continue
-                
-                # Filtrar por precio máximo
-                if max_price and producto.get('precio', 0) > max_price:
-                    continue
-                
-                # Búsqueda por términos en nombre, descripción, categoría
-                nombre = producto.get('nombre', '').lower()
-                descripcion = producto.get('descripcion', '').lower()
-                categoria = producto.get('categoria', '').lower()
-                ingredientes = ' '.join(producto.get('ingredientes', [])).lower()
-                
-                # Buscar coincidencias
-                texto_completo = f"{nombre} {descripcion} {categoria} {ingredientes}"
-                
-                for term in query_lower.split():
-                    if term in texto_completo:
-                        match = True
-                        break
-                
-                if match:
-                    resultados.append(producto)
+            # Índice invertido BM25 (se construye una sola vez sobre el catálogo)
+            indice = self.data_loader.obtener_indice_busqueda()
             
-            if not resultados:
-                return f"No se encontraron productos que coincidan con '{query}'"
+            # Los filtros se aplican como intersección de posting lists; resultados ya rankeados
+            resultados = [
+                producto for producto, _score in indice.buscar(
+                    query, category=category, max_price=max_price, top_k=SEARCH_TOP_K
+                )
+            ]
             
-            # Formatear resultados
-            if len(resultados) > 10:
-                resultados = resultados[:10]  # Limitar a 10 resultados
+            if not resultados:
+                return f"{SEARCH_NO_RESULTS} que coincidan con '{query}'"
             
             response = f"✅ Encontré {len(resultados)} producto(s) relacionado(s) con '{query}':\n\n"
             
@@ -127,8 +246,8 @@ class SearchProductsTool(BaseTool):
             return f"❌ Error al buscar productos: {str(e)}"
     
     async def _arun(self, query: str, category: Optional[str] = None, max_price: Optional[float] = None) -> str:
-        """Versión asíncrona (no implementada)"""
-        return self._run(query, category, max_price)
+        """Versión asíncrona: se ejecuta en un hilo para no bloquear el event loop"""
+        return await asyncio.to_thread(self._run, query, category, max_price)
 
 
 # ==================== TOOL 2: CÁLCULO DE DESCUENTOS ====================
@@ -156,6 +275,10 @@ class CalculateDiscountTool(BaseTool):
     data_loader: Any = Field(default=None)
     discount_calculator: Any = Field(default=None)
     
+    result_cache: Any = Field(default=None)
+    metrics: Any = Field(default=None)
+    
+    @memoize_tool
     def _run(
         self, 
         product_code: str, 
@@ -166,14 +289,8 @@ class CalculateDiscountTool(BaseTool):
     ) -> str:
         """Ejecuta el cálculo de descuentos"""
         try:
-            # Buscar el producto
-            productos = self.data_loader.cargar_productos()
-            producto = None
-            
-            for p in productos:
-                if isinstance(p, dict) and p.get('codigo') == product_code:
-                    producto = p
-                    break
+            # Buscar el producto (índice por código, O(1))
+            producto = self.data_loader.obtener_producto(product_code)
             
             if not producto:
                 return f"❌ No se encontró el producto con código '{product_code}'"
@@ -239,8 +356,8 @@ class CalculateDiscountTool(BaseTool):
         customer_email: Optional[str] = None,
         quantity: int = 1
     ) -> str:
-        """Versión asíncrona"""
-        return self._run(product_code, customer_age, promo_code, customer_email, quantity)
+        """Versión asíncrona: se ejecuta en un hilo para no bloquear el event loop"""
+        return await asyncio.to_thread(self._run, product_code, customer_age, promo_code, customer_email, quantity)
 
 
 # ==================== TOOL 3: VERIFICACIÓN DE INVENTARIO ====================
@@ -262,17 +379,15 @@ class CheckInventoryTool(BaseTool):
     args_schema: Type[BaseModel] = CheckInventoryInput
     data_loader: Any = Field(default=None)
     
+    result_cache: Any = Field(default=None)
+    metrics: Any = Field(default=None)
+    
+    @memoize_tool
     def _run(self, product_code: str, capacity_needed: Optional[int] = None) -> str:
         """Verifica inventario y capacidad"""
         try:
-            # Buscar el producto
-            productos = self.data_loader.cargar_productos()
-            producto = None
-            
-            for p in productos:
-                if isinstance(p, dict) and p.get('codigo') == product_code:
-                    producto = p
-                    break
+            # Buscar el producto (índice por código, O(1))
+            producto = self.data_loader.obtener_producto(product_code)
             
             if not producto:
                 return f"❌ No se encontró el producto con código '{product_code}'"
@@ -330,8 +445,8 @@ class CheckInventoryTool(BaseTool):
             return 8
     
     async def _arun(self, product_code: str, capacity_needed: Optional[int] = None) -> str:
-        """Versión asíncrona"""
-        return self._run(product_code, capacity_needed)
+        """Versión asíncrona: se ejecuta en un hilo para no bloquear el event loop"""
+        return await asyncio.to_thread(self._run, product_code, capacity_needed)
 
 
 # ==================== TOOL 4: HISTORIAL DEL CLIENTE ====================
@@ -353,6 +468,10 @@ class CustomerHistoryTool(BaseTool):
     args_schema: Type[BaseModel] = CustomerHistoryInput
     data_loader: Any = Field(default=None)
     
+    result_cache: Any = Field(default=None)
+    metrics: Any = Field(default=None)
+    
+    @memoize_tool
     def _run(self, customer_id: Optional[str] = None, customer_email: Optional[str] = None) -> str:
         """Consulta historial del cliente"""
         try:
@@ -417,19 +536,21 @@ class CustomerHistoryTool(BaseTool):
             return f"ℹ️ No se pudo acceder al historial: {str(e)}\nPero con gusto te ayudo a encontrar lo que buscas."
     
     async def _arun(self, customer_id: Optional[str] = None, customer_email: Optional[str] = None) -> str:
-        """Versión asíncrona"""
-        return self._run(customer_id, customer_email)
+        """Versión asíncrona: se ejecuta en un hilo para no bloquear el event loop"""
+        return await asyncio.to_thread(self._run, customer_id, customer_email)
 
 
 # ==================== FUNCIÓN HELPER PARA INICIALIZAR TOOLS ====================
 
-def initialize_tools(data_loader, discount_calculator) -> List[BaseTool]:
+def initialize_tools(data_loader, discount_calculator, memoize: bool = True, metrics: Any = None) -> List[BaseTool]:
     """
     Inicializa todas las herramientas con las dependencias necesarias
     
     Args:
         data_loader: Instancia de PasteleriaDataLoader
         discount_calculator: Instancia de DiscountCalculator
+        memoize: Si True, cada herramienta memoiza sus resultados (LRU + TTL por herramienta)
+        metrics: Destino de las latencias por herramienta (ej: ObservabilityMetrics); None = no se registran
     
     Returns:
         Lista de herramientas listas para usar con el agente
@@ -441,4 +562,11 @@ def initialize_tools(data_loader, discount_calculator) -> List[BaseTool]:
         CustomerHistoryTool(data_loader=data_loader)
     ]
     
+    if memoize:
+        for tool in tools:
+            tool.result_cache = ToolResultCache(ttl_seconds=TOOL_CACHE_TTLS.get(tool.name, 300))
+    
+    for tool in tools:
+        tool.metrics = metrics
+    
     return tools
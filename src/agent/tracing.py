@@ -0,0 +1,76 @@
+"""
+Spans de las llamadas al LLM y a herramientas dentro del agente
+Convierte los callbacks de LangChain (con run_id / parent_run_id) en spans hijos del span del agente;
+funciona también con herramientas ejecutadas en paralelo en otros hilos
+"""
+
+import threading
+from typing import Any, Dict, List, Optional
+
+from langchain_core.callbacks import BaseCallbackHandler
+
+from ..monitoring.tracing import Span, Tracer
+
+
+class TracingCallbackHandler(BaseCallbackHandler):
+    """Abre un span por llamada al LLM (llm) y por herramienta (tool.<nombre>)"""
+
+    def __init__(self, tracer: Tracer, parent: Span):
+        """
+        Args:
+            tracer: Tracer que crea y exporta los spans
+            parent: Span bajo el que cuelgan las llamadas (ej: agent.invoke)
+        """
+        self.tracer = tracer
+        self.parent = parent
+        self._spans: Dict[Any, Span] = {}
+        self._lock = threading.Lock()
+
+    def _start(self, name: str, run_id, parent_run_id, **attributes) -> Span:
+        with self._lock:
+            parent = self._spans.get(parent_run_id, self.parent)
+            span = self.tracer.start_span(name, parent, **attributes)
+            self._spans[run_id] = span
+        return span
+
+    def _end(self, run_id, error: Optional[BaseException] = None, **attributes):
+        with self._lock:
+            span = self._spans.pop(run_id, None)
+        if span is None:
+            return
+        for key, value in attributes.items():
+            span.set_attribute(key, value)
+        if error is not None:
+            span.set_error(f"{type(error).__name__}: {error}")
+        span.end()
+
+    # ============= LLM =============
+
+    def on_llm_start(self, serialized: Dict[str, Any], prompts: List[str], *, run_id=None,
+                     parent_run_id=None, **kwargs: Any):
+        self._start("llm", run_id, parent_run_id, prompt_chars=sum(len(p) for p in prompts))
+
+    def on_chat_model_start(self, serialized: Dict[str, Any], messages: Any, *, run_id=None,
+                            parent_run_id=None, **kwargs: Any):
+        self._start("llm", run_id, parent_run_id)
+
+    def on_llm_end(self, response: Any, *, run_id=None, **kwargs: Any):
+        usage = (getattr(response, "llm_output", None) or {}).get("token_usage") or {}
+        attributes = {f"llm.{key}": value for key, value in usage.items() if isinstance(value, int)}
+        self._end(run_id, **attributes)
+
+    def on_llm_error(self, error: BaseException, *, run_id=None, **kwargs: Any):
+        self._end(run_id, error)
+
+    # ============= HERRAMIENTAS =============
+
+    def on_tool_start(self, serialized: Dict[str, Any], input_str: str, *, run_id=None,
+                      parent_run_id=None, **kwargs: Any):
+        name = (serialized or {}).get("name") or kwargs.get("name") or "tool"
+        self._start(f"tool.{name}", run_id, parent_run_id, tool=name, input_chars=len(input_str or ""))
+
+    def on_tool_end(self, output: Any, *, run_id=None, **kwargs: Any):
+        self._end(run_id, output_chars=len(str(output)))
+
+    def on_tool_error(self, error: BaseException, *, run_id=None, **kwargs: Any):
+        self._end(run_id, error)
@@ -1,14 +1,99 @@
 import json
+import bisect
 import pandas as pd
+from collections import defaultdict
+
+
+class CatalogoIndexado:
+    """
+    Catálogo de productos en memoria con índices precalculados
+    Se construye una sola vez y permite búsquedas sin recorrer la lista completa
+    """
+    
+    FLAGS = ("personalizable", "disponible")
+    
+    def __init__(self, productos):
+        self.productos = list(productos)
+        
+        # Índice hash principal por código (O(1))
+        self.por_codigo = {}
+        
+        # Índices secundarios: clave -> lista de productos (en orden de catálogo)
+        self.por_categoria = defaultdict(list)
+        self.por_ingrediente = defaultdict(list)
+        self.por_flag = {flag: [] for flag in self.FLAGS}
+        
+        for producto in self.productos:
+            self.por_codigo[producto["codigo"].upper()] = producto
+            self.por_categoria[producto["categoria"].lower()].append(producto)
+            
+            for ingrediente in producto.get("ingredientes", []):
+                self.por_ingrediente[ingrediente.lower()].append(producto)
+            
+            for flag in self.FLAGS:
+                if producto.get(flag):
+                    self.por_flag[flag].append(producto)
+        
+        # Arreglo de precios ordenado para consultas por rango (bisect)
+        ordenados = sorted(self.productos, key=lambda p: p.get("precio", 0))
+        self._precios = [p.get("precio", 0) for p in ordenados]
+        self._productos_por_precio = ordenados
+    
+    def __len__(self):
+        return len(self.productos)
+    
+    def __iter__(self):
+        return iter(self.productos)
+    
+    def obtener(self, codigo):
+        """Retorna el producto con el código dado o None"""
+        if not codigo:
+            return None
+        return self.por_codigo.get(str(codigo).strip().upper())
+    
+    def buscar_por_categoria(self, categoria):
+        """Productos cuya categoría coincide exactamente (sin distinguir mayúsculas)"""
+        return list(self.por_categoria.get(categoria.lower(), []))
+    
+    def buscar_por_flag(self, flag):
+        """Productos con el flag activo ('personalizable' o 'disponible')"""
+        if flag not in self.por_flag:
+            raise ValueError(f"Flag no indexado: {flag}")
+        return list(self.por_flag[flag])
+    
+    def buscar_por_ingrediente(self, ingrediente):
+        """Productos que contienen el ingrediente indicado"""
+        return list(self.por_ingrediente.get(ingrediente.lower(), []))
+    
+    def buscar_por_rango_precio(self, precio_min=None, precio_max=None):
+        """Productos con precio en [precio_min, precio_max], ordenados por precio"""
+        inicio = 0 if precio_min is None else bisect.bisect_left(self._precios, precio_min)
+        fin = len(self._precios) if precio_max is None else bisect.bisect_right(self._precios, precio_max)
+        return self._productos_por_precio[inicio:fin]
+    
+    def categorias(self):
+        """Lista de categorías en su forma original"""
+        return list(dict.fromkeys(p["categoria"] for p in self.productos))
+
 
 class PasteleriaDataLoader:
     def __init__(self):
         self.productos = []
         self.politicas = []
         self.faqs = []
+        self.catalogo = None
+        self.indice_busqueda = None
+        self._documentos_productos = None
+        
+        # Se incrementa cada vez que cambia el catálogo (invalida caches dependientes)
+        self.version_catalogo = 0
     
     def cargar_productos(self):
         """Carga el catálogo completo de productos de la pastelería"""
+        # El catálogo se construye una sola vez; llamadas posteriores reutilizan el índice
+        if self.catalogo is not None:
+            return list(self._documentos_productos)
+        
         productos = [
             # Tortas Cuadradas
             {
@@ -115,8 +200,41 @@ class PasteleriaDataLoader:
                 "ingredientes": ["varios sabores", "fondant", "decoraciones elegantes"], "disponible": True
             }
         ]
+        self._indexar_productos(productos)
+        return list(self._documentos_productos)
+    
+    def _indexar_productos(self, productos):
+        """Construye el catálogo indexado y marca una nueva versión del catálogo"""
         self.productos = productos
-        return [f"PRODUCTO: {p['nombre']} - ${p['precio']} - {p['descripcion']} - Categoría: {p['categoria']}" for p in productos]
+        self.catalogo = CatalogoIndexado(productos)
+        self.indice_busqueda = None
+        self._documentos_productos = [
+            f"PRODUCTO: {p['nombre']} - ${p['precio']} - {p['descripcion']} - Categoría: {p['categoria']}"
+            for p in productos
+        ]
+        self.version_catalogo += 1
+    
+    def actualizar_catalogo(self, productos):
+        """Reemplaza el catálogo (ej: cambio de precios o stock) y reconstruye los índices"""
+        self._indexar_productos(list(productos))
+        print(f"🔄 Catálogo actualizado a versión {self.version_catalogo} ({len(self.productos)} productos)")
+    
+    def obtener_catalogo(self):
+        """Retorna el catálogo indexado, construyéndolo la primera vez"""
+        if self.catalogo is None:
+            self.cargar_productos()
+        return self.catalogo
+    
+    def obtener_producto(self, codigo):
+        """Busca un producto por código en O(1)"""
+        return self.obtener_catalogo().obtener(codigo)
+    
+    def obtener_indice_busqueda(self):
+        """Retorna el índice invertido de búsqueda (BM25) sobre el catálogo"""
+        if self.indice_busqueda is None:
+            from .product_search import ProductSearchIndex
+            self.indice_busqueda = ProductSearchIndex(self.obtener_catalogo())
+        return self.indice_busqueda
     
     def cargar_politicas(self):
         """Carga las políticas de descuentos y promociones"""
@@ -151,7 +269,6 @@ class PasteleriaDataLoader:
     
     def obtener_categorias(self):
         """Retorna lista de categorías disponibles"""
-        categorias = list(set([p['categoria'] for p in self.productos]))
-        return categorias
+        return self.obtener_catalogo().categorias()
     
     
\ No newline at end of file
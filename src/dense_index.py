@@ -0,0 +1,157 @@
+"""
+Índice vectorial denso para el motor RAG
+Embeddings persistidos en disco (.npy memory-mapped + índice FAISS) identificados por hash de contenido
+"""
+
+import hashlib
+import os
+from pathlib import Path
+from typing import List, Optional, Sequence, Tuple
+
+import faiss
+import numpy as np
+
+from .utils.embedding_cache import get_embedding_cache
+from .utils.embedding_registry import DEFAULT_EMBEDDING_MODEL, get_embedding_registry
+
+
+class DenseVectorIndex:
+    """
+    Índice denso sobre una colección de documentos
+    Los vectores se calculan una sola vez por contenido; al reiniciar se recargan desde disco
+    """
+
+    def __init__(
+        self,
+        embedding_model: str = DEFAULT_EMBEDDING_MODEL,
+        cache_dir: str = "./data/vector_index",
+        index_type: str = "flat",
+        nlist: int = 64,
+        nprobe: int = 8
+    ):
+        """
+        Args:
+            embedding_model: Modelo de sentence-transformers
+            cache_dir: Directorio donde se guardan vectores (.npy) e índices (.faiss)
+            index_type: "flat" (búsqueda exacta por producto interno) o "ivf" (aproximada)
+            nlist: Número de celdas del índice IVF
+            nprobe: Celdas a visitar por consulta en IVF
+        """
+        if index_type not in ("flat", "ivf"):
+            raise ValueError(f"Tipo de índice no soportado: {index_type}")
+
+        self.embedding_model = embedding_model
+        self.cache_dir = Path(cache_dir)
+        self.index_type = index_type
+        self.nlist = nlist
+        self.nprobe = nprobe
+
+        self._model = None
+        self.index = None
+        self.vectors: Optional[np.ndarray] = None
+        self.content_hash: Optional[str] = None
+        self.loaded_from_disk = False
+
+    # ============= MODELO =============
+
+    def _get_model(self):
+        """Modelo sentence-transformers compartido con la memoria (registro de embeddings)"""
+        if self._model is None:
+            self._model = get_embedding_registry().get(self.embedding_model).client
+        return self._model
+
+    def embed(self, texts: Sequence[str]) -> np.ndarray:
+        """Embeddings normalizados (float32) para producto interno = similitud coseno"""
+        vectors = self._get_model().encode(
+            list(texts),
+            batch_size=64,
+            normalize_embeddings=True,
+            show_progress_bar=False
+        )
+        return np.ascontiguousarray(vectors, dtype=np.float32)
+
+    # ============= CONSTRUCCIÓN / PERSISTENCIA =============
+
+    def _hash_documents(self, documents: Sequence[str]) -> str:
+        """Hash estable del modelo + contenido de los documentos"""
+        digest = hashlib.sha256(self.embedding_model.encode("utf-8"))
+        for doc in documents:
+            digest.update(b"\x00")
+            digest.update(doc.encode("utf-8"))
+        return digest.hexdigest()[:32]
+
+    def build(self, documents: Sequence[str]) -> "DenseVectorIndex":
+        """
+        Construye el índice, reutilizando vectores e índice persistidos si el contenido no cambió
+        """
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        self.content_hash = self._hash_documents(documents)
+
+        vectors_path = self.cache_dir / f"{self.content_hash}.npy"
+        index_path = self.cache_dir / f"{self.content_hash}.{self.index_type}.faiss"
+
+        if vectors_path.exists():
+            # Memory-map: no se re-embebe ni se copia el archivo completo a memoria
+            self.vectors = np.load(vectors_path, mmap_mode="r")
+            self.loaded_from_disk = True
+        else:
+            vectors = self.embed(documents) if documents else np.zeros((0, 1), dtype=np.float32)
+            tmp_path = vectors_path.with_suffix(".tmp.npy")
+            np.save(tmp_path, vectors)
+            os.replace(tmp_path, vectors_path)
+            self.vectors = np.load(vectors_path, mmap_mode="r")
+            self.loaded_from_disk = False
+
+        if index_path.exists():
+            self.index = faiss.read_index(str(index_path))
+        else:
+            self.index = self._create_index(np.ascontiguousarray(self.vectors, dtype=np.float32))
+            faiss.write_index(self.index, str(index_path))
+
+        if self.index_type == "ivf":
+            self.index.nprobe = self.nprobe
+
+        return self
+
+    def _create_index(self, vectors: np.ndarray):
+        """Crea el índice FAISS exacto o IVF sobre vectores normalizados"""
+        n_docs, dim = vectors.shape
+
+        if self.index_type == "flat" or n_docs == 0:
+            index = faiss.IndexFlatIP(dim)
+        else:
+            # IVF necesita entrenamiento; con pocos documentos se limitan las celdas
+            nlist = max(1, min(self.nlist, int(np.sqrt(n_docs))))
+            quantizer = faiss.IndexFlatIP(dim)
+            index = faiss.IndexIVFFlat(quantizer, dim, nlist, faiss.METRIC_INNER_PRODUCT)
+            index.train(vectors)
+
+        if n_docs:
+            index.add(vectors)
+        return index
+
+    # ============= BÚSQUEDA =============
+
+    def search(self, queries: Sequence[str], top_k: int = 3) -> List[Tuple[List[int], List[float]]]:
+        """
+        Busca los top_k documentos más similares para cada consulta
+
+        Returns:
+            Lista (una por consulta) de tuplas (índices, similitudes)
+        """
+        if self.index is None:
+            raise RuntimeError("El índice denso no ha sido construido (llama a build)")
+
+        if self.index.ntotal == 0 or not queries:
+            return [([], []) for _ in queries]
+
+        # Consultas repetidas (saludos, FAQs) se sirven desde el cache de embeddings
+        query_vectors = get_embedding_cache().get_or_compute(list(queries), self.embedding_model, self.embed)
+        k = min(top_k, self.index.ntotal)
+        scores, indices = self.index.search(np.asarray(query_vectors, dtype=np.float32), k)
+
+        results = []
+        for row_idx, row_scores in zip(indices, scores):
+            valid = [(int(i), float(s)) for i, s in zip(row_idx, row_scores) if i >= 0]
+            results.append(([i for i, _ in valid], [s for _, s in valid]))
+        return results
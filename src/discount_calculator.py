@@ -1,3 +1,6 @@
+import hashlib
+import json
+
 class DiscountCalculator:
     def __init__(self):
         self.descuentos = {
@@ -6,6 +9,11 @@ class DiscountCalculator:
             "estudiante_duoc": 1.00  # 100% descuento (gratis) en cumpleaños
         }
     
+    def version_reglas(self):
+        """Huella de las reglas de descuento vigentes (cambia si se modifica algún porcentaje)"""
+        contenido = json.dumps(self.descuentos, sort_keys=True)
+        return hashlib.sha1(contenido.encode("utf-8")).hexdigest()[:12]
+    
     def calcular_descuento(self, precio_base, tipo_cliente, es_cumpleanos=False):
         """Calcula descuentos según el tipo de cliente"""
         if tipo_cliente == "estudiante_duoc" and es_cumpleanos:
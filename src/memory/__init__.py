@@ -8,6 +8,24 @@ from .short_term import (
     create_short_term_memory
 )
 
+from .message_buffer import (
+    MessageRecord,
+    MessageRingBuffer,
+    RingBufferChatMessageHistory
+)
+
+from .preferences import (
+    KeywordMatcher,
+    PreferenceProfile,
+    PreferenceStore
+)
+
+from .metadata_store import ConversationMetadataStore
+
+from .retention import RetentionPolicy, RetentionJob
+
+from .sharding import ShardRouter
+
 from .long_term import (
     LongTermMemory,
     create_long_term_memory
@@ -17,6 +35,16 @@ __all__ = [
     'ShortTermMemory',
     'ConversationContext',
     'create_short_term_memory',
+    'MessageRecord',
+    'MessageRingBuffer',
+    'RingBufferChatMessageHistory',
+    'KeywordMatcher',
+    'PreferenceProfile',
+    'PreferenceStore',
+    'ConversationMetadataStore',
+    'RetentionPolicy',
+    'RetentionJob',
+    'ShardRouter',
     'LongTermMemory',
     'create_long_term_memory'
 ]
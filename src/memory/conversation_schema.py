@@ -0,0 +1,167 @@
+"""
+Esquema compacto de los documentos de conversación en el vector store
+
+Esquema 1 (legado): texto en page_content y otra vez en metadata (user_message, agent_response),
+listas como JSON y timestamp ISO.
+
+Esquema 2 (compacto):
+    - page_content: "Usuario: ...\\nAsistente: ..." (único lugar con el texto)
+    - u_len: largo del mensaje del usuario, para separar ambas partes sin ambigüedad
+    - ts: epoch en milisegundos (int)
+    - tools_used: nombres separados por coma
+    - r_z: respuesta completa comprimida (zlib + base64) solo si se recortó la parte embebida
+"""
+
+import base64
+import json
+import zlib
+from datetime import datetime
+from typing import Any, Dict, Optional, Tuple
+
+SCHEMA_VERSION = 2
+
+USER_PREFIX = "Usuario: "
+AGENT_PREFIX = "\nAsistente: "
+
+# El modelo de embeddings trunca la entrada (~128 tokens en MiniLM); más texto no cambia el vector
+MAX_EMBEDDED_RESPONSE_CHARS = 1000
+
+# Campos lista que se guardan como texto separado por comas
+LIST_FIELDS = frozenset({"tools_used"})
+
+# Claves del esquema 1 que el esquema 2 reemplaza
+LEGACY_FIELDS = frozenset({"user_message", "agent_response", "timestamp"})
+
+
+def _compress(text: str) -> str:
+    return base64.b64encode(zlib.compress(text.encode("utf-8"), 9)).decode("ascii")
+
+
+def _decompress(data: str) -> str:
+    return zlib.decompress(base64.b64decode(data)).decode("utf-8")
+
+
+def _to_epoch_ms(timestamp: Any) -> int:
+    if isinstance(timestamp, (int, float)):
+        return int(timestamp)
+    if isinstance(timestamp, str) and timestamp:
+        return int(datetime.fromisoformat(timestamp).timestamp() * 1000)
+    return int(datetime.now().timestamp() * 1000)
+
+
+def encode_conversation(
+    user_message: str,
+    agent_response: str,
+    metadata: Optional[Dict[str, Any]] = None,
+    timestamp: Optional[datetime] = None,
+    max_embedded_response_chars: int = MAX_EMBEDDED_RESPONSE_CHARS
+) -> Tuple[str, Dict[str, Any]]:
+    """
+    Arma page_content y metadata compacta de una conversación
+
+    Returns:
+        (page_content, metadata) listos para el vector store
+    """
+    embedded_response = agent_response
+    compact: Dict[str, Any] = {
+        "schema": SCHEMA_VERSION,
+        "ts": _to_epoch_ms((timestamp or datetime.now()).timestamp() * 1000),
+        "u_len": len(user_message)
+    }
+
+    if len(agent_response) > max_embedded_response_chars:
+        embedded_response = agent_response[:max_embedded_response_chars]
+        compact["r_z"] = _compress(agent_response)
+
+    for key, value in (metadata or {}).items():
+        if value is None or key in LEGACY_FIELDS:
+            # Chroma no admite None; los campos legados se derivan del texto
+            continue
+        if key in LIST_FIELDS and isinstance(value, (list, tuple)):
+            compact[key] = ",".join(str(v) for v in value)
+        elif isinstance(value, (str, int, float, bool)):
+            compact[key] = value
+        elif isinstance(value, (list, dict)):
+            compact[key] = json.dumps(value, ensure_ascii=False) if value else ""
+        else:
+            compact[key] = str(value)
+
+    page_content = f"{USER_PREFIX}{user_message}{AGENT_PREFIX}{embedded_response}"
+    return page_content, compact
+
+
+def decode_conversation(page_content: str, metadata: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+    """
+    Reconstruye la conversación (esquema 1 o 2) con los campos de siempre:
+    user_message, agent_response, timestamp ISO y el resto de la metadata
+    """
+    metadata = dict(metadata or {})
+
+    if metadata.get("schema", 1) < SCHEMA_VERSION:
+        # Esquema 1: ya trae todo en metadata
+        return metadata
+
+    u_len = metadata.pop("u_len", None)
+    body = page_content[len(USER_PREFIX):] if page_content.startswith(USER_PREFIX) else page_content
+    if u_len is None:
+        user_message, _, agent_response = body.partition(AGENT_PREFIX)
+    else:
+        user_message = body[:u_len]
+        agent_response = body[u_len + len(AGENT_PREFIX):]
+
+    compressed = metadata.pop("r_z", None)
+    if compressed:
+        agent_response = _decompress(compressed)
+
+    ts = metadata.pop("ts", None)
+    metadata.pop("schema", None)
+    for key in LIST_FIELDS:
+        if isinstance(metadata.get(key), str):
+            metadata[key] = [v for v in metadata[key].split(",") if v]
+
+    metadata["user_message"] = user_message
+    metadata["agent_response"] = agent_response
+    metadata["timestamp"] = datetime.fromtimestamp(ts / 1000).isoformat() if ts is not None else ""
+    return metadata
+
+
+def conversation_timestamp(metadata: Optional[Dict[str, Any]]) -> str:
+    """Timestamp ISO de la conversación sin decodificar el texto (esquema 1 o 2)"""
+    metadata = metadata or {}
+    ts = metadata.get("ts")
+    if metadata.get("schema", 1) >= SCHEMA_VERSION and ts is not None:
+        return datetime.fromtimestamp(ts / 1000).isoformat()
+    return metadata.get("timestamp", "")
+
+
+def compact_legacy_document(page_content: str, metadata: Dict[str, Any],
+                            max_embedded_response_chars: int = MAX_EMBEDDED_RESPONSE_CHARS
+                            ) -> Optional[Tuple[str, Dict[str, Any]]]:
+    """
+    Convierte un documento del esquema 1 al 2 (None si ya es compacto)
+    El texto embebido no cambia salvo el recorte de respuestas largas, por lo que el vector se puede conservar
+    """
+    if metadata.get("schema", 1) >= SCHEMA_VERSION:
+        return None
+
+    user_message = metadata.get("user_message")
+    agent_response = metadata.get("agent_response")
+    if user_message is None or agent_response is None:
+        body = page_content[len(USER_PREFIX):] if page_content.startswith(USER_PREFIX) else page_content
+        user_message, _, agent_response = body.partition(AGENT_PREFIX)
+
+    extra = {k: v for k, v in metadata.items() if k not in LEGACY_FIELDS}
+    for key in LIST_FIELDS:
+        # En el esquema 1 las listas se guardaban como JSON
+        if isinstance(extra.get(key), str):
+            try:
+                extra[key] = json.loads(extra[key]) if extra[key] else []
+            except ValueError:
+                pass
+
+    page_content, compact = encode_conversation(
+        user_message, agent_response, extra,
+        max_embedded_response_chars=max_embedded_response_chars
+    )
+    compact["ts"] = _to_epoch_ms(metadata.get("timestamp"))
+    return page_content, compact
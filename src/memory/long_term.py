@@ -4,12 +4,32 @@ Almacena conversaciones previas usando ChromaDB y embeddings
 """
 
 from langchain.vectorstores import Chroma
-from langchain.embeddings import HuggingFaceEmbeddings
 from langchain.schema import Document
 from typing import List, Dict, Any, Optional
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
-import json
+import atexit
 import os
+import threading
+import uuid
+
+from ..utils.embedding_registry import get_embedding_registry, get_shared_embeddings
+from ..monitoring.tracing import traced
+from .write_behind import WriteBehindBuffer
+from .preferences import PreferenceProfile, PreferenceStore
+from .metadata_store import ConversationMetadataStore
+from .sharding import ShardRouter
+from .conversation_schema import (
+    LEGACY_FIELDS,
+    MAX_EMBEDDED_RESPONSE_CHARS,
+    compact_legacy_document,
+    conversation_timestamp,
+    decode_conversation,
+    encode_conversation
+)
+
+# Clientes sin identificar: no se les construye perfil
+ANONYMOUS_CUSTOMERS = {"", "anonymous"}
 
 
 class LongTermMemory:
@@ -22,7 +42,15 @@ class LongTermMemory:
         self,
         persist_directory: str = "./data/chroma_db",
         collection_name: str = "pasteleria_conversations",
-        embedding_model: str = "sentence-transformers/paraphrase-multilingual-MiniLM-L12-v2"
+        embedding_model: str = "sentence-transformers/paraphrase-multilingual-MiniLM-L12-v2",
+        async_writes: bool = True,
+        write_batch_size: int = 32,
+        write_flush_interval: float = 2.0,
+        max_pending_writes: int = 1000,
+        max_embedded_response_chars: int = MAX_EMBEDDED_RESPONSE_CHARS,
+        num_shards: int = 1,
+        shard_strategy: str = "customer",
+        time_bucket: str = "month"
     ):
         """
         Inicializa el sistema de memoria de largo plazo
@@ -31,20 +59,27 @@ class LongTermMemory:
             persist_directory: Directorio para persistir la base de datos
             collection_name: Nombre de la colección
             embedding_model: Modelo de embeddings a usar
+            async_writes: Si True, store_conversation encola y un hilo escribe en lotes
+            write_batch_size: Conversaciones por lote de escritura
+            write_flush_interval: Segundos máximos antes de escribir un lote incompleto
+            max_pending_writes: Conversaciones pendientes máximas en memoria (backpressure)
+            max_embedded_response_chars: Caracteres de la respuesta que se embeben; si es más larga,
+                la respuesta completa se guarda comprimida en la metadata
+            num_shards: Colecciones entre las que se reparten los clientes (1 = una sola colección)
+            shard_strategy: "customer" (hash del customer_id) o "time" (una colección por bucket de tiempo)
+            time_bucket: "month" o "day" para shard_strategy="time"
         """
         self.persist_directory = persist_directory
+        self.max_embedded_response_chars = max_embedded_response_chars
         self.collection_name = collection_name
+        self.embedding_model = embedding_model
         
         # Crear directorio si no existe
         os.makedirs(persist_directory, exist_ok=True)
         
-        # Inicializar embeddings
-        print("🔄 Cargando modelo de embeddings...")
-        self.embeddings = HuggingFaceEmbeddings(
-            model_name=embedding_model,
-            model_kwargs={'device': 'cpu'},
-            encode_kwargs={'normalize_embeddings': True}
-        )
+        # Embeddings compartidos por proceso: el modelo se carga una sola vez,
+        # recién en el primer uso (o antes, si se hizo warm-up)
+        self.embeddings = get_shared_embeddings(embedding_model)
         
         # Inicializar o cargar vector store
         try:
@@ -63,7 +98,238 @@ class LongTermMemory:
             )
         
         self.conversation_count = 0
+        
+        # Sharding: self.vectorstore es la colección base; con sharding solo conserva datos previos
+        self.router = ShardRouter(collection_name, num_shards, shard_strategy, time_bucket)
+        self._shards: Dict[str, Any] = {collection_name: self.vectorstore}
+        self._shards_lock = threading.Lock()
+        self._search_pool = ThreadPoolExecutor(max_workers=8, thread_name_prefix="memory-shard") \
+            if self.router.is_sharded else None
+        
+        # Índice estructurado de metadata: historial, conteos y borrados sin búsqueda vectorial
+        self.metadata_store = ConversationMetadataStore(
+            os.path.join(persist_directory, f"{collection_name}.metadata.sqlite")
+        )
+        self._backfill_metadata_store()
+        
+        # Perfiles de preferencias por cliente (contadores), persistidos junto a la colección
+        self.preference_store = PreferenceStore(
+            os.path.join(persist_directory, f"{collection_name}.preferences.sqlite")
+        )
+        self._profiles: Dict[str, PreferenceProfile] = {}
+        # Menciones aún no persistidas por cliente (se suman al perfil guardado, no lo reemplazan)
+        self._profile_deltas: Dict[str, PreferenceProfile] = {}
+        self._profiles_lock = threading.Lock()
+        
+        # Escritura diferida: el embedding y el insert salen del camino de la consulta
+        self.write_buffer = None
+        if async_writes:
+            self.write_buffer = WriteBehindBuffer(
+                flush_fn=self._write_batch,
+                journal_path=os.path.join(persist_directory, f"{collection_name}.journal.jsonl"),
+                max_batch_size=write_batch_size,
+                flush_interval=write_flush_interval,
+                max_pending=max_pending_writes
+            )
+            atexit.register(self.close)
+    
+    def _write_batch(self, records: List[Dict[str, Any]]):
+        """Persiste un lote de conversaciones en el vector store (un solo add_documents)"""
+        documents = [
+            Document(page_content=record["page_content"], metadata=record["metadata"])
+            for record in records
+        ]
+        # Registros del journal anteriores a los ids explícitos reciben uno nuevo
+        ids = [record.get("id") or str(uuid.uuid4()) for record in records]
+        shards = [
+            self.router.shard_for(record["metadata"].get("customer_id"), record["metadata"].get("ts"))
+            for record in records
+        ]
+        
+        # Un add_documents por shard del lote
+        groups: Dict[str, List[int]] = {}
+        for i, shard in enumerate(shards):
+            groups.setdefault(shard, []).append(i)
+        for shard, positions in groups.items():
+            self._get_shard(shard).add_documents(
+                [documents[i] for i in positions], ids=[ids[i] for i in positions]
+            )
+        
+        self.metadata_store.add_many(
+            {
+                "doc_id": doc_id,
+                "customer_id": record["metadata"].get("customer_id"),
+                "timestamp": conversation_timestamp(record["metadata"]),
+                "shard": shard if self.router.is_sharded else None
+            }
+            for record, doc_id, shard in zip(records, ids, shards)
+        )
+        self._persist_profiles()
+    
+    # ============= SHARDS =============
+    
+    def _get_shard(self, name: Optional[str]):
+        """Colección de Chroma de un shard (se crea la primera vez que se usa)"""
+        name = name or self.collection_name
+        with self._shards_lock:
+            shard = self._shards.get(name)
+            if shard is None:
+                shard = Chroma(
+                    collection_name=name,
+                    embedding_function=self.embeddings,
+                    persist_directory=self.persist_directory
+                )
+                self._shards[name] = shard
+            return shard
+    
+    def shard_names(self) -> List[str]:
+        """Shards con datos o previstos, incluida la colección base si conserva documentos previos"""
+        names = list(self.router.static_shards())
+        for name in self.metadata_store.distinct_shards():
+            if name not in names:
+                names.append(name)
+        if self.router.is_sharded and self.vectorstore._collection.count() > 0:
+            names.append(self.collection_name)
+        return names
     
+    def collections_for(self, doc_ids: List[str]) -> List[tuple]:
+        """(colección de Chroma, ids) para cada shard que contiene alguno de los doc_ids"""
+        if not self.router.is_sharded:
+            return [(self.vectorstore._collection, list(doc_ids))] if doc_ids else []
+        return [
+            (self._get_shard(shard)._collection, ids)
+            for shard, ids in self.metadata_store.shards_of(doc_ids).items()
+        ]
+    
+    def _search(self, query: str, k: int, filter_metadata: Optional[Dict[str, Any]]) -> List[Document]:
+        """Búsqueda en el shard del cliente o, si no se puede acotar, en todos con fusión por distancia"""
+        customer_id = (filter_metadata or {}).get("customer_id")
+        names = None
+        if isinstance(customer_id, str):
+            names = self.router.shards_for_customer(customer_id)
+            if names is not None and self.router.is_sharded and self.vectorstore._collection.count() > 0:
+                names = names + [self.collection_name]
+        if names is None:
+            names = self.shard_names()
+        
+        if len(names) == 1:
+            return self._get_shard(names[0]).similarity_search(query, k=k, filter=filter_metadata)
+        
+        # Fan-out: el embedding de la consulta se calcula una sola vez
+        embedding = self.embeddings.embed_query(query)
+        
+        def search_shard(name):
+            shard = self._get_shard(name)
+            if shard._collection.count() == 0:
+                return []
+            return shard.similarity_search_by_vector_with_relevance_scores(
+                embedding, k=k, filter=filter_metadata
+            )
+        
+        merged = []
+        for results in self._search_pool.map(search_shard, names):
+            merged.extend(results)
+        # Chroma retorna distancias: menor es más parecido
+        merged.sort(key=lambda pair: pair[1])
+        return [doc for doc, _ in merged[:k]]
+    
+    def _backfill_metadata_store(self, page_size: int = 1000):
+        """Indexa una colección existente (creada antes del índice de metadata); no calcula embeddings"""
+        try:
+            collection = self.vectorstore._collection
+            total = collection.count()
+            if total == 0 or self.metadata_store.count() >= total:
+                return
+            
+            for offset in range(0, total, page_size):
+                page = collection.get(limit=page_size, offset=offset, include=["metadatas"])
+                self.metadata_store.add_many(
+                    {
+                        "doc_id": doc_id,
+                        "customer_id": (metadata or {}).get("customer_id"),
+                        "timestamp": conversation_timestamp(metadata)
+                    }
+                    for doc_id, metadata in zip(page["ids"], page["metadatas"])
+                )
+            print(f"✅ Índice de metadata reconstruido ({total} conversaciones)")
+        except Exception as e:
+            print(f"⚠️ No se pudo reconstruir el índice de metadata: {e}")
+    
+    # ============= PERFILES DE PREFERENCIAS =============
+    
+    def _get_profile(self, customer_id: str) -> PreferenceProfile:
+        """Perfil del cliente: memoria -> sqlite -> (una vez) reconstruido desde el historial"""
+        with self._profiles_lock:
+            profile = self._profiles.get(customer_id)
+            if profile is not None:
+                return profile
+        
+        profile = self.preference_store.load(customer_id)
+        if profile is None:
+            # Conversaciones guardadas antes de existir el perfil; si otra instancia lo creó
+            # mientras tanto, se usa el suyo
+            history = self.get_customer_history(customer_id, limit=20)
+            profile = PreferenceProfile.from_conversations(history) if history else PreferenceProfile()
+            profile = self.preference_store.insert_if_missing(customer_id, profile)
+        
+        with self._profiles_lock:
+            return self._profiles.setdefault(customer_id, profile)
+    
+    def _update_profile(self, customer_id: str, user_message: str, agent_response: str):
+        """Suma las menciones del intercambio al perfil en memoria y al delta pendiente de persistir"""
+        self._adjust_profile(customer_id, PreferenceProfile.count_mentions(user_message, agent_response), 1)
+    
+    def _adjust_profile(self, customer_id: str, mentions: Dict[str, int], messages: int):
+        """Aplica un delta de menciones (negativo al borrar conversaciones) al perfil del cliente"""
+        profile = self._get_profile(customer_id)
+        with self._profiles_lock:
+            # Se relee bajo el lock: _persist_profiles puede haber refrescado el perfil
+            profile = self._profiles.setdefault(customer_id, profile)
+            profile.add(mentions, messages)
+            delta = self._profile_deltas.setdefault(customer_id, PreferenceProfile())
+            delta.counts.update(mentions)
+            delta.messages += messages
+            delta.updated_at = profile.updated_at
+    
+    def _persist_profiles(self):
+        """Suma los deltas pendientes a los perfiles guardados (se llama tras cada lote escrito)"""
+        with self._profiles_lock:
+            deltas, self._profile_deltas = self._profile_deltas, {}
+        if not deltas:
+            return
+        try:
+            merged = self.preference_store.merge_many(deltas)
+        except Exception as e:
+            print(f"⚠️ Error guardando perfiles de preferencias: {e}")
+            # Los deltas vuelven a quedar pendientes para el próximo lote
+            with self._profiles_lock:
+                for customer_id, delta in deltas.items():
+                    pending = self._profile_deltas.get(customer_id)
+                    self._profile_deltas[customer_id] = delta.merge(pending) if pending else delta
+            return
+        
+        # El perfil guardado incluye lo aportado por otras instancias: se refresca el de memoria
+        with self._profiles_lock:
+            for customer_id, profile in merged.items():
+                pending = self._profile_deltas.get(customer_id)
+                if customer_id in self._profiles:
+                    self._profiles[customer_id] = PreferenceProfile(
+                        profile.counts, profile.messages, profile.updated_at
+                    ).merge(pending) if pending else profile
+    
+    def flush(self, timeout: Optional[float] = None) -> bool:
+        """Espera a que todas las conversaciones encoladas queden escritas"""
+        if self.write_buffer is None:
+            return True
+        return self.write_buffer.flush(timeout=timeout)
+    
+    def close(self):
+        """Escribe lo pendiente y detiene el hilo de escritura"""
+        if self.write_buffer is not None:
+            self.write_buffer.close()
+        self._persist_profiles()
+    
+    @traced("long_term.store_conversation")
     def store_conversation(
         self,
         user_message: str,
@@ -79,42 +345,27 @@ class LongTermMemory:
             metadata: Metadata adicional (customer_id, preferences, etc.)
         """
         try:
-            # Crear documento combinado
-            conversation_text = f"Usuario: {user_message}\nAsistente: {agent_response}"
+            # Documento compacto: el texto va solo en page_content (ver conversation_schema)
+            conversation_text, doc_metadata = encode_conversation(
+                user_message,
+                agent_response,
+                {"conversation_id": self.conversation_count, **(metadata or {})},
+                max_embedded_response_chars=self.max_embedded_response_chars
+            )
             
-            # Preparar metadata (ChromaDB solo acepta str, int, float, bool)
-            doc_metadata = {
-                "timestamp": datetime.now().isoformat(),
-                "conversation_id": self.conversation_count,
-                "user_message": user_message,
-                "agent_response": agent_response
+            record = {
+                "id": str(uuid.uuid4()),
+                "page_content": conversation_text,
+                "metadata": doc_metadata
             }
             
-            if metadata:
-                # Filtrar y convertir metadata compleja
-                for key, value in metadata.items():
-                    if value is None:
-                        doc_metadata[key] = None
-                    elif isinstance(value, (str, int, float, bool)):
-                        doc_metadata[key] = value
-                    elif isinstance(value, list):
-                        # Convertir listas a string JSON
-                        doc_metadata[key] = json.dumps(value) if value else ""
-                    elif isinstance(value, dict):
-                        # Convertir diccionarios a string JSON
-                        doc_metadata[key] = json.dumps(value)
-                    else:
-                        # Convertir otros tipos a string
-                        doc_metadata[key] = str(value)
-            
-            # Crear documento
-            document = Document(
-                page_content=conversation_text,
-                metadata=doc_metadata
-            )
+            customer_id = doc_metadata.get("customer_id")
+            if isinstance(customer_id, str) and customer_id not in ANONYMOUS_CUSTOMERS:
+                self._update_profile(customer_id, user_message, agent_response)
             
-            # Agregar a vector store
-            self.vectorstore.add_documents([document])
+            # Encolar para escritura en lote (o escribir directo si no hay buffer / está lleno)
+            if self.write_buffer is None or not self.write_buffer.put(record):
+                self._write_batch([record])
             self.conversation_count += 1
             
             print(f"💾 Conversación #{self.conversation_count} almacenada en memoria de largo plazo")
@@ -122,6 +373,7 @@ class LongTermMemory:
         except Exception as e:
             print(f"⚠️ Error almacenando conversación: {e}")
     
+    @traced("long_term.retrieve_similar_conversations")
     def retrieve_similar_conversations(
         self,
         query: str,
@@ -140,25 +392,19 @@ class LongTermMemory:
             Lista de conversaciones relevantes
         """
         try:
-            # Buscar documentos similares
-            if filter_metadata:
-                results = self.vectorstore.similarity_search(
-                    query,
-                    k=k,
-                    filter=filter_metadata
-                )
-            else:
-                results = self.vectorstore.similarity_search(query, k=k)
+            # Buscar documentos similares (en uno o varios shards)
+            results = self._search(query, k, filter_metadata)
             
             # Formatear resultados
             conversations = []
             for doc in results:
+                metadata = decode_conversation(doc.page_content, doc.metadata)
                 conversations.append({
                     "content": doc.page_content,
-                    "metadata": doc.metadata,
-                    "user_message": doc.metadata.get("user_message", ""),
-                    "agent_response": doc.metadata.get("agent_response", ""),
-                    "timestamp": doc.metadata.get("timestamp", "")
+                    "metadata": metadata,
+                    "user_message": metadata.get("user_message", ""),
+                    "agent_response": metadata.get("agent_response", ""),
+                    "timestamp": metadata.get("timestamp", "")
                 })
             
             return conversations
@@ -167,50 +413,137 @@ class LongTermMemory:
             print(f"⚠️ Error recuperando conversaciones: {e}")
             return []
     
+    @traced("long_term.get_customer_history")
     def get_customer_history(
         self,
         customer_id: str,
-        limit: int = 10
+        limit: int = 10,
+        offset: int = 0
     ) -> List[Dict[str, Any]]:
         """
-        Obtiene el historial completo de un cliente
+        Obtiene el historial de un cliente (más reciente primero) desde el índice de metadata
         
         Args:
             customer_id: ID del cliente
             limit: Límite de conversaciones a recuperar
+            offset: Conversaciones a saltar (paginación)
         
         Returns:
             Lista de conversaciones del cliente
         """
         try:
-            # Buscar por customer_id en metadata
-            results = self.vectorstore.similarity_search(
-                "",  # Query vacío para obtener todos
-                k=limit,
-                filter={"customer_id": customer_id}
-            )
-            
-            conversations = []
-            for doc in results:
-                conversations.append({
-                    "content": doc.page_content,
-                    "timestamp": doc.metadata.get("timestamp", ""),
-                    "user_message": doc.metadata.get("user_message", ""),
-                    "agent_response": doc.metadata.get("agent_response", "")
-                })
-            
-            # Ordenar por timestamp
-            conversations.sort(
-                key=lambda x: x.get("timestamp", ""),
-                reverse=True
-            )
-            
-            return conversations
-            
+            rows = self.metadata_store.get_customer_history(customer_id, limit=limit, offset=offset)
+            return [
+                {
+                    "content": f"Usuario: {conv.get('user_message', '')}\nAsistente: {conv.get('agent_response', '')}",
+                    "timestamp": conv.get("timestamp", ""),
+                    "user_message": conv.get("user_message", ""),
+                    "agent_response": conv.get("agent_response", "")
+                }
+                for conv in self._load_conversations(rows)
+            ]
         except Exception as e:
             print(f"⚠️ Error obteniendo historial del cliente: {e}")
             return []
     
+    def _load_conversations(self, rows: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """Conversaciones de las filas del índice, leídas de su documento en Chroma (mismo orden)"""
+        by_shard: Dict[Optional[str], List[str]] = {}
+        for row in rows:
+            by_shard.setdefault(row.get("shard"), []).append(row["doc_id"])
+        found = {}
+        for shard, ids in by_shard.items():
+            page = self._get_shard(shard)._collection.get(ids=ids, include=["documents", "metadatas"])
+            for doc_id, document, metadata in zip(page["ids"], page["documents"], page["metadatas"]):
+                found[doc_id] = dict(decode_conversation(document or "", metadata), doc_id=doc_id)
+        return [found[row["doc_id"]] for row in rows if row["doc_id"] in found]
+    
+    def get_conversations(self, doc_ids: List[str]) -> List[Dict[str, Any]]:
+        """Conversaciones completas (texto y metadata) por id"""
+        return self._load_conversations(self.metadata_store.get_many(doc_ids))
+    
+    def count_customer_conversations(self, customer_id: Optional[str] = None) -> int:
+        """Conversaciones almacenadas (de un cliente o en total), sin tocar el vector store"""
+        return self.metadata_store.count(customer_id)
+    
+    def delete_conversations(self, doc_ids: List[str]):
+        """
+        Elimina conversaciones por id del vector store y del índice de metadata
+        Las menciones de lo eliminado se descuentan del perfil de preferencias de cada cliente
+        """
+        if not doc_ids:
+            return
+        removed = self._mentions_by_customer(self.get_conversations(doc_ids))
+        for collection, ids in self.collections_for(doc_ids):
+            collection.delete(ids=ids)
+        self.metadata_store.delete_ids(doc_ids)
+        
+        for customer_id, (mentions, messages) in removed.items():
+            self._adjust_profile(customer_id, {feature: -n for feature, n in mentions.items()}, -messages)
+        self._persist_profiles()
+    
+    def _mentions_by_customer(self, conversations: List[Dict[str, Any]]) -> Dict[str, tuple]:
+        """(menciones, mensajes) por cliente con perfil; sin perfil, el backfill ya no verá lo eliminado"""
+        totals: Dict[str, tuple] = {}
+        for conv in conversations:
+            customer_id = conv.get("customer_id")
+            if not isinstance(customer_id, str) or customer_id in ANONYMOUS_CUSTOMERS:
+                continue
+            if customer_id not in totals:
+                with self._profiles_lock:
+                    cached = customer_id in self._profiles
+                if not cached and self.preference_store.load(customer_id) is None:
+                    continue
+                totals[customer_id] = (PreferenceProfile.count_mentions(), 0)
+            mentions, messages = totals[customer_id]
+            mentions.update(PreferenceProfile.count_mentions(conv.get("user_message", ""),
+                                                             conv.get("agent_response", "")))
+            totals[customer_id] = (mentions, messages + 1)
+        return totals
+    
+    def get_embeddings(self, doc_ids: List[str]) -> Dict[str, List[float]]:
+        """Vectores ya almacenados (no se recalcula ningún embedding)"""
+        vectors = {}
+        for collection, ids in self.collections_for(doc_ids):
+            page = collection.get(ids=ids, include=["embeddings"])
+            vectors.update(zip(page["ids"], page["embeddings"]))
+        return vectors
+    
+    def run_retention(self, policy=None, max_batches: Optional[int] = None) -> Dict[str, Any]:
+        """
+        Ejecuta una pasada del job de retención/compactación (ver memory.retention)
+        
+        Args:
+            policy: RetentionPolicy (por defecto 30 días, 200 conversaciones por cliente)
+            max_batches: Tope de lotes en esta pasada (None = hasta terminar)
+        """
+        from .retention import RetentionJob
+        return RetentionJob(self, policy).run(max_batches=max_batches)
+    
+    def delete_customer_history(self, customer_id: str) -> int:
+        """
+        Elimina todas las conversaciones y el perfil de un cliente
+        
+        Returns:
+            Cantidad de conversaciones eliminadas
+        """
+        try:
+            # Lo pendiente de escribir también debe borrarse
+            self.flush()
+            by_shard = self.metadata_store.delete_customer(customer_id)
+            for shard, ids in by_shard.items():
+                self._get_shard(shard).delete(ids=ids)
+            doc_ids = [doc_id for ids in by_shard.values() for doc_id in ids]
+            with self._profiles_lock:
+                self._profiles.pop(customer_id, None)
+                self._profile_deltas.pop(customer_id, None)
+            self.preference_store.delete(customer_id)
+            print(f"🗑️ {len(doc_ids)} conversaciones eliminadas del cliente {customer_id}")
+            return len(doc_ids)
+        except Exception as e:
+            print(f"❌ Error eliminando historial del cliente: {e}")
+            return 0
+    
     def extract_customer_preferences(
         self,
         customer_id: Optional[str] = None,
@@ -226,14 +559,15 @@ class LongTermMemory:
         Returns:
             Dict con preferencias identificadas
         """
-        conversations = []
-        
         if customer_id:
-            conversations = self.get_customer_history(customer_id, limit=20)
+            # Lectura O(1): contadores mantenidos en cada store_conversation
+            profile = self._get_profile(customer_id)
         elif recent_conversations:
-            conversations = recent_conversations
+            profile = PreferenceProfile.from_conversations(recent_conversations)
+        else:
+            profile = PreferenceProfile()
         
-        if not conversations:
+        if profile.messages == 0:
             return {
                 "productos_favoritos": [],
                 "categorias_preferidas": [],
@@ -242,65 +576,71 @@ class LongTermMemory:
                 "frecuencia_compra": "Primera vez"
             }
         
-        # Analizar texto de todas las conversaciones
-        all_text = " ".join([
-            conv.get("content", "") + " " + 
-            conv.get("user_message", "") + " " + 
-            conv.get("agent_response", "")
-            for conv in conversations
-        ]).lower()
-        
-        preferences = {
-            "productos_favoritos": [],
-            "categorias_preferidas": [],
-            "restricciones_alimentarias": [],
-            "ocasiones_frecuentes": [],
-            "rango_presupuesto": "No definido"
-        }
-        
-        # Detectar productos favoritos
-        productos_keywords = {
-            "chocolate": "Tortas de chocolate",
-            "vainilla": "Tortas de vainilla",
-            "frutas": "Tortas de frutas",
-            "manjar": "Tortas de manjar"
-        }
-        
-        for keyword, producto in productos_keywords.items():
-            if all_text.count(keyword) >= 2:  # Mencionado 2+ veces
-                preferences["productos_favoritos"].append(producto)
-        
-        # Detectar categorías preferidas
-        if "vegano" in all_text or "vegana" in all_text:
-            preferences["categorias_preferidas"].append("Productos veganos")
-        if "sin azúcar" in all_text:
-            preferences["categorias_preferidas"].append("Productos sin azúcar")
-        if "cuadrada" in all_text:
-            preferences["categorias_preferidas"].append("Tortas cuadradas")
-        
-        # Detectar restricciones
-        if "alérgico" in all_text or "alergia" in all_text:
-            preferences["restricciones_alimentarias"].append("Alergias")
-        if "vegetariano" in all_text:
-            preferences["restricciones_alimentarias"].append("Vegetariano")
-        if "celíaco" in all_text or "gluten" in all_text:
-            preferences["restricciones_alimentarias"].append("Sin gluten")
-        
-        # Detectar ocasiones frecuentes
-        if "cumpleaños" in all_text:
-            preferences["ocasiones_frecuentes"].append("Cumpleaños")
-        if "boda" in all_text:
-            preferences["ocasiones_frecuentes"].append("Bodas")
-        
-        # Estimar presupuesto
-        if "económico" in all_text or "barato" in all_text:
-            preferences["rango_presupuesto"] = "Económico (< $30.000)"
-        elif "premium" in all_text or any(str(p) in all_text for p in range(50000, 100000, 10000)):
-            preferences["rango_presupuesto"] = "Premium (> $50.000)"
-        else:
-            preferences["rango_presupuesto"] = "Medio ($30.000 - $50.000)"
+        return profile.as_customer_preferences()
+    
+    def migrate_to_compact_schema(self, batch_size: int = 500, dry_run: bool = False) -> Dict[str, int]:
+        """
+        Reescribe los documentos del esquema 1 en el esquema compacto conservando ids y vectores
+        (no se vuelve a calcular ningún embedding)
         
-        return preferences
+        Args:
+            batch_size: Documentos leídos por página
+            dry_run: Si True solo cuenta lo que se migraría
+        
+        Returns:
+            Dict con total, migrated y already_compact
+        """
+        self.flush()
+        result = {"total": 0, "migrated": 0, "already_compact": 0}
+        for name in self.shard_names():
+            self._migrate_collection(self._get_shard(name)._collection, batch_size, dry_run, result)
+        
+        print(f"✅ Migración al esquema compacto: {result['migrated']} de {result['total']} documentos"
+              f"{' (simulación)' if dry_run else ''}")
+        return result
+    
+    def _migrate_collection(self, collection, batch_size: int, dry_run: bool, result: Dict[str, int]):
+        # Los ids se leen primero: reinsertar documentos cambia el orden de paginación
+        all_ids = collection.get(include=[])["ids"]
+        total = len(all_ids)
+        result["total"] += total
+        
+        for start in range(0, total, batch_size):
+            page = collection.get(
+                ids=all_ids[start:start + batch_size],
+                include=["documents", "metadatas", "embeddings"]
+            )
+            ids, documents, metadatas, embeddings = [], [], [], []
+            for i, doc_id in enumerate(page["ids"]):
+                converted = compact_legacy_document(
+                    page["documents"][i] or "",
+                    page["metadatas"][i] or {},
+                    max_embedded_response_chars=self.max_embedded_response_chars
+                )
+                if converted is None:
+                    result["already_compact"] += 1
+                    continue
+                ids.append(doc_id)
+                documents.append(converted[0])
+                metadatas.append(converted[1])
+                embeddings.append(page["embeddings"][i])
+            
+            if ids and not dry_run:
+                self._replace_records(collection, ids, embeddings, documents, metadatas)
+            result["migrated"] += len(ids)
+    
+    def _replace_records(self, collection, ids, embeddings, documents, metadatas):
+        """
+        Reescribe registros en su lugar con upsert (nunca hay una ventana sin el documento)
+        upsert fusiona la metadata: las claves legadas se envían en None para eliminarlas
+        """
+        cleared = [dict({key: None for key in LEGACY_FIELDS}, **metadata) for metadata in metadatas]
+        try:
+            collection.upsert(ids=ids, embeddings=embeddings, documents=documents, metadatas=cleared)
+        except ValueError:
+            # Versiones de Chroma que no aceptan None en la metadata: las claves legadas quedan vacías
+            emptied = [dict({key: "" for key in LEGACY_FIELDS}, **metadata) for metadata in metadatas]
+            collection.upsert(ids=ids, embeddings=embeddings, documents=documents, metadatas=emptied)
     
     def get_statistics(self) -> Dict[str, Any]:
         """
@@ -310,15 +650,21 @@ class LongTermMemory:
             Dict con estadísticas
         """
         try:
-            # Obtener cantidad de documentos
-            collection = self.vectorstore._collection
-            count = collection.count()
+            # Obtener cantidad de documentos por shard
+            shards = {name: self._get_shard(name)._collection.count() for name in self.shard_names()}
             
             return {
-                "total_conversations": count,
+                "total_conversations": sum(shards.values()),
+                "shards": shards if self.router.is_sharded else None,
+                "shard_strategy": self.router.strategy if self.router.is_sharded else None,
+                "indexed_conversations": self.metadata_store.count(),
+                "customers": self.metadata_store.count_customers(),
+                "pending_writes": self.write_buffer.get_statistics() if self.write_buffer else None,
+                "preference_profiles": self.preference_store.count(),
                 "collection_name": self.collection_name,
                 "persist_directory": self.persist_directory,
-                "embedding_model": "paraphrase-multilingual-MiniLM-L12-v2"
+                "embedding_model": self.embedding_model.split("/")[-1],
+                "embedding_model_stats": get_embedding_registry().get_statistics().get(self.embedding_model, {})
             }
         except Exception as e:
             return {
@@ -329,7 +675,17 @@ class LongTermMemory:
     def clear_all(self):
         """PRECAUCIÓN: Elimina toda la memoria de largo plazo"""
         try:
+            # Que ninguna escritura pendiente aterrice después del borrado
+            self.flush()
+            for name in self.shard_names():
+                if name != self.collection_name:
+                    self._get_shard(name).delete_collection()
             self.vectorstore.delete_collection()
+            with self._profiles_lock:
+                self._profiles.clear()
+                self._profile_deltas.clear()
+            self.preference_store.delete_all()
+            self.metadata_store.delete_all()
             print("⚠️ Memoria de largo plazo eliminada")
             
             # Recrear vectorstore vacío
@@ -338,6 +694,8 @@ class LongTermMemory:
                 embedding_function=self.embeddings,
                 persist_directory=self.persist_directory
             )
+            with self._shards_lock:
+                self._shards = {self.collection_name: self.vectorstore}
             self.conversation_count = 0
         except Exception as e:
             print(f"❌ Error eliminando memoria: {e}")
@@ -347,7 +705,9 @@ class LongTermMemory:
 
 def create_long_term_memory(
     persist_directory: str = "./data/chroma_db",
-    collection_name: str = "pasteleria_conversations"
+    collection_name: str = "pasteleria_conversations",
+    num_shards: int = 1,
+    shard_strategy: str = "customer"
 ) -> LongTermMemory:
     """
     Factory function para crear memoria de largo plazo
@@ -355,11 +715,15 @@ def create_long_term_memory(
     Args:
         persist_directory: Directorio de persistencia
         collection_name: Nombre de la colección
+        num_shards: Colecciones entre las que se reparten los clientes (1 = sin sharding)
+        shard_strategy: "customer" o "time"
     
     Returns:
         Instancia de LongTermMemory
     """
     return LongTermMemory(
         persist_directory=persist_directory,
-        collection_name=collection_name
+        collection_name=collection_name,
+        num_shards=num_shards,
+        shard_strategy=shard_strategy
     )
@@ -0,0 +1,132 @@
+"""
+Buffer circular de mensajes para la memoria de corto plazo
+Append O(1), acceso a los últimos n en O(n) y límite por turnos y por tokens
+"""
+
+from datetime import datetime
+from typing import Iterator, List, Optional, Sequence
+
+from langchain_core.chat_history import BaseChatMessageHistory
+from langchain_core.messages import AIMessage, BaseMessage, HumanMessage
+
+from ..utils.tokens import TokenCounter, get_token_counter
+
+
+class MessageRecord:
+    """Mensaje compacto (sin __dict__ por instancia)"""
+
+    __slots__ = ("role", "content", "tokens", "timestamp")
+
+    def __init__(self, role: str, content: str, tokens: int, timestamp: float):
+        self.role = role
+        self.content = content
+        self.tokens = tokens
+        self.timestamp = timestamp
+
+    def to_dict(self):
+        return {"role": self.role, "content": self.content}
+
+    def to_message(self) -> BaseMessage:
+        if self.role == "user":
+            return HumanMessage(content=self.content)
+        return AIMessage(content=self.content)
+
+
+class MessageRingBuffer:
+    """
+    Arreglo circular de capacidad fija
+    Al llenarse (o al superar max_tokens) se descartan los mensajes más antiguos
+    """
+
+    def __init__(self, max_messages: int = 100, max_tokens: Optional[int] = None,
+                 token_counter: Optional[TokenCounter] = None):
+        """
+        Args:
+            max_messages: Capacidad en mensajes (2 por turno)
+            max_tokens: Tokens máximos retenidos (None = sin límite); siempre queda el último turno
+            token_counter: Contador de tokens (por defecto el compartido)
+        """
+        if max_messages < 2:
+            raise ValueError("max_messages debe ser al menos 2 (un turno)")
+
+        self.capacity = max_messages
+        self.max_tokens = max_tokens
+        self.token_counter = token_counter or get_token_counter()
+
+        self._slots: List[Optional[MessageRecord]] = [None] * max_messages
+        self._head = 0  # Índice del mensaje más antiguo
+        self._size = 0
+        self.total_tokens = 0
+        self.evicted = 0
+        self.version = 0  # Cambia en cada modificación (para caches derivados)
+
+    def __len__(self) -> int:
+        return self._size
+
+    def _evict_oldest(self):
+        record = self._slots[self._head]
+        self._slots[self._head] = None
+        self._head = (self._head + 1) % self.capacity
+        self._size -= 1
+        self.total_tokens -= record.tokens
+        self.evicted += 1
+
+    def append(self, role: str, content: str):
+        """Agrega un mensaje en O(1) (amortizado con el descarte por tokens)"""
+        if self._size == self.capacity:
+            self._evict_oldest()
+
+        tokens = self.token_counter.count(content)
+        tail = (self._head + self._size) % self.capacity
+        self._slots[tail] = MessageRecord(role, content, tokens, datetime.now().timestamp())
+        self._size += 1
+        self.total_tokens += tokens
+
+        if self.max_tokens is not None:
+            # Se descarta de a turnos (usuario + agente) para no dejar respuestas huérfanas
+            while self.total_tokens > self.max_tokens and self._size > 3:
+                self._evict_oldest()
+                self._evict_oldest()
+
+        self.version += 1
+
+    def last(self, n: int) -> List[MessageRecord]:
+        """Los últimos n mensajes en orden cronológico, recorriendo solo esos n"""
+        n = max(0, min(n, self._size))
+        start = self._head + self._size - n
+        return [self._slots[(start + i) % self.capacity] for i in range(n)]
+
+    def __iter__(self) -> Iterator[MessageRecord]:
+        return iter(self.last(self._size))
+
+    def clear(self):
+        self._slots = [None] * self.capacity
+        self._head = 0
+        self._size = 0
+        self.total_tokens = 0
+        self.version += 1
+
+
+class RingBufferChatMessageHistory(BaseChatMessageHistory):
+    """
+    Historial compatible con la interfaz de LangChain (ConversationBufferMemory, etc.)
+    respaldado por un MessageRingBuffer
+    """
+
+    def __init__(self, buffer: MessageRingBuffer):
+        self.buffer = buffer
+
+    @property
+    def messages(self) -> List[BaseMessage]:
+        return [record.to_message() for record in self.buffer]
+
+    def add_message(self, message: BaseMessage) -> None:
+        role = "user" if message.type == "human" else "assistant"
+        self.buffer.append(role, message.content)
+
+    def add_messages(self, messages: Sequence[BaseMessage]) -> None:
+        for message in messages:
+            self.add_message(message)
+
+    def clear(self) -> None:
+        self.buffer.clear()
@@ -0,0 +1,230 @@
+"""
+Índice estructurado de conversaciones (sqlite) junto al vector store
+Historial por cliente, conteos y borrados sin pasar por el modelo de embeddings ni el índice ANN.
+Solo guarda ids, cliente, fecha y shard: el texto vive únicamente en el documento de Chroma.
+"""
+
+import os
+import sqlite3
+import threading
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+_COLUMNS = ("doc_id", "customer_id", "timestamp", "shard")
+
+# Columnas de la versión anterior del índice, que copiaba el texto de cada conversación
+_LEGACY_COLUMNS = {"user_message", "agent_response", "extra"}
+
+
+class ConversationMetadataStore:
+    """
+    Una fila por conversación, indexada por (customer_id, timestamp)
+    El doc_id es el mismo id del documento en Chroma
+    """
+
+    def __init__(self, db_path: str):
+        directory = os.path.dirname(db_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.db_path = db_path
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(db_path, check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._drop_legacy_columns()
+        # shard: colección de Chroma donde vive el documento (NULL = colección base, anterior al sharding)
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS conversations ("
+            "doc_id TEXT PRIMARY KEY, customer_id TEXT, timestamp TEXT NOT NULL, shard TEXT)"
+        )
+        self._db.execute(
+            "CREATE INDEX IF NOT EXISTS idx_conversations_customer_time "
+            "ON conversations (customer_id, timestamp DESC)"
+        )
+        self._db.execute("CREATE INDEX IF NOT EXISTS idx_conversations_time ON conversations (timestamp)")
+        self._db.commit()
+
+    def _drop_legacy_columns(self):
+        """Reescribe un índice de la versión anterior sin el texto duplicado y libera el espacio"""
+        columns = {row[1] for row in self._db.execute("PRAGMA table_info(conversations)")}
+        if not columns & _LEGACY_COLUMNS:
+            return
+        shard = "shard" if "shard" in columns else "NULL"
+        self._db.execute("DROP TABLE IF EXISTS conversations_slim")
+        self._db.execute(
+            "CREATE TABLE conversations_slim ("
+            "doc_id TEXT PRIMARY KEY, customer_id TEXT, timestamp TEXT NOT NULL, shard TEXT)"
+        )
+        self._db.execute(
+            "INSERT INTO conversations_slim (doc_id, customer_id, timestamp, shard) "
+            f"SELECT doc_id, customer_id, timestamp, {shard} FROM conversations"
+        )
+        self._db.execute("DROP TABLE conversations")
+        self._db.execute("ALTER TABLE conversations_slim RENAME TO conversations")
+        self._db.commit()
+        self._db.execute("VACUUM")
+        print("♻️ Índice de metadata reducido a id, cliente, fecha y shard")
+
+    # ============= ESCRITURA =============
+
+    def add_many(self, entries: Iterable[Dict[str, Any]]):
+        """
+        Inserta (o reemplaza) conversaciones
+
+        Args:
+            entries: Dicts con doc_id, customer_id, timestamp ISO y shard (otras claves se ignoran)
+        """
+        rows = [
+            (entry["doc_id"], entry.get("customer_id"), entry.get("timestamp", ""), entry.get("shard"))
+            for entry in entries
+        ]
+        if not rows:
+            return
+        with self._lock:
+            self._db.executemany(
+                "INSERT OR REPLACE INTO conversations (doc_id, customer_id, timestamp, shard) "
+                "VALUES (?, ?, ?, ?)",
+                rows
+            )
+            self._db.commit()
+
+    def delete_customer(self, customer_id: str) -> Dict[Optional[str], List[str]]:
+        """Elimina las conversaciones del cliente y retorna sus doc_id por shard (para borrarlos del vector store)"""
+        with self._lock:
+            rows = self._db.execute(
+                "SELECT doc_id, shard FROM conversations WHERE customer_id = ?", (customer_id,)
+            ).fetchall()
+            self._db.execute("DELETE FROM conversations WHERE customer_id = ?", (customer_id,))
+            self._db.commit()
+        return _group_by_shard(rows)
+
+    def delete_ids(self, doc_ids: List[str]):
+        if not doc_ids:
+            return
+        with self._lock:
+            self._db.executemany("DELETE FROM conversations WHERE doc_id = ?", [(i,) for i in doc_ids])
+            self._db.commit()
+
+    def delete_all(self):
+        with self._lock:
+            self._db.execute("DELETE FROM conversations")
+            self._db.commit()
+
+    # ============= LECTURA =============
+
+    def get_customer_history(self, customer_id: str, limit: int = 10, offset: int = 0,
+                             newest_first: bool = True) -> List[Dict[str, Any]]:
+        """
+        Página del historial del cliente ordenada por timestamp (usa el índice, sin ordenar en Python)
+        Cada fila trae doc_id, customer_id, timestamp y shard; el texto se lee del vector store
+        """
+        order = "DESC" if newest_first else "ASC"
+        with self._lock:
+            rows = self._db.execute(
+                "SELECT doc_id, customer_id, timestamp, shard "
+                f"FROM conversations WHERE customer_id = ? ORDER BY timestamp {order} LIMIT ? OFFSET ?",
+                (customer_id, limit, offset)
+            ).fetchall()
+        return [self._row_to_dict(row) for row in rows]
+
+    def shards_of(self, doc_ids: List[str]) -> Dict[Optional[str], List[str]]:
+        """doc_id agrupados por shard (None = colección base)"""
+        if not doc_ids:
+            return {}
+        placeholders = ",".join("?" * len(doc_ids))
+        with self._lock:
+            rows = self._db.execute(
+                f"SELECT doc_id, shard FROM conversations WHERE doc_id IN ({placeholders})", list(doc_ids)
+            ).fetchall()
+        return _group_by_shard(rows)
+
+    def distinct_shards(self) -> List[str]:
+        with self._lock:
+            return [row[0] for row in self._db.execute(
+                "SELECT DISTINCT shard FROM conversations WHERE shard IS NOT NULL"
+            )]
+
+    def get_many(self, doc_ids: List[str]) -> List[Dict[str, Any]]:
+        if not doc_ids:
+            return []
+        placeholders = ",".join("?" * len(doc_ids))
+        with self._lock:
+            rows = self._db.execute(
+                "SELECT doc_id, customer_id, timestamp, shard "
+                f"FROM conversations WHERE doc_id IN ({placeholders})",
+                list(doc_ids)
+            ).fetchall()
+        return [self._row_to_dict(row) for row in rows]
+
+    def ids_older_than(self, cutoff: str, limit: int = 200) -> List[str]:
+        """Conversaciones con timestamp anterior a cutoff (ISO), las más antiguas primero"""
+        with self._lock:
+            return [row[0] for row in self._db.execute(
+                "SELECT doc_id FROM conversations WHERE timestamp < ? ORDER BY timestamp LIMIT ?",
+                (cutoff, limit)
+            )]
+
+    def customers_over(self, max_documents: int, limit: int = 100) -> List[str]:
+        """Clientes con más de max_documents conversaciones"""
+        with self._lock:
+            return [row[0] for row in self._db.execute(
+                "SELECT customer_id FROM conversations WHERE customer_id IS NOT NULL "
+                "GROUP BY customer_id HAVING COUNT(*) > ? LIMIT ?",
+                (max_documents, limit)
+            )]
+
+    def oldest_beyond(self, customer_id: str, keep: int, limit: int = 200) -> List[str]:
+        """Conversaciones del cliente que exceden las keep más recientes"""
+        with self._lock:
+            return [row[0] for row in self._db.execute(
+                "SELECT doc_id FROM conversations WHERE customer_id = ? "
+                "ORDER BY timestamp DESC LIMIT ? OFFSET ?",
+                (customer_id, limit, keep)
+            )]
+
+    def customer_ids_page(self, min_documents: int = 2, after: Optional[str] = None, limit: int = 50) -> List[str]:
+        """
+        Página de clientes con al menos min_documents conversaciones, ordenados por id
+        Se pagina por cursor (after = último cliente visto): borrar entre páginas no salta clientes
+        """
+        with self._lock:
+            return [row[0] for row in self._db.execute(
+                "SELECT customer_id FROM conversations WHERE customer_id IS NOT NULL AND customer_id > ? "
+                "GROUP BY customer_id HAVING COUNT(*) >= ? ORDER BY customer_id LIMIT ?",
+                (after or "", min_documents, limit)
+            )]
+
+    def customer_doc_ids(self, customer_id: str, limit: int = 500) -> List[Tuple[str, str]]:
+        """(doc_id, timestamp) del cliente, más reciente primero"""
+        with self._lock:
+            return self._db.execute(
+                "SELECT doc_id, timestamp FROM conversations WHERE customer_id = ? "
+                "ORDER BY timestamp DESC LIMIT ?",
+                (customer_id, limit)
+            ).fetchall()
+
+    def count(self, customer_id: Optional[str] = None) -> int:
+        with self._lock:
+            if customer_id is None:
+                return self._db.execute("SELECT COUNT(*) FROM conversations").fetchone()[0]
+            return self._db.execute(
+                "SELECT COUNT(*) FROM conversations WHERE customer_id = ?", (customer_id,)
+            ).fetchone()[0]
+
+    def count_customers(self) -> int:
+        with self._lock:
+            return self._db.execute(
+                "SELECT COUNT(DISTINCT customer_id) FROM conversations WHERE customer_id IS NOT NULL"
+            ).fetchone()[0]
+
+    def _row_to_dict(self, row) -> Dict[str, Any]:
+        return dict(zip(_COLUMNS, row))
+
+    def close(self):
+        with self._lock:
+            self._db.close()
+
+
+def _group_by_shard(rows) -> Dict[Optional[str], List[str]]:
+    groups: Dict[Optional[str], List[str]] = {}
+    for doc_id, shard in rows:
+        groups.setdefault(shard, []).append(doc_id)
+    return groups
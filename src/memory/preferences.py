@@ -0,0 +1,362 @@
+"""
+Perfil incremental de preferencias del cliente
+Un autómata Aho–Corasick detecta todas las palabras clave en una sola pasada por mensaje
+y el perfil acumula contadores, por lo que leer las preferencias no depende del largo del historial
+"""
+
+import json
+import os
+import sqlite3
+import threading
+from collections import Counter, deque
+from datetime import datetime
+from typing import Any, Dict, Iterable, List, Optional
+
+from ..text_utils import normalizar_texto
+
+
+# ============= PALABRAS CLAVE =============
+
+# Rasgo -> patrones (se comparan sin acentos y en minúsculas)
+PREFERENCE_KEYWORDS: Dict[str, List[str]] = {
+    # Sabores
+    "chocolate": ["chocolate"],
+    "vainilla": ["vainilla"],
+    "frutas": ["frutas"],
+    "manjar": ["manjar"],
+    # Categorías
+    "vegano": ["vegano", "vegana"],
+    "sin_azucar": ["sin azucar"],
+    "diabetico": ["diabetico"],
+    "cuadrada": ["cuadrada"],
+    "circular": ["circular"],
+    # Restricciones
+    "alergia": ["alergico", "alergia"],
+    "vegetariano": ["vegetariano"],
+    "sin_gluten": ["celiaco", "gluten"],
+    # Ocasiones
+    "cumpleanos": ["cumpleanos"],
+    "boda": ["boda", "matrimonio"],
+    "aniversario": ["aniversario"],
+    # Presupuesto
+    "economico": ["economico", "barato"],
+    "premium": ["premium"],
+    "lujo": ["lujo"],
+    "precio_alto": [str(p) for p in range(50000, 100000, 10000)]
+}
+
+FLAVOR_LABELS = {
+    "chocolate": "Tortas de chocolate",
+    "vainilla": "Tortas de vainilla",
+    "frutas": "Tortas de frutas",
+    "manjar": "Tortas de manjar"
+}
+
+# Menciones necesarias para considerar un sabor como favorito
+FAVORITE_MIN_MENTIONS = 2
+
+
+class KeywordMatcher:
+    """Autómata Aho–Corasick: cuenta todas las ocurrencias de todos los patrones en O(len(texto))"""
+
+    def __init__(self, keywords: Dict[str, List[str]]):
+        """
+        Args:
+            keywords: Rasgo -> lista de patrones
+        """
+        self._goto: List[Dict[str, int]] = [{}]
+        self._fail: List[int] = [0]
+        self._output: List[List[str]] = [[]]
+
+        for feature, patterns in keywords.items():
+            for pattern in patterns:
+                self._add(normalizar_texto(pattern), feature)
+        self._build()
+
+    def _add(self, pattern: str, feature: str):
+        state = 0
+        for char in pattern:
+            nxt = self._goto[state].get(char)
+            if nxt is None:
+                nxt = len(self._goto)
+                self._goto[state][char] = nxt
+                self._goto.append({})
+                self._fail.append(0)
+                self._output.append([])
+            state = nxt
+        self._output[state].append(feature)
+
+    def _build(self):
+        """Enlaces de fallo por BFS; cada estado hereda las salidas de su enlace"""
+        # Los hijos de la raíz fallan a la raíz (fail = 0 por defecto)
+        queue = deque(self._goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for char, nxt in self._goto[state].items():
+                queue.append(nxt)
+                fail = self._fail[state]
+                while fail and char not in self._goto[fail]:
+                    fail = self._fail[fail]
+                self._fail[nxt] = self._goto[fail].get(char, 0)
+                self._output[nxt] = self._output[nxt] + self._output[self._fail[nxt]]
+
+    def count(self, text: str) -> Counter:
+        """Ocurrencias de cada rasgo en el texto"""
+        counts: Counter = Counter()
+        goto, fail, output = self._goto, self._fail, self._output
+        state = 0
+        for char in normalizar_texto(text):
+            while state and char not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(char, 0)
+            for feature in output[state]:
+                counts[feature] += 1
+        return counts
+
+
+_matcher: Optional[KeywordMatcher] = None
+_matcher_lock = threading.Lock()
+
+
+def get_preference_matcher() -> KeywordMatcher:
+    """Autómata compartido (se construye una vez por proceso)"""
+    global _matcher
+    with _matcher_lock:
+        if _matcher is None:
+            _matcher = KeywordMatcher(PREFERENCE_KEYWORDS)
+        return _matcher
+
+
+# ============= PERFIL =============
+
+class PreferenceProfile:
+    """Contadores de rasgos acumulados mensaje a mensaje"""
+
+    def __init__(self, counts: Optional[Dict[str, int]] = None, messages: int = 0,
+                 updated_at: Optional[str] = None):
+        self.counts: Counter = Counter(counts or {})
+        self.messages = messages
+        self.updated_at = updated_at
+
+    @staticmethod
+    def count_mentions(*texts: str) -> Counter:
+        """Menciones de cada rasgo en un intercambio (cada texto se escanea una sola vez)"""
+        matcher = get_preference_matcher()
+        counts: Counter = Counter()
+        for text in texts:
+            if text:
+                counts.update(matcher.count(text))
+        return counts
+
+    def add(self, mentions: Dict[str, int], messages: int = 1, updated_at: Optional[str] = None):
+        """Suma (o resta, con valores negativos) menciones y mensajes"""
+        self.counts.update(mentions)
+        for feature in [f for f, n in self.counts.items() if n <= 0]:
+            del self.counts[feature]
+        self.messages = max(0, self.messages + messages)
+        updated_at = updated_at or datetime.now().isoformat()
+        if self.updated_at is None or updated_at > self.updated_at:
+            self.updated_at = updated_at
+
+    def update(self, *texts: str):
+        """Suma las menciones de un intercambio"""
+        self.add(self.count_mentions(*texts))
+
+    def merge(self, other: "PreferenceProfile") -> "PreferenceProfile":
+        """Suma otro perfil (o delta de contadores) a este"""
+        self.add(other.counts, other.messages, other.updated_at)
+        return self
+
+    @classmethod
+    def from_conversations(cls, conversations: Iterable[Dict[str, str]]) -> "PreferenceProfile":
+        profile = cls()
+        for conv in conversations:
+            if conv.get("user_message") or conv.get("agent_response"):
+                profile.update(conv.get("user_message", ""), conv.get("agent_response", ""))
+            else:
+                profile.update(conv.get("content", ""))
+        return profile
+
+    def has(self, *features: str) -> bool:
+        return any(self.counts.get(f, 0) > 0 for f in features)
+
+    def as_session_preferences(self) -> Dict[str, List[str]]:
+        """Formato de ShortTermMemory.extract_user_preferences"""
+        preferences = {
+            "categorias_interes": [],
+            "restricciones": [],
+            "ocasiones": [],
+            "presupuesto": []
+        }
+
+        if self.has("vegano"):
+            preferences["categorias_interes"].append("Productos veganos")
+        if self.has("sin_azucar", "diabetico"):
+            preferences["categorias_interes"].append("Productos sin azúcar")
+        if self.has("cuadrada"):
+            preferences["categorias_interes"].append("Tortas cuadradas")
+        if self.has("circular"):
+            preferences["categorias_interes"].append("Tortas circulares")
+
+        if self.has("alergia"):
+            preferences["restricciones"].append("Alergias alimentarias")
+        if self.has("vegetariano"):
+            preferences["restricciones"].append("Vegetariano")
+
+        if self.has("cumpleanos"):
+            preferences["ocasiones"].append("Cumpleaños")
+        if self.has("boda"):
+            preferences["ocasiones"].append("Boda")
+        if self.has("aniversario"):
+            preferences["ocasiones"].append("Aniversario")
+
+        if self.has("economico"):
+            preferences["presupuesto"].append("Económico")
+        elif self.has("premium", "lujo"):
+            preferences["presupuesto"].append("Premium")
+
+        return preferences
+
+    def as_customer_preferences(self) -> Dict[str, Any]:
+        """Formato de LongTermMemory.extract_customer_preferences"""
+        preferences = {
+            "productos_favoritos": [
+                label for feature, label in FLAVOR_LABELS.items()
+                if self.counts.get(feature, 0) >= FAVORITE_MIN_MENTIONS
+            ],
+            "categorias_preferidas": [],
+            "restricciones_alimentarias": [],
+            "ocasiones_frecuentes": [],
+            "rango_presupuesto": "No definido"
+        }
+
+        if self.has("vegano"):
+            preferences["categorias_preferidas"].append("Productos veganos")
+        if self.has("sin_azucar"):
+            preferences["categorias_preferidas"].append("Productos sin azúcar")
+        if self.has("cuadrada"):
+            preferences["categorias_preferidas"].append("Tortas cuadradas")
+
+        if self.has("alergia"):
+            preferences["restricciones_alimentarias"].append("Alergias")
+        if self.has("vegetariano"):
+            preferences["restricciones_alimentarias"].append("Vegetariano")
+        if self.has("sin_gluten"):
+            preferences["restricciones_alimentarias"].append("Sin gluten")
+
+        if self.has("cumpleanos"):
+            preferences["ocasiones_frecuentes"].append("Cumpleaños")
+        if self.has("boda"):
+            preferences["ocasiones_frecuentes"].append("Bodas")
+
+        if self.has("economico"):
+            preferences["rango_presupuesto"] = "Económico (< $30.000)"
+        elif self.has("premium", "precio_alto"):
+            preferences["rango_presupuesto"] = "Premium (> $50.000)"
+        else:
+            preferences["rango_presupuesto"] = "Medio ($30.000 - $50.000)"
+
+        return preferences
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {"counts": dict(self.counts), "messages": self.messages, "updated_at": self.updated_at}
+
+    def clear(self):
+        self.counts.clear()
+        self.messages = 0
+        self.updated_at = None
+
+
+# ============= PERSISTENCIA =============
+
+class PreferenceStore:
+    """Perfiles por cliente en sqlite (una fila por cliente)"""
+
+    def __init__(self, db_path: str):
+        directory = os.path.dirname(db_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.db_path = db_path
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(db_path, check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS preference_profiles ("
+            "customer_id TEXT PRIMARY KEY, counts TEXT NOT NULL, messages INTEGER NOT NULL, updated_at TEXT)"
+        )
+        self._db.commit()
+
+    def load(self, customer_id: str) -> Optional[PreferenceProfile]:
+        with self._lock:
+            return self._read(customer_id)
+
+    def _read(self, customer_id: str) -> Optional[PreferenceProfile]:
+        row = self._db.execute(
+            "SELECT counts, messages, updated_at FROM preference_profiles WHERE customer_id = ?",
+            (customer_id,)
+        ).fetchone()
+        return PreferenceProfile(json.loads(row[0]), row[1], row[2]) if row else None
+
+    def _write(self, customer_id: str, profile: PreferenceProfile):
+        self._db.execute(
+            "INSERT OR REPLACE INTO preference_profiles (customer_id, counts, messages, updated_at) "
+            "VALUES (?, ?, ?, ?)",
+            (customer_id, json.dumps(dict(profile.counts)), profile.messages, profile.updated_at)
+        )
+
+    def insert_if_missing(self, customer_id: str, profile: PreferenceProfile) -> PreferenceProfile:
+        """Guarda el perfil solo si el cliente no tiene uno; retorna el que quedó guardado"""
+        with self._lock:
+            self._db.execute("BEGIN IMMEDIATE")
+            try:
+                stored = self._read(customer_id)
+                if stored is None:
+                    self._write(customer_id, profile)
+                    stored = profile
+                self._db.commit()
+            except Exception:
+                self._db.rollback()
+                raise
+        return stored
+
+    def merge_many(self, deltas: Dict[str, PreferenceProfile]) -> Dict[str, PreferenceProfile]:
+        """
+        Suma cada delta al perfil guardado (lectura y escritura en una misma transacción)
+        Varias instancias sobre el mismo archivo no se pisan: cada una aporta solo lo que contó
+
+        Returns:
+            Perfiles resultantes por cliente
+        """
+        if not deltas:
+            return {}
+        merged = {}
+        with self._lock:
+            self._db.execute("BEGIN IMMEDIATE")
+            try:
+                for customer_id, delta in deltas.items():
+                    profile = (self._read(customer_id) or PreferenceProfile()).merge(delta)
+                    self._write(customer_id, profile)
+                    merged[customer_id] = profile
+                self._db.commit()
+            except Exception:
+                self._db.rollback()
+                raise
+        return merged
+
+    def delete(self, customer_id: str):
+        with self._lock:
+            self._db.execute("DELETE FROM preference_profiles WHERE customer_id = ?", (customer_id,))
+            self._db.commit()
+
+    def delete_all(self):
+        with self._lock:
+            self._db.execute("DELETE FROM preference_profiles")
+            self._db.commit()
+
+    def count(self) -> int:
+        with self._lock:
+            return self._db.execute("SELECT COUNT(*) FROM preference_profiles").fetchone()[0]
+
+    def close(self):
+        with self._lock:
+            self._db.close()
@@ -0,0 +1,325 @@
+"""
+Retención y compactación de la memoria de largo plazo
+Elimina (o archiva) conversaciones vencidas, fusiona casi-duplicados y acota conversaciones por cliente.
+Trabaja en lotes pequeños con pausas para no competir con el tráfico de consultas.
+"""
+
+import json
+import os
+import threading
+import time
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+
+# Consultas de prueba para medir latencia antes y después de compactar
+PROBE_QUERIES = [
+    "torta de chocolate para cumpleaños",
+    "productos veganos sin azúcar",
+    "descuento para adulto mayor"
+]
+
+
+class RetentionPolicy:
+    """Parámetros del job de retención"""
+
+    def __init__(
+        self,
+        retention_days: Optional[int] = 30,
+        max_per_customer: Optional[int] = 200,
+        duplicate_similarity: Optional[float] = 0.97,
+        archive_path: Optional[str] = None,
+        batch_size: int = 200,
+        pause_seconds: float = 0.05
+    ):
+        """
+        Args:
+            retention_days: Días que se conserva una conversación (None = sin vencimiento)
+            max_per_customer: Conversaciones máximas por cliente; se descartan las más antiguas (None = sin tope)
+            duplicate_similarity: Similitud coseno desde la cual dos conversaciones del mismo cliente
+                se consideran duplicadas y se conserva solo la más reciente (None = no deduplicar)
+            archive_path: Archivo JSON lines donde archivar lo eliminado (None = solo eliminar)
+            batch_size: Documentos por lote de borrado
+            pause_seconds: Pausa entre lotes (cede el vector store a las consultas)
+        """
+        self.retention_days = retention_days
+        self.max_per_customer = max_per_customer
+        self.duplicate_similarity = duplicate_similarity
+        self.archive_path = archive_path
+        self.batch_size = batch_size
+        self.pause_seconds = pause_seconds
+
+
+class RetentionJob:
+    """
+    Una pasada recorre tres fases: vencidas -> tope por cliente -> casi-duplicados
+    Con max_batches la pasada se corta y la siguiente retoma donde quedó
+    """
+
+    def __init__(self, memory, policy: Optional[RetentionPolicy] = None):
+        """
+        Args:
+            memory: LongTermMemory (usa su índice de metadata y su vector store)
+            policy: Parámetros de retención
+        """
+        self.memory = memory
+        self.policy = policy or RetentionPolicy()
+        # Último cliente deduplicado: una pasada cortada por el presupuesto retoma desde aquí,
+        # también en una instancia nueva del job (se guarda junto a la colección)
+        self._state_path = os.path.join(memory.persist_directory, f"{memory.collection_name}.retention.json")
+        self._dedup_cursor: Optional[str] = self._load_state().get("dedup_cursor")
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self.last_report: Dict[str, Any] = {}
+
+    # ============= ESTADO =============
+
+    def _load_state(self) -> Dict[str, Any]:
+        try:
+            with open(self._state_path, "r", encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def _save_state(self):
+        try:
+            tmp_path = self._state_path + ".tmp"
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump({"dedup_cursor": self._dedup_cursor}, f)
+            os.replace(tmp_path, self._state_path)
+        except OSError as e:
+            print(f"⚠️ No se pudo guardar el estado de retención: {e}")
+
+    # ============= EJECUCIÓN =============
+
+    def run(self, max_batches: Optional[int] = None, measure: bool = True) -> Dict[str, Any]:
+        """
+        Ejecuta una pasada
+
+        Args:
+            max_batches: Tope de lotes de borrado en esta pasada (None = hasta terminar)
+            measure: Si True mide tamaño del índice y latencia de consulta antes y después
+
+        Returns:
+            Reporte con conteos por fase y mejoras medidas
+        """
+        start = time.perf_counter()
+        report = {
+            "expired": 0,
+            "capped": 0,
+            "duplicates_merged": 0,
+            "archived": 0,
+            "batches": 0,
+            "completed": False
+        }
+        before = self._measure() if measure else None
+
+        # El flush evita que lo encolado reaparezca después de compactar
+        self.memory.flush()
+        budget = [max_batches]
+
+        completed = (
+            self._expire(report, budget)
+            and self._cap_customers(report, budget)
+            and self._merge_duplicates(report, budget)
+        )
+        report["completed"] = completed
+
+        if measure:
+            after = self._measure()
+            report["index_size_mb"] = {"before": before["size_mb"], "after": after["size_mb"]}
+            report["query_latency_ms"] = {"before": before["latency_ms"], "after": after["latency_ms"]}
+            report["documents"] = {"before": before["documents"], "after": after["documents"]}
+        report["elapsed_seconds"] = round(time.perf_counter() - start, 3)
+
+        self.last_report = report
+        print(f"🧹 Retención: {report['expired']} vencidas, {report['capped']} sobre el tope, "
+              f"{report['duplicates_merged']} duplicadas ({report['batches']} lotes)")
+        return report
+
+    def _take_batch(self, budget: List[Optional[int]]) -> bool:
+        """Consume un lote del presupuesto de la pasada; False si se agotó"""
+        if self._stop.is_set():
+            return False
+        if budget[0] is not None:
+            if budget[0] <= 0:
+                return False
+            budget[0] -= 1
+        return True
+
+    def _remove(self, doc_ids: List[str], report: Dict[str, Any], pause: bool = True):
+        """Archiva y elimina un lote; con pause cuenta como lote y cede el vector store a las consultas"""
+        if self.policy.archive_path:
+            self._archive(doc_ids)
+            report["archived"] += len(doc_ids)
+        self.memory.delete_conversations(doc_ids)
+        if pause:
+            report["batches"] += 1
+            if self.policy.pause_seconds:
+                time.sleep(self.policy.pause_seconds)
+
+    def _archive(self, doc_ids: List[str]):
+        rows = self.memory.get_conversations(doc_ids)
+        directory = os.path.dirname(self.policy.archive_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        archived_at = datetime.now().isoformat()
+        with open(self.policy.archive_path, "a", encoding="utf-8") as f:
+            for row in rows:
+                f.write(json.dumps(dict(row, archived_at=archived_at), ensure_ascii=False) + "\n")
+
+    # ============= FASES =============
+
+    def _expire(self, report: Dict[str, Any], budget: List[Optional[int]]) -> bool:
+        if self.policy.retention_days is None:
+            return True
+        cutoff = (datetime.now() - timedelta(days=self.policy.retention_days)).isoformat()
+        while True:
+            doc_ids = self.memory.metadata_store.ids_older_than(cutoff, limit=self.policy.batch_size)
+            if not doc_ids:
+                return True
+            if not self._take_batch(budget):
+                return False
+            self._remove(doc_ids, report)
+            report["expired"] += len(doc_ids)
+
+    def _cap_customers(self, report: Dict[str, Any], budget: List[Optional[int]]) -> bool:
+        limit = self.policy.max_per_customer
+        if limit is None:
+            return True
+        store = self.memory.metadata_store
+        while True:
+            customers = store.customers_over(limit)
+            if not customers:
+                return True
+            for customer_id in customers:
+                while True:
+                    doc_ids = store.oldest_beyond(customer_id, keep=limit, limit=self.policy.batch_size)
+                    if not doc_ids:
+                        break
+                    if not self._take_batch(budget):
+                        return False
+                    self._remove(doc_ids, report)
+                    report["capped"] += len(doc_ids)
+
+    def _merge_duplicates(self, report: Dict[str, Any], budget: List[Optional[int]]) -> bool:
+        """
+        Por cliente, recorre sus conversaciones de la más nueva a la más antigua y descarta las que
+        son casi idénticas (coseno >= umbral) a una ya conservada; la conservada acumula merged_duplicates
+        Cada página de clientes consume un lote del presupuesto (leer sus vectores cuesta aunque no haya duplicados)
+        """
+        threshold = self.policy.duplicate_similarity
+        if threshold is None:
+            return True
+        store = self.memory.metadata_store
+        page_size = 50
+
+        while True:
+            customers = store.customer_ids_page(min_documents=2, after=self._dedup_cursor, limit=page_size)
+            if not customers:
+                self._dedup_cursor = None
+                self._save_state()
+                return True
+            if not self._take_batch(budget):
+                return False
+
+            for customer_id in customers:
+                rows = store.customer_doc_ids(customer_id, limit=self.policy.max_per_customer or 500)
+                vectors = self.memory.get_embeddings([doc_id for doc_id, _ in rows])
+                ordered = [(doc_id, vectors[doc_id]) for doc_id, _ in rows if doc_id in vectors]
+                duplicates, merged_into = self._find_duplicates(ordered, threshold)
+                if duplicates:
+                    self._remove(duplicates, report, pause=False)
+                    report["duplicates_merged"] += len(duplicates)
+                    self._mark_merged(merged_into)
+
+            self._dedup_cursor = customers[-1]
+            self._save_state()
+            report["batches"] += 1
+            if self.policy.pause_seconds:
+                time.sleep(self.policy.pause_seconds)
+
+    @staticmethod
+    def _find_duplicates(ordered, threshold: float):
+        if len(ordered) < 2:
+            return [], {}
+        matrix = np.asarray([vector for _, vector in ordered], dtype=np.float32)
+        norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+        matrix = matrix / np.where(norms == 0, 1, norms)
+
+        kept: List[int] = []
+        duplicates: List[str] = []
+        merged_into: Dict[str, int] = {}
+        for i in range(len(ordered)):
+            if kept:
+                similarities = matrix[kept] @ matrix[i]
+                best = int(np.argmax(similarities))
+                if similarities[best] >= threshold:
+                    duplicates.append(ordered[i][0])
+                    keeper = ordered[kept[best]][0]
+                    merged_into[keeper] = merged_into.get(keeper, 0) + 1
+                    continue
+            kept.append(i)
+        return duplicates, merged_into
+
+    def _mark_merged(self, merged_into: Dict[str, int]):
+        """Anota en la conversación conservada cuántas duplicadas absorbió"""
+        try:
+            for collection, ids in self.memory.collections_for(list(merged_into)):
+                current = collection.get(ids=ids, include=["metadatas"])
+                metadatas = [
+                    {"merged_duplicates": int((metadata or {}).get("merged_duplicates", 0)) + merged_into[doc_id]}
+                    for doc_id, metadata in zip(current["ids"], current["metadatas"])
+                ]
+                collection.update(ids=current["ids"], metadatas=metadatas)
+        except Exception as e:
+            print(f"⚠️ No se pudo anotar la fusión de duplicados: {e}")
+
+    # ============= MEDICIÓN =============
+
+    def _measure(self) -> Dict[str, Any]:
+        size = 0
+        for root, _, files in os.walk(self.memory.persist_directory):
+            for name in files:
+                size += os.path.getsize(os.path.join(root, name))
+
+        latencies = []
+        for query in PROBE_QUERIES:
+            t = time.perf_counter()
+            try:
+                self.memory._search(query, 3, None)
+            except Exception:
+                break
+            latencies.append((time.perf_counter() - t) * 1000)
+
+        return {
+            "size_mb": round(size / 1e6, 2),
+            "latency_ms": round(sum(latencies) / len(latencies), 2) if latencies else None,
+            "documents": self.memory.metadata_store.count()
+        }
+
+    # ============= SEGUNDO PLANO =============
+
+    def start(self, interval_seconds: float = 3600.0, max_batches_per_run: Optional[int] = 20):
+        """Ejecuta pasadas periódicas en un hilo daemon (cada pasada acotada a max_batches_per_run lotes)"""
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._stop.clear()
+
+        def loop():
+            while not self._stop.is_set():
+                try:
+                    self.run(max_batches=max_batches_per_run, measure=False)
+                except Exception as e:
+                    print(f"⚠️ Error en el job de retención: {e}")
+                self._stop.wait(interval_seconds)
+
+        self._thread = threading.Thread(target=loop, name="memory-retention", daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout: Optional[float] = None):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=timeout)
+            self._thread = None
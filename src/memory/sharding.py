@@ -0,0 +1,70 @@
+"""
+Enrutamiento de conversaciones a colecciones (shards) de Chroma
+Por hash del customer_id (cada cliente vive en un solo shard) o por bucket de tiempo (un shard por mes/día)
+"""
+
+import zlib
+from datetime import datetime
+from typing import List, Optional
+
+SHARD_STRATEGIES = ("customer", "time")
+TIME_BUCKET_FORMATS = {"month": "%Y%m", "day": "%Y%m%d"}
+
+
+class ShardRouter:
+    """Decide el shard de escritura y los shards que debe leer una consulta"""
+
+    def __init__(self, collection_name: str, num_shards: int = 1, strategy: str = "customer",
+                 time_bucket: str = "month"):
+        """
+        Args:
+            collection_name: Nombre base; sin sharding es la única colección
+            num_shards: Cantidad de shards para la estrategia "customer" (1 = sin sharding)
+            strategy: "customer" (hash del customer_id) o "time" (bucket de la fecha)
+            time_bucket: "month" o "day" para la estrategia "time"
+        """
+        if strategy not in SHARD_STRATEGIES:
+            raise ValueError(f"Estrategia de sharding no soportada: {strategy}")
+        if time_bucket not in TIME_BUCKET_FORMATS:
+            raise ValueError(f"Bucket de tiempo no soportado: {time_bucket}")
+        if num_shards < 1:
+            raise ValueError("num_shards debe ser al menos 1")
+
+        self.collection_name = collection_name
+        self.num_shards = num_shards
+        self.strategy = strategy
+        self.time_bucket = time_bucket
+
+    @property
+    def is_sharded(self) -> bool:
+        return self.strategy == "time" or self.num_shards > 1
+
+    def _customer_shard(self, customer_id: Optional[str]) -> str:
+        # crc32 es estable entre procesos (hash() de Python no lo es)
+        index = zlib.crc32((customer_id or "").encode("utf-8")) % self.num_shards
+        return f"{self.collection_name}_s{index:02d}"
+
+    def shard_for(self, customer_id: Optional[str] = None, timestamp_ms: Optional[int] = None) -> str:
+        """Shard donde se escribe una conversación"""
+        if not self.is_sharded:
+            return self.collection_name
+        if self.strategy == "customer":
+            return self._customer_shard(customer_id)
+        moment = datetime.fromtimestamp(timestamp_ms / 1000) if timestamp_ms else datetime.now()
+        return f"{self.collection_name}_{moment.strftime(TIME_BUCKET_FORMATS[self.time_bucket])}"
+
+    def shards_for_customer(self, customer_id: str) -> Optional[List[str]]:
+        """Shards que contienen al cliente (None = puede estar en cualquiera)"""
+        if not self.is_sharded:
+            return [self.collection_name]
+        if self.strategy == "customer":
+            return [self._customer_shard(customer_id)]
+        return None
+
+    def static_shards(self) -> List[str]:
+        """Shards conocidos de antemano (los de tiempo se descubren a medida que se escriben)"""
+        if not self.is_sharded:
+            return [self.collection_name]
+        if self.strategy == "customer":
+            return [f"{self.collection_name}_s{i:02d}" for i in range(self.num_shards)]
+        return []
@@ -9,6 +9,11 @@ from typing import List, Dict, Any, Optional
 from datetime import datetime
 import json
 
+from ..utils.tokens import get_token_counter
+from ..monitoring.tracing import traced
+from .message_buffer import MessageRingBuffer, RingBufferChatMessageHistory
+from .preferences import PreferenceProfile
+
 
 class ShortTermMemory:
     """
@@ -20,7 +25,8 @@ class ShortTermMemory:
         self,
         memory_type: str = "buffer",
         openai_api_key: Optional[str] = None,
-        max_token_limit: int = 2000
+        max_token_limit: int = 2000,
+        max_turns: int = 50
     ):
         """
         Inicializa el sistema de memoria de corto plazo
@@ -28,14 +34,27 @@ class ShortTermMemory:
         Args:
             memory_type: Tipo de memoria ("buffer" o "summary")
             openai_api_key: API key para memoria tipo summary
-            max_token_limit: Límite de tokens para la memoria
+            max_token_limit: Límite de tokens para la memoria (en tipo buffer se descartan los turnos más antiguos)
+            max_turns: Máximo de intercambios retenidos en tipo buffer
         """
         self.memory_type = memory_type
         self.max_token_limit = max_token_limit
+        self.max_turns = max_turns
+        self.token_counter = get_token_counter()
+        self.buffer: Optional[MessageRingBuffer] = None
+        self._context_cache = (None, "")
+        # Preferencias de la sesión, actualizadas en cada intercambio
+        self.preference_profile = PreferenceProfile()
         
         if memory_type == "buffer":
-            # Memoria buffer: mantiene todos los mensajes
+            # Memoria buffer: buffer circular acotado por turnos y tokens
+            self.buffer = MessageRingBuffer(
+                max_messages=max_turns * 2,
+                max_tokens=max_token_limit,
+                token_counter=self.token_counter
+            )
             self.memory = ConversationBufferMemory(
+                chat_memory=RingBufferChatMessageHistory(self.buffer),
                 memory_key="chat_history",
                 return_messages=True,
                 output_key="output"
@@ -66,6 +85,7 @@ class ShortTermMemory:
         
         print(f"✅ Memoria de corto plazo inicializada (tipo: {memory_type})")
     
+    @traced("short_term.add_message")
     def add_message(self, user_message: str, agent_response: str):
         """
         Agrega un intercambio de mensajes a la memoria
@@ -79,6 +99,12 @@ class ShortTermMemory:
             {"output": agent_response}
         )
         self.message_count += 1
+        self.preference_profile.update(user_message, agent_response)
+    
+    @property
+    def pruned_messages(self) -> int:
+        """Mensajes descartados por el límite de turnos/tokens"""
+        return self.buffer.evicted if self.buffer is not None else 0
     
     def get_context(self) -> str:
         """
@@ -87,6 +113,17 @@ class ShortTermMemory:
         Returns:
             String con el historial formateado
         """
+        if self.buffer is not None:
+            # Solo se vuelve a unir el historial si cambió desde la última llamada
+            version, context = self._context_cache
+            if version != self.buffer.version:
+                context = "\n".join(
+                    f"{'Usuario' if r.role == 'user' else 'Asistente'}: {r.content}"
+                    for r in self.buffer
+                )
+                self._context_cache = (self.buffer.version, context)
+            return context
+        
         memory_vars = self.memory.load_memory_variables({})
         chat_history = memory_vars.get("chat_history", [])
         
@@ -107,6 +144,7 @@ class ShortTermMemory:
         
         return "\n".join(formatted)
     
+    @traced("short_term.get_messages")
     def get_messages(self) -> List[Dict[str, str]]:
         """
         Obtiene los mensajes en formato de lista de diccionarios
@@ -114,6 +152,9 @@ class ShortTermMemory:
         Returns:
             Lista de mensajes [{role, content}]
         """
+        if self.buffer is not None:
+            return [record.to_dict() for record in self.buffer]
+        
         memory_vars = self.memory.load_memory_variables({})
         chat_history = memory_vars.get("chat_history", [])
         
@@ -136,6 +177,10 @@ class ShortTermMemory:
         Returns:
             Lista de últimos N mensajes
         """
+        if self.buffer is not None:
+            # Solo se recorren los n mensajes pedidos
+            return [record.to_dict() for record in self.buffer.last(n)]
+        
         all_messages = self.get_messages()
         return all_messages[-n:] if len(all_messages) > n else all_messages
     
@@ -143,6 +188,9 @@ class ShortTermMemory:
         """Limpia la memoria de la sesión actual"""
         self.memory.clear()
         self.message_count = 0
+        if self.buffer is not None:
+            self.buffer.evicted = 0
+        self.preference_profile.clear()
         self.session_start = datetime.now()
         print("🔄 Memoria de corto plazo limpiada")
     
@@ -160,7 +208,10 @@ class ShortTermMemory:
             "duration_seconds": duration,
             "message_count": self.message_count,
             "memory_type": self.memory_type,
-            "has_context": self.message_count > 0
+            "has_context": self.message_count > 0,
+            "pruned_messages": self.pruned_messages,
+            "retained_messages": len(self.buffer) if self.buffer is not None else None,
+            "retained_tokens": self.buffer.total_tokens if self.buffer is not None else None
         }
     
     def extract_user_preferences(self) -> Dict[str, List[str]]:
@@ -170,46 +221,8 @@ class ShortTermMemory:
         Returns:
             Dict con categorías de preferencias identificadas
         """
-        context = self.get_context().lower()
-        
-        preferences = {
-            "categorias_interes": [],
-            "restricciones": [],
-            "ocasiones": [],
-            "presupuesto": []
-        }
-        
-        # Detectar categorías de interés
-        if "vegano" in context or "vegana" in context:
-            preferences["categorias_interes"].append("Productos veganos")
-        if "sin azúcar" in context or "diabético" in context:
-            preferences["categorias_interes"].append("Productos sin azúcar")
-        if "cuadrada" in context:
-            preferences["categorias_interes"].append("Tortas cuadradas")
-        if "circular" in context:
-            preferences["categorias_interes"].append("Tortas circulares")
-        
-        # Detectar restricciones
-        if "alérgico" in context or "alergia" in context:
-            preferences["restricciones"].append("Alergias alimentarias")
-        if "vegetariano" in context:
-            preferences["restricciones"].append("Vegetariano")
-        
-        # Detectar ocasiones
-        if "cumpleaños" in context:
-            preferences["ocasiones"].append("Cumpleaños")
-        if "boda" in context or "matrimonio" in context:
-            preferences["ocasiones"].append("Boda")
-        if "aniversario" in context:
-            preferences["ocasiones"].append("Aniversario")
-        
-        # Detectar presupuesto
-        if "económico" in context or "barato" in context:
-            preferences["presupuesto"].append("Económico")
-        elif "premium" in context or "lujo" in context:
-            preferences["presupuesto"].append("Premium")
-        
-        return preferences
+        # Perfil incremental: no se vuelve a escanear el historial
+        return self.preference_profile.as_session_preferences()
 
 
 class ConversationContext:
@@ -288,7 +301,9 @@ class ConversationContext:
 
 def create_short_term_memory(
     memory_type: str = "buffer",
-    openai_api_key: Optional[str] = None
+    openai_api_key: Optional[str] = None,
+    max_token_limit: int = 2000,
+    max_turns: int = 50
 ) -> ShortTermMemory:
     """
     Factory function para crear memoria de corto plazo
@@ -296,11 +311,15 @@ def create_short_term_memory(
     Args:
         memory_type: Tipo de memoria ("buffer" o "summary")
         openai_api_key: API key si se usa summary
+        max_token_limit: Límite de tokens retenidos
+        max_turns: Máximo de intercambios retenidos (tipo buffer)
     
     Returns:
         Instancia de ShortTermMemory
     """
     return ShortTermMemory(
         memory_type=memory_type,
-        openai_api_key=openai_api_key
+        openai_api_key=openai_api_key,
+        max_token_limit=max_token_limit,
+        max_turns=max_turns
     )
@@ -0,0 +1,345 @@
+"""
+Buffer de escritura diferida (write-behind) para la memoria de largo plazo
+Acumula conversaciones y las persiste en lotes desde un hilo en segundo plano
+"""
+
+import json
+import os
+import re
+import threading
+import time
+import uuid
+from collections import deque
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional
+
+import psutil
+
+try:
+    import fcntl
+except ImportError:  # Windows: la vigencia de un journal se decide por el pid de su nombre
+    fcntl = None
+
+# Journal de una instancia: <base>.<pid>-<token>.jsonl
+_INSTANCE_JOURNAL_RE = re.compile(r"\.(\d+)-[0-9a-f]+\.jsonl$")
+
+
+class WriteBehindBuffer:
+    """
+    Cola acotada de registros pendientes con flush por tamaño o por tiempo
+
+    Cada registro se anota primero en un journal (JSON lines) para que, si el proceso
+    muere antes del flush, los registros se reprocesen al reiniciar.
+    Cada instancia escribe su propio journal (bloqueado mientras vive); al arrancar solo se
+    adoptan los journals de instancias terminadas, nunca los de otra instancia viva.
+    Un lote que falla max_retries veces va al archivo dead-letter, así flush() siempre retorna.
+    """
+
+    def __init__(
+        self,
+        flush_fn: Callable[[List[Dict[str, Any]]], None],
+        journal_path: Optional[str] = None,
+        max_batch_size: int = 32,
+        flush_interval: float = 2.0,
+        max_pending: int = 1000,
+        put_timeout: float = 5.0,
+        max_retries: int = 3,
+        fsync_journal: bool = False,
+        dead_letter_path: Optional[str] = None
+    ):
+        """
+        Args:
+            flush_fn: Función que persiste un lote de registros (lanza excepción si falla)
+            journal_path: Base del journal para recuperación ante caídas (None = sin journal);
+                cada instancia usa <base>.<pid>-<token>.jsonl
+            max_batch_size: Registros por lote; alcanzar este tamaño dispara un flush
+            flush_interval: Segundos máximos que un registro espera antes del flush
+            max_pending: Máximo de registros en memoria; al llenarse, put() bloquea (backpressure)
+            put_timeout: Segundos que put() espera por espacio antes de rechazar el registro
+            max_retries: Reintentos de un lote fallido antes de mandarlo al dead-letter
+            fsync_journal: Si True, hace fsync del journal en cada escritura (más durable, más lento)
+            dead_letter_path: Archivo JSON lines de lotes descartados (None = <base>.deadletter.jsonl)
+        """
+        self.flush_fn = flush_fn
+        self.journal_base = Path(journal_path) if journal_path else None
+        self.journal_path = None
+        self.dead_letter_path = Path(dead_letter_path) if dead_letter_path else (
+            self.journal_base.with_suffix(".deadletter.jsonl") if self.journal_base else None
+        )
+        self.max_batch_size = max_batch_size
+        self.flush_interval = flush_interval
+        self.max_pending = max_pending
+        self.put_timeout = put_timeout
+        self.max_retries = max_retries
+        self.fsync_journal = fsync_journal
+
+        self._pending = deque()
+        self._inflight = 0
+        self._cond = threading.Condition()
+        self._closed = False
+        self._flush_requested = False
+        self._journal = None
+
+        self.stats = {
+            "enqueued": 0,
+            "flushed": 0,
+            "batches": 0,
+            "failed_batches": 0,
+            "rejected": 0,
+            "recovered": 0,
+            "backpressure_waits": 0,
+            "dead_lettered": 0,
+            "last_flush_seconds": 0.0
+        }
+
+        if self.journal_base:
+            self.journal_base.parent.mkdir(parents=True, exist_ok=True)
+            stem = self.journal_base.name[:-len(".jsonl")] if self.journal_base.name.endswith(".jsonl") \
+                else self.journal_base.name
+            self._journal_stem = stem
+            self.journal_path = self.journal_base.with_name(f"{stem}.{os.getpid()}-{uuid.uuid4().hex[:8]}.jsonl")
+            self._journal = open(self.journal_path, "a", encoding="utf-8")
+            if fcntl is not None:
+                fcntl.flock(self._journal.fileno(), fcntl.LOCK_EX)
+            self._recover_journals()
+
+        self._worker = threading.Thread(target=self._run, name="write-behind", daemon=True)
+        self._worker.start()
+
+    # ============= JOURNAL =============
+
+    def _orphan_journals(self) -> List[Path]:
+        """Journals de instancias terminadas (incluye el journal compartido de versiones anteriores)"""
+        candidates = [self.journal_base] if self.journal_base.exists() else []
+        for path in self.journal_base.parent.glob(f"{self._journal_stem}.*.jsonl"):
+            if path != self.journal_path and _INSTANCE_JOURNAL_RE.search(path.name):
+                candidates.append(path)
+        return candidates
+
+    def _recover_journals(self):
+        """Adopta los registros no confirmados de journals huérfanos y los reencola en el propio"""
+        recovered = 0
+        for path in self._orphan_journals():
+            try:
+                with open(path, "r", encoding="utf-8") as f:
+                    if not self._is_orphan(path, f):
+                        continue
+                    pendientes = self._read_unacked(f)
+                    # Primero se anotan en el journal propio; recién después se borra el huérfano
+                    for entry in pendientes.values():
+                        self._journal_write(entry)
+                        self._pending.append(entry)
+                    if self._journal is not None:
+                        self._journal.flush()
+                        os.fsync(self._journal.fileno())
+                    os.remove(path)
+                    recovered += len(pendientes)
+            except FileNotFoundError:
+                continue  # Otra instancia lo adoptó primero
+
+        self.stats["recovered"] = recovered
+        if recovered:
+            print(f"♻️ Recuperados {recovered} registros pendientes desde el journal")
+
+    def _is_orphan(self, path: Path, f) -> bool:
+        """True si ninguna instancia viva escribe el journal (y queda bloqueado para adoptarlo)"""
+        if fcntl is not None:
+            try:
+                fcntl.flock(f.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except BlockingIOError:
+                return False
+            # Pudo ser adoptado y borrado mientras se esperaba el lock
+            return path.exists() and os.fstat(f.fileno()).st_ino == os.stat(path).st_ino
+        match = _INSTANCE_JOURNAL_RE.search(path.name)
+        if match is None:
+            return True
+        pid = int(match.group(1))
+        return pid != os.getpid() and not psutil.pid_exists(pid)
+
+    @staticmethod
+    def _read_unacked(f) -> Dict[str, Dict[str, Any]]:
+        pendientes: Dict[str, Dict[str, Any]] = {}
+        for line in f:
+            try:
+                entry = json.loads(line)
+            except json.JSONDecodeError:
+                continue  # Línea truncada por una caída a mitad de escritura
+            if "ack" in entry:
+                for entry_id in entry["ack"]:
+                    pendientes.pop(entry_id, None)
+            else:
+                pendientes[entry["id"]] = entry
+        return pendientes
+
+    def _dead_letter(self, batch: List[Dict[str, Any]], error: str):
+        """Guarda un lote que agotó sus reintentos (para reprocesarlo a mano) y lo confirma en el journal"""
+        if self.dead_letter_path is not None:
+            failed_at = datetime.now().isoformat()
+            try:
+                with open(self.dead_letter_path, "a", encoding="utf-8") as f:
+                    for entry in batch:
+                        f.write(json.dumps(dict(entry, failed_at=failed_at, error=error),
+                                           ensure_ascii=False) + "\n")
+            except OSError as e:
+                print(f"⚠️ No se pudo escribir el dead-letter: {e}")
+                return
+        self._journal_write({"ack": [entry["id"] for entry in batch]})
+
+    def _journal_write(self, entry: Dict[str, Any]):
+        if self._journal is None:
+            return
+        self._journal.write(json.dumps(entry, ensure_ascii=False) + "\n")
+        self._journal.flush()
+        if self.fsync_journal:
+            os.fsync(self._journal.fileno())
+
+    def _journal_truncate(self):
+        """Con todo confirmado, el journal se vacía para que no crezca"""
+        if self._journal is None:
+            return
+        self._journal.seek(0)
+        self._journal.truncate()
+        self._journal.flush()
+
+    # ============= API =============
+
+    def put(self, record: Dict[str, Any]) -> bool:
+        """
+        Encola un registro para escritura diferida
+
+        Returns:
+            True si quedó encolado; False si la cola siguió llena tras put_timeout
+        """
+        entry = {"id": uuid.uuid4().hex, **record}
+
+        with self._cond:
+            if self._closed:
+                raise RuntimeError("El buffer de escritura está cerrado")
+
+            if len(self._pending) >= self.max_pending:
+                self.stats["backpressure_waits"] += 1
+                self._cond.notify_all()
+                has_space = self._cond.wait_for(
+                    lambda: len(self._pending) < self.max_pending or self._closed,
+                    timeout=self.put_timeout
+                )
+                if not has_space or self._closed:
+                    self.stats["rejected"] += 1
+                    return False
+
+            self._journal_write(entry)
+            self._pending.append(entry)
+            self.stats["enqueued"] += 1
+
+            if len(self._pending) >= self.max_batch_size:
+                self._cond.notify_all()
+
+        return True
+
+    def flush(self, timeout: Optional[float] = None) -> bool:
+        """Fuerza la escritura de todo lo pendiente y espera a que termine"""
+        with self._cond:
+            self._flush_requested = True
+            self._cond.notify_all()
+            return self._cond.wait_for(
+                lambda: not self._pending and self._inflight == 0,
+                timeout=timeout
+            )
+
+    def close(self, timeout: Optional[float] = 30.0):
+        """Vacía el buffer y detiene el worker (flush-on-shutdown)"""
+        with self._cond:
+            if self._closed:
+                return
+            self._closed = True
+            self._cond.notify_all()
+
+        self._worker.join(timeout=timeout)
+
+        if self._journal is not None:
+            with self._cond:
+                drained = not self._pending and self._inflight == 0
+            self._journal.close()
+            self._journal = None
+            # Sin pendientes el journal propio no hace falta; si quedan, lo adopta el próximo arranque
+            if drained and not self._worker.is_alive():
+                try:
+                    os.remove(self.journal_path)
+                except OSError:
+                    pass
+
+    @property
+    def pending(self) -> int:
+        with self._cond:
+            return len(self._pending) + self._inflight
+
+    def get_statistics(self) -> Dict[str, Any]:
+        with self._cond:
+            stats = dict(self.stats)
+            stats["pending"] = len(self._pending) + self._inflight
+        stats["avg_batch_size"] = round(stats["flushed"] / stats["batches"], 2) if stats["batches"] else 0
+        return stats
+
+    # ============= WORKER =============
+
+    def _run(self):
+        retries = 0
+
+        while True:
+            with self._cond:
+                self._cond.wait_for(
+                    lambda: len(self._pending) >= self.max_batch_size or self._closed or self._flush_requested,
+                    timeout=self.flush_interval
+                )
+
+                if not self._pending:
+                    self._flush_requested = False
+                    self._cond.notify_all()
+                    if self._closed:
+                        return
+                    continue
+
+                size = min(self.max_batch_size, len(self._pending))
+                batch = [self._pending.popleft() for _ in range(size)]
+                self._inflight += size
+                self._cond.notify_all()  # Hay espacio para productores bloqueados
+
+            start = time.perf_counter()
+            error = None
+            try:
+                self.flush_fn(batch)
+                ok = True
+            except Exception as e:
+                print(f"⚠️ Error escribiendo lote de {len(batch)} registros: {e}")
+                error = str(e)
+                ok = False
+
+            with self._cond:
+                self._inflight -= size
+                if ok:
+                    retries = 0
+                    self.stats["flushed"] += size
+                    self.stats["batches"] += 1
+                    self.stats["last_flush_seconds"] = round(time.perf_counter() - start, 4)
+                    self._journal_write({"ack": [entry["id"] for entry in batch]})
+                    if not self._pending and self._inflight == 0:
+                        self._journal_truncate()
+                else:
+                    retries += 1
+                    self.stats["failed_batches"] += 1
+                    if retries > self.max_retries:
+                        # Reintentos agotados: el lote va al dead-letter y el buffer sigue con el resto
+                        print(f"🗑️ Lote de {len(batch)} registros enviado al dead-letter tras {self.max_retries} reintentos")
+                        self._dead_letter(batch, error)
+                        self.stats["dead_lettered"] += size
+                        retries = 0
+                        ok = True
+                        if not self._pending and self._inflight == 0:
+                            self._journal_truncate()
+                    else:
+                        self._pending.extendleft(reversed(batch))
+                self._cond.notify_all()
+
+            if not ok:
+                time.sleep(min(0.5 * retries, 5.0))
@@ -3,8 +3,12 @@ Módulo de Monitoreo y Observabilidad
 Responsable de: métricas de precisión, latencia, logs, patrones y anomalías
 """
 
-from .metrics import ObservabilityMetrics
-from .logs_analyzer import LogsAnalyzer
+from .metrics import ObservabilityMetrics, get_observability_metrics
+from .metrics_journal import MetricsJournal
+from .quantiles import QuantileSketch, WindowedSketch, SketchRegistry
+from .resource_sampler import ResourceSampler, get_resource_sampler
+from .tracing import Tracer, get_tracer, span, traced
+from .logs_analyzer import LogsAnalyzer, get_logs_analyzer
 from .anomaly_detector import AnomalyDetector
 
-__all__ = ["ObservabilityMetrics", "LogsAnalyzer", "AnomalyDetector"]
+__all__ = ["ObservabilityMetrics", "get_observability_metrics", "MetricsJournal", "QuantileSketch", "WindowedSketch", "SketchRegistry", "ResourceSampler", "get_resource_sampler", "Tracer", "get_tracer", "span", "traced", "LogsAnalyzer", "get_logs_analyzer", "AnomalyDetector"]
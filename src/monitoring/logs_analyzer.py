@@ -4,14 +4,31 @@ IE3: Análisis de Logs y Trazabilidad
 IE4: Identificación de Patrones y Anomalías (parcial)
 """
 
+import heapq
 import json
 import logging
+import os
+import threading
 from pathlib import Path
 from datetime import datetime, timedelta
-from typing import Dict, List, Any, Tuple
-from collections import Counter, defaultdict
+from typing import Dict, List, Any, Iterator, Optional, Tuple
+from collections import Counter, defaultdict, deque
 import re
 
+_ERROR_TYPE_RE = re.compile(r'(\w+Error|\w+Exception)')
+_EXECUTION_TIME_RE = re.compile(r'execution_time[":]*\s*(\d+\.?\d*)')
+_TOOL_NAME_RE = re.compile(r'TOOL \| Name: (\w+)')
+_TOOL_TIME_RE = re.compile(r'time[":]*\s*(\d+\.?\d*)')
+
+# Estado de análisis (offsets por archivo + agregados) junto a los logs
+STATE_FILE_NAME = ".logs_analyzer_state.json"
+
+# Horas retenidas en el histograma por hora (una semana)
+HOURLY_HISTORY_HOURS = 24 * 7
+
+# Resolución del histograma de tiempos de ejecución (para contar operaciones lentas)
+EXECUTION_BUCKET_MS = 10
+
 
 class LogsAnalyzer:
     """
@@ -19,72 +36,324 @@ class LogsAnalyzer:
     - Identificar errores y cuellos de botella
     - Detectar patrones en consultas
     - Encontrar anomalías
+    
+    Es incremental: recuerda el offset (bytes) leído de cada archivo y solo parsea líneas nuevas.
+    Mantiene agregados (errores, herramientas, histogramas por hora, operaciones más lentas)
+    en vez de las líneas, así la memoria no crece con el volumen de logs.
     """
     
-    def __init__(self, log_dir: str = "./logs"):
-        """Inicializa el analizador"""
+    def __init__(
+        self,
+        log_dir: str = "./logs",
+        state_file: Optional[str] = STATE_FILE_NAME,
+        max_recent_entries: int = 500,
+        max_slow_operations: int = 200
+    ):
+        """
+        Inicializa el analizador
+        
+        Args:
+            log_dir: Directorio de los archivos *.log
+            state_file: Checkpoint de offsets y agregados (relativo a log_dir; None = no persistir)
+            max_recent_entries: Entradas recientes que se conservan en self.logs
+            max_slow_operations: Operaciones más lentas que se conservan para get_bottlenecks
+        """
         self.log_dir = Path(log_dir)
-        self.logs = []
-        self._load_logs()
+        self.state_path = self.log_dir / state_file if state_file else None
+        self.max_slow_operations = max_slow_operations
+        self.logs = deque(maxlen=max_recent_entries)
+        self._lock = threading.RLock()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        
+        self._reset_state()
+        self._load_state()
+        self.refresh()
+    
+    def _reset_state(self):
+        """Agregados en memoria (acotados por cantidad de tipos/herramientas/horas, no por líneas)"""
+        # archivo -> {"offset", "inode"}
+        self.offsets: Dict[str, Dict[str, int]] = {}
+        self.total_entries = 0
+        self.levels = Counter()
+        self.error_types = Counter()
+        self.recent_errors = deque(maxlen=10)
+        self.tool_stats = defaultdict(lambda: {'used': 0, 'errors': 0, 'time_sum': 0.0, 'time_count': 0})
+        self.query_types = Counter()
+        self.peak_usage_times = Counter()
+        self.hourly = Counter()  # "YYYY-MM-DD HH" -> entradas (ventana de HOURLY_HISTORY_HOURS)
+        self.hourly_errors = Counter()
+        self.total_queries = 0
+        self._slow_operations: List[Tuple[float, str, str]] = []  # min-heap (ms, timestamp, mensaje)
+        self.execution_histogram = Counter()  # bucket de EXECUTION_BUCKET_MS -> operaciones
+    
+    # ============= LECTURA INCREMENTAL =============
     
-    def _load_logs(self):
-        """Carga todos los logs disponibles"""
+    def refresh(self) -> int:
+        """
+        Parsea solo lo agregado a los logs desde la última lectura
+        
+        Returns:
+            Cantidad de entradas nuevas
+        """
+        return len(self._read_new_entries())
+    
+    def _read_new_entries(self) -> List[Dict[str, Any]]:
         if not self.log_dir.exists():
-            return
+            return []
         
-        for log_file in self.log_dir.glob("*.log"):
-            self._parse_log_file(log_file)
+        with self._lock:
+            seen = set()
+            new_entries = []
+            for log_file in sorted(self.log_dir.glob("*.log")):
+                seen.add(log_file.name)
+                new_entries.extend(self._parse_log_file(log_file))
+            
+            # Archivos borrados: su offset ya no sirve
+            for name in [name for name in self.offsets if name not in seen]:
+                del self.offsets[name]
+            
+            if new_entries:
+                self._save_state()
+            return new_entries
     
-    def _parse_log_file(self, log_file: Path):
+    def _parse_log_file(self, log_file: Path) -> Iterator[Dict[str, Any]]:
         """
-        Parsea un archivo de log
+        Parsea un archivo de log desde su último offset
         Formato esperado: "TIMESTAMP | LEVEL | MESSAGE"
         """
         try:
-            with open(log_file, 'r', encoding='utf-8') as f:
-                for line in f:
-                    line = line.strip()
-                    if not line:
-                        continue
-                    
-                    # Parsear línea del log
-                    parts = line.split(" | ", 2)
-                    if len(parts) >= 3:
-                        log_entry = {
-                            'timestamp': parts[0],
-                            'level': parts[1],
-                            'message': parts[2],
-                            'file': log_file.name
-                        }
-                        
-                        # Extraer tipo de evento (QUERY, TOOL, ERROR, etc.)
-                        if ' | ' in parts[2]:
-                            event_type = parts[2].split(' | ')[0]
-                            log_entry['event_type'] = event_type
-                        
-                        self.logs.append(log_entry)
+            stat = log_file.stat()
+            checkpoint = self.offsets.get(log_file.name, {})
+            offset = checkpoint.get('offset', 0)
+            # Archivo truncado o reemplazado (rotación): se lee desde el inicio
+            if checkpoint.get('inode') != stat.st_ino or stat.st_size < offset:
+                offset = 0
+            if stat.st_size == offset:
+                self.offsets[log_file.name] = {'offset': offset, 'inode': stat.st_ino}
+                return
+            
+            with open(log_file, 'rb') as f:
+                f.seek(offset)
+                for raw in f:
+                    # Una línea sin salto es una escritura en curso: se relee en el próximo refresh
+                    if not raw.endswith(b"\n"):
+                        break
+                    offset += len(raw)
+                    entry = self._parse_line(raw.decode('utf-8', errors='replace').strip(), log_file.name)
+                    if entry is not None:
+                        self._apply_entry(entry)
+                        yield entry
+            self.offsets[log_file.name] = {'offset': offset, 'inode': stat.st_ino}
         except Exception as e:
             logging.warning(f"Error parsing log {log_file}: {e}")
     
+    @staticmethod
+    def _parse_line(line: str, file_name: str) -> Optional[Dict[str, Any]]:
+        if not line:
+            return None
+        
+        # Parsear línea del log
+        parts = line.split(" | ", 2)
+        if len(parts) < 3:
+            return None
+        log_entry = {
+            'timestamp': parts[0],
+            'level': parts[1],
+            'message': parts[2],
+            'file': file_name
+        }
+        
+        # Extraer tipo de evento (QUERY, TOOL, ERROR, etc.)
+        if ' | ' in parts[2]:
+            log_entry['event_type'] = parts[2].split(' | ')[0]
+        return log_entry
+    
+    def _apply_entry(self, log: Dict[str, Any]):
+        """Actualiza los agregados con una entrada"""
+        self.logs.append(log)
+        self.total_entries += 1
+        self.levels[log['level']] += 1
+        msg = log['message']
+        
+        try:
+            timestamp = datetime.fromisoformat(log['timestamp'])
+        except ValueError:
+            timestamp = None
+        if timestamp is not None:
+            hour_key = timestamp.strftime('%Y-%m-%d %H')
+            self.hourly[hour_key] += 1
+            if log['level'] == 'ERROR':
+                self.hourly_errors[hour_key] += 1
+        
+        # Errores
+        if log['level'] == 'ERROR':
+            match = _ERROR_TYPE_RE.search(msg)
+            self.error_types[match.group(1) if match else 'Unknown'] += 1
+            self.recent_errors.append(log)
+        
+        # Operaciones lentas: solo se conservan las max_slow_operations más lentas
+        match = _EXECUTION_TIME_RE.search(msg)
+        if match:
+            item = (float(match.group(1)) * 1000, log['timestamp'], msg[:100])
+            self.execution_histogram[int(item[0] // EXECUTION_BUCKET_MS)] += 1
+            if len(self._slow_operations) < self.max_slow_operations:
+                heapq.heappush(self._slow_operations, item)
+            elif item > self._slow_operations[0]:
+                heapq.heapreplace(self._slow_operations, item)
+        
+        # Herramientas
+        if 'TOOL' in log.get('event_type', ''):
+            match = _TOOL_NAME_RE.search(msg)
+            if match:
+                stats = self.tool_stats[match.group(1)]
+                stats['used'] += 1
+                if log['level'] == 'ERROR':
+                    stats['errors'] += 1
+                time_match = _TOOL_TIME_RE.search(msg)
+                if time_match:
+                    stats['time_sum'] += float(time_match.group(1))
+                    stats['time_count'] += 1
+        
+        # Consultas: hora pico y tipo
+        if log.get('event_type') == 'QUERY':
+            self.total_queries += 1
+            if timestamp is not None:
+                self.peak_usage_times[f"Hour_{timestamp.hour:02d}"] += 1
+            self.query_types[self._classify_query(msg.lower())] += 1
+    
+    @staticmethod
+    def _classify_query(msg: str) -> str:
+        if 'producto' in msg or 'search' in msg:
+            return 'product_search'
+        elif 'descuento' in msg or 'discount' in msg:
+            return 'discount'
+        elif 'inventario' in msg or 'inventory' in msg:
+            return 'inventory'
+        elif 'historial' in msg or 'history' in msg:
+            return 'customer_history'
+        return 'other'
+    
+    def _prune_hourly(self):
+        """Descarta horas fuera de la ventana del histograma"""
+        if len(self.hourly) <= HOURLY_HISTORY_HOURS:
+            return
+        keep = set(sorted(self.hourly)[-HOURLY_HISTORY_HOURS:])
+        for counter in (self.hourly, self.hourly_errors):
+            for key in [key for key in counter if key not in keep]:
+                del counter[key]
+    
+    # ============= CHECKPOINT =============
+    
+    def _state_to_dict(self) -> Dict[str, Any]:
+        return {
+            'offsets': self.offsets,
+            'total_entries': self.total_entries,
+            'levels': dict(self.levels),
+            'error_types': dict(self.error_types),
+            'recent_errors': list(self.recent_errors),
+            'tool_stats': dict(self.tool_stats),
+            'query_types': dict(self.query_types),
+            'peak_usage_times': dict(self.peak_usage_times),
+            'hourly': dict(self.hourly),
+            'hourly_errors': dict(self.hourly_errors),
+            'total_queries': self.total_queries,
+            'slow_operations': self._slow_operations,
+            'execution_histogram': dict(self.execution_histogram),
+            'recent_entries': list(self.logs)
+        }
+    
+    def _save_state(self):
+        """Escribe offsets y agregados (reemplazo atómico)"""
+        self._prune_hourly()
+        if self.state_path is None:
+            return
+        try:
+            tmp = self.state_path.with_suffix(f".{os.getpid()}.tmp")
+            with open(tmp, 'w', encoding='utf-8') as f:
+                json.dump(self._state_to_dict(), f, ensure_ascii=False)
+            os.replace(tmp, self.state_path)
+        except Exception as e:
+            logging.warning(f"Error saving logs analyzer state: {e}")
+    
+    def _load_state(self):
+        if self.state_path is None or not self.state_path.exists():
+            return
+        try:
+            with open(self.state_path, 'r', encoding='utf-8') as f:
+                state = json.load(f)
+            self.offsets = state.get('offsets', {})
+            self.total_entries = state.get('total_entries', 0)
+            self.levels.update(state.get('levels', {}))
+            self.error_types.update(state.get('error_types', {}))
+            self.recent_errors.extend(state.get('recent_errors', []))
+            for tool, stats in state.get('tool_stats', {}).items():
+                self.tool_stats[tool].update(stats)
+            self.query_types.update(state.get('query_types', {}))
+            self.peak_usage_times.update(state.get('peak_usage_times', {}))
+            self.hourly.update(state.get('hourly', {}))
+            self.hourly_errors.update(state.get('hourly_errors', {}))
+            self.total_queries = state.get('total_queries', 0)
+            self._slow_operations = [tuple(item) for item in state.get('slow_operations', [])]
+            heapq.heapify(self._slow_operations)
+            self.execution_histogram.update({int(k): v for k, v in state.get('execution_histogram', {}).items()})
+            self.logs.extend(state.get('recent_entries', []))
+        except Exception as e:
+            logging.warning(f"Error loading logs analyzer state, re-reading logs: {e}")
+            self._reset_state()
+            self.logs.clear()
+    
+    # ============= SEGUIMIENTO EN VIVO =============
+    
+    def follow(self, poll_interval: float = 1.0, stop_event: Optional[threading.Event] = None) -> Iterator[Dict[str, Any]]:
+        """
+        Modo tail -f: entrega cada entrada nueva a medida que se escribe (agregados ya actualizados)
+        
+        Args:
+            poll_interval: Segundos entre revisiones cuando no hay líneas nuevas
+            stop_event: Evento para terminar el seguimiento (None = hasta que se cierre el generador)
+        """
+        stop_event = stop_event or threading.Event()
+        while not stop_event.is_set():
+            new_entries = self._read_new_entries()
+            yield from new_entries
+            if not new_entries:
+                stop_event.wait(poll_interval)
+    
+    def start(self, interval_seconds: float = 5.0):
+        """Refresca los agregados periódicamente en un hilo daemon"""
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._stop.clear()
+        
+        def loop():
+            while not self._stop.is_set():
+                try:
+                    self.refresh()
+                except Exception as e:
+                    print(f"⚠️ Error analizando logs: {e}")
+                self._stop.wait(interval_seconds)
+        
+        self._thread = threading.Thread(target=loop, name="logs-analyzer", daemon=True)
+        self._thread.start()
+    
+    def stop(self, timeout: Optional[float] = None):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=timeout)
+            self._thread = None
+    
     # ============= IE3: ANÁLISIS DE LOGS =============
     
     def get_errors_summary(self) -> Dict[str, Any]:
         """Resumen de todos los errores encontrados"""
-        errors = [log for log in self.logs if log['level'] == 'ERROR']
-        
-        error_types = defaultdict(list)
-        for error in errors:
-            msg = error['message']
-            # Extraer tipo de error
-            match = re.search(r'(\w+Error|\w+Exception)', msg)
-            error_type = match.group(1) if match else 'Unknown'
-            error_types[error_type].append(error)
+        total_errors = self.levels['ERROR']
         
         return {
-            'total_errors': len(errors),
-            'error_types': {k: len(v) for k, v in error_types.items()},
-            'recent_errors': errors[-10:],  # Últimos 10
-            'error_frequency': len(errors) / max(len(self.logs), 1) * 100
+            'total_errors': total_errors,
+            'error_types': dict(self.error_types),
+            'recent_errors': list(self.recent_errors),  # Últimos 10
+            'error_frequency': total_errors / max(self.total_entries, 1) * 100
         }
     
     def get_bottlenecks(self, threshold_ms: float = 5000) -> List[Dict]:
@@ -94,90 +363,44 @@ class LogsAnalyzer:
         """
         bottlenecks = []
         
-        for log in self.logs:
-            # Buscar logs que contengan tiempo de ejecución
-            match = re.search(r'execution_time[":]*\s*(\d+\.?\d*)', log['message'])
-            if match:
-                exec_time_ms = float(match.group(1)) * 1000
-                if exec_time_ms > threshold_ms:
-                    bottlenecks.append({
-                        'timestamp': log['timestamp'],
-                        'execution_time_ms': exec_time_ms,
-                        'message': log['message'][:100],
-                        'severity': 'HIGH' if exec_time_ms > threshold_ms * 2 else 'MEDIUM'
-                    })
+        # Solo se conservan las operaciones más lentas (max_slow_operations)
+        for exec_time_ms, timestamp, message in self._slow_operations:
+            if exec_time_ms > threshold_ms:
+                bottlenecks.append({
+                    'timestamp': timestamp,
+                    'execution_time_ms': exec_time_ms,
+                    'message': message,
+                    'severity': 'HIGH' if exec_time_ms > threshold_ms * 2 else 'MEDIUM'
+                })
         
         return sorted(bottlenecks, key=lambda x: x['execution_time_ms'], reverse=True)
     
+    def count_slow_operations(self, threshold_ms: float = 5000) -> int:
+        """Operaciones sobre el umbral (todas, no solo las retenidas; resolución EXECUTION_BUCKET_MS)"""
+        first = int(threshold_ms // EXECUTION_BUCKET_MS)
+        return sum(count for bucket, count in self.execution_histogram.items() if bucket >= first)
+    
     def get_tool_usage_analysis(self) -> Dict[str, Any]:
         """Analiza qué herramientas se usan más y cuál es su éxito"""
-        tool_logs = [log for log in self.logs if 'TOOL' in log.get('event_type', '')]
-        
-        tool_stats = defaultdict(lambda: {'used': 0, 'errors': 0, 'avg_time': 0})
-        tool_times = defaultdict(list)
-        
-        for log in tool_logs:
-            # Extraer nombre de herramienta
-            match = re.search(r'TOOL \| Name: (\w+)', log['message'])
-            if match:
-                tool_name = match.group(1)
-                tool_stats[tool_name]['used'] += 1
-                
-                # Contar errores
-                if log['level'] == 'ERROR':
-                    tool_stats[tool_name]['errors'] += 1
-                
-                # Guardar tiempos
-                time_match = re.search(r'time[":]*\s*(\d+\.?\d*)', log['message'])
-                if time_match:
-                    tool_times[tool_name].append(float(time_match.group(1)))
-        
-        # Calcular tiempos promedio
-        for tool_name, times in tool_times.items():
-            if times:
-                tool_stats[tool_name]['avg_time'] = round(sum(times) / len(times), 3)
-        
-        return dict(tool_stats)
+        return {
+            tool_name: {
+                'used': stats['used'],
+                'errors': stats['errors'],
+                'avg_time': round(stats['time_sum'] / stats['time_count'], 3) if stats['time_count'] else 0
+            }
+            for tool_name, stats in self.tool_stats.items()
+        }
     
     # ============= IE4: PATRONES Y ANOMALÍAS =============
     
     def identify_patterns(self) -> Dict[str, Any]:
         """Identifica patrones en las consultas y respuestas"""
-        patterns = {
-            'query_types': defaultdict(int),
-            'common_errors': Counter(),
-            'peak_usage_times': defaultdict(int),
-            'user_patterns': defaultdict(int)
-        }
-        
-        query_logs = [log for log in self.logs if log.get('event_type') == 'QUERY']
-        
-        for log in query_logs:
-            # Extraer hora
-            try:
-                timestamp = datetime.fromisoformat(log['timestamp'])
-                hour = timestamp.hour
-                patterns['peak_usage_times'][f"Hour_{hour:02d}"] += 1
-            except:
-                pass
-            
-            # Clasificar tipo de consulta
-            msg = log['message'].lower()
-            if 'producto' in msg or 'search' in msg:
-                patterns['query_types']['product_search'] += 1
-            elif 'descuento' in msg or 'discount' in msg:
-                patterns['query_types']['discount'] += 1
-            elif 'inventario' in msg or 'inventory' in msg:
-                patterns['query_types']['inventory'] += 1
-            elif 'historial' in msg or 'history' in msg:
-                patterns['query_types']['customer_history'] += 1
-            else:
-                patterns['query_types']['other'] += 1
-        
         return {
-            'query_types': dict(patterns['query_types']),
-            'peak_usage_times': dict(sorted(patterns['peak_usage_times'].items())),
-            'total_queries_analyzed': len(query_logs)
+            'query_types': dict(self.query_types),
+            'peak_usage_times': dict(sorted(self.peak_usage_times.items())),
+            'hourly_activity': dict(sorted(self.hourly.items())),
+            'hourly_errors': dict(sorted(self.hourly_errors.items())),
+            'total_queries_analyzed': self.total_queries
         }
     
     def detect_anomalies(self) -> List[Dict]:
@@ -188,16 +411,16 @@ class LogsAnalyzer:
         anomalies = []
         
         # Anomalía 1: Spike de errores
-        error_logs = [log for log in self.logs if log['level'] == 'ERROR']
-        if len(error_logs) > len(self.logs) * 0.1:  # >10% errores
+        error_count = self.levels['ERROR']
+        if error_count > self.total_entries * 0.1:  # >10% errores
             anomalies.append({
                 'type': 'high_error_rate',
                 'severity': 'HIGH',
-                'message': f'Error rate too high: {len(error_logs) / len(self.logs) * 100:.1f}%',
+                'message': f'Error rate too high: {error_count / self.total_entries * 100:.1f}%',
                 'details': {
-                    'error_count': len(error_logs),
-                    'total_logs': len(self.logs),
-                    'percentage': round(len(error_logs) / max(len(self.logs), 1) * 100, 2)
+                    'error_count': error_count,
+                    'total_logs': self.total_entries,
+                    'percentage': round(error_count / max(self.total_entries, 1) * 100, 2)
                 }
             })
         
@@ -220,13 +443,14 @@ class LogsAnalyzer:
         
         # Anomalía 3: Cuellos de botella frecuentes
         bottlenecks = self.get_bottlenecks(threshold_ms=3000)
-        if len(bottlenecks) > 5:
+        slow_count = self.count_slow_operations(threshold_ms=3000)
+        if slow_count > 5:
             anomalies.append({
                 'type': 'frequent_bottlenecks',
                 'severity': 'MEDIUM',
-                'message': f'Frequent slow operations detected ({len(bottlenecks)} operations >3s)',
+                'message': f'Frequent slow operations detected ({slow_count} operations >3s)',
                 'details': {
-                    'bottleneck_count': len(bottlenecks),
+                    'bottleneck_count': slow_count,
                     'slowest': bottlenecks[0]['execution_time_ms'] if bottlenecks else 0
                 }
             })
@@ -237,7 +461,7 @@ class LogsAnalyzer:
         """Genera reporte completo de análisis"""
         report = {
             'timestamp': datetime.now().isoformat(),
-            'total_logs': len(self.logs),
+            'total_logs': self.total_entries,
             'errors_summary': self.get_errors_summary(),
             'tool_analysis': self.get_tool_usage_analysis(),
             'patterns': self.identify_patterns(),
@@ -264,10 +488,10 @@ class LogsAnalyzer:
                 "⚠️ Error rate is above 5%. Review error logs and implement error handling improvements."
             )
         
-        bottlenecks = self.get_bottlenecks()
-        if bottlenecks:
+        slow_count = self.count_slow_operations()
+        if slow_count:
             recommendations.append(
-                f"⚡ Found {len(bottlenecks)} slow operations. Consider optimizing tool execution or caching."
+                f"⚡ Found {slow_count} slow operations. Consider optimizing tool execution or caching."
             )
         
         tool_analysis = self.get_tool_usage_analysis()
@@ -281,3 +505,19 @@ class LogsAnalyzer:
             recommendations.append("✅ System is performing well. No critical issues detected.")
         
         return recommendations
+
+
+_analyzers: Dict[str, LogsAnalyzer] = {}
+_analyzers_lock = threading.Lock()
+
+
+def get_logs_analyzer(log_dir: str = "./logs") -> LogsAnalyzer:
+    """Analizador compartido por directorio, refrescado (solo líneas nuevas) en cada llamada"""
+    key = str(Path(log_dir).resolve())
+    with _analyzers_lock:
+        analyzer = _analyzers.get(key)
+        if analyzer is None:
+            _analyzers[key] = LogsAnalyzer(log_dir)
+            return _analyzers[key]
+    analyzer.refresh()
+    return analyzer
@@ -3,14 +3,23 @@ Módulo de Métricas de Observabilidad
 Calcula: Precisión, Consistencia, Latencia, Recursos, Errores
 """
 
+import atexit
 import time
-import psutil
 import json
+import threading
 from datetime import datetime
-from typing import Dict, List, Any, Optional
-from collections import defaultdict, Counter
+from typing import Dict, List, Any, Iterator, Optional
+from collections import defaultdict, deque, Counter
 from pathlib import Path
 
+from .metrics_journal import MetricsJournal
+from .quantiles import SketchRegistry
+from .resource_sampler import ResourceSampler, get_resource_sampler
+
+# Ventanas recientes que se guardan en el snapshot (el historial completo queda en el journal)
+RECENT_EXECUTIONS = 100
+RECENT_ERRORS = 50
+
 
 class ObservabilityMetrics:
     """
@@ -19,57 +28,258 @@ class ObservabilityMetrics:
     IE2: Métricas de Latencia y Recursos
     """
     
-    def __init__(self, metrics_file: str = "./metrics/metrics.json"):
-        """Inicializa el sistema de métricas"""
+    def __init__(
+        self,
+        metrics_file: str = "./metrics/metrics.json",
+        track_embedding_cache: bool = True,
+        snapshot_every: int = 500,
+        fsync_every: int = 64,
+        fsync_interval: float = 1.0,
+        resource_sampler: Optional[ResourceSampler] = None
+    ):
+        """
+        Inicializa el sistema de métricas
+        
+        Args:
+            metrics_file: Archivo JSON del snapshot de métricas (el journal de eventos vive a su lado)
+            track_embedding_cache: Si True, registra el cache de embeddings del proceso
+            snapshot_every: Eventos entre snapshots (compactación del journal, en un hilo de fondo)
+            fsync_every: Eventos máximos sin fsync del journal
+            fsync_interval: Segundos máximos sin fsync del journal
+            resource_sampler: Sampler de recursos en segundo plano (None = el compartido del proceso)
+        """
         self.metrics_file = Path(metrics_file)
         self.metrics_file.parent.mkdir(parents=True, exist_ok=True)
+        self.snapshot_every = snapshot_every
+        self._lock = threading.RLock()
+        self._events_since_snapshot = 0
+        self._compact_due = threading.Event()
+        self._closed = False
+        
+        self._reset_state()
+        
+        # Métricas de caches (embeddings, respuestas, herramientas): nombre -> función de stats
+        self.cache_sources = {}
+        
+        # Muestras de RSS/CPU/hilos/FDs/GC tomadas fuera del camino de las consultas
+        self.resource_sampler = resource_sampler or get_resource_sampler()
+        
+        # Journal append-only: un evento por línea, snapshot periódico
+        self.journal = MetricsJournal(
+            str(self.metrics_file),
+            fsync_every=fsync_every,
+            fsync_interval=fsync_interval
+        )
         
+        # Cargar métricas existentes (snapshot + eventos posteriores)
+        self._load_metrics()
+        
+        # La compactación (replay del journal + snapshot bajo flock) corre en su propio hilo,
+        # fuera del camino de las consultas
+        self._compactor = threading.Thread(target=self._compaction_loop, name="metrics-compactor", daemon=True)
+        self._compactor.start()
+        atexit.register(self.close)
+        
+        if track_embedding_cache:
+            from ..utils.embedding_cache import get_embedding_cache
+            self.register_cache("embeddings", get_embedding_cache().get_statistics)
+    
+    def _reset_state(self):
+        """Estado agregado en memoria"""
         # Métricas básicas
         self.total_queries = 0
         self.correct_responses = 0
         self.consistency_scores = []
-        self.errors = []
-        self.executions = []
+        self.error_count = 0
+        self.error_types = Counter()
+        self.errors = deque(maxlen=RECENT_ERRORS)
+        self.executions = deque(maxlen=RECENT_EXECUTIONS)
         
         # Métricas por tipo de consulta
         self.queries_by_type = defaultdict(lambda: {"total": 0, "correct": 0})
         
-        # Métricas de recursos
-        self.latencies = []
-        self.memory_usage = []
-        self.cpu_usage = []
-        self.tokens_used = []
+        # Métricas de recursos: sketches de cuantiles (memoria constante, con ventanas 1m/5m/1h)
+        # latency_ms (global, "type:<tipo>", "tool:<herramienta>"), ttft_ms, memory_mb, cpu_percent, tokens
+        self.sketches = SketchRegistry()
         
-        # Cargar métricas existentes
-        self._load_metrics()
+        self.cache_stats = {}
+    
+    # ============= PERSISTENCIA (JOURNAL + SNAPSHOT) =============
+    
+    def _load_state(self, snapshot: Dict[str, Any]):
+        """Restaura el estado agregado desde un snapshot (también acepta el formato anterior sin journal)"""
+        self.total_queries = snapshot.get('total_queries', 0)
+        self.correct_responses = snapshot.get('correct_responses', 0)
+        self.executions.extend(snapshot.get('executions', []))
+        self.errors.extend(snapshot.get('errors', []))
+        self.error_count = snapshot.get('error_count', len(snapshot.get('errors', [])))
+        self.error_types = Counter(snapshot.get('error_types') or [e.get('type') for e in snapshot.get('errors', [])])
+        for query_type, counts in snapshot.get('queries_by_type', {}).items():
+            self.queries_by_type[query_type] = dict(counts)
+        self.cache_stats = snapshot.get('cache_stats', {})
+        self.sketches = SketchRegistry.from_dict(snapshot.get('sketches'))
     
     def _load_metrics(self):
-        """Carga métricas previas si existen"""
-        if self.metrics_file.exists():
-            try:
-                with open(self.metrics_file, 'r', encoding='utf-8') as f:
-                    data = json.load(f)
-                    self.total_queries = data.get('total_queries', 0)
-                    self.correct_responses = data.get('correct_responses', 0)
-                    self.executions = data.get('executions', [])
-                    self.errors = data.get('errors', [])
-            except:
-                pass
+        """Carga el último snapshot y reaplica los eventos escritos después (por cualquier proceso)"""
+        try:
+            snapshot = self.journal.read_snapshot()
+            self._load_state(snapshot)
+            position = snapshot.get('journal_position')
+            for _, event in self.journal.iter_events(tuple(position) if position else None):
+                self._apply_event(event)
+        except Exception as e:
+            print(f"⚠️ No se pudieron cargar las métricas previas: {e}")
     
-    def _save_metrics(self):
-        """Persiste las métricas a disco"""
-        metrics_data = {
+    def _apply_event(self, event: Dict[str, Any]):
+        """Aplica un evento del journal al estado agregado"""
+        kind = event.get('event')
+        
+        if kind == 'query':
+            self.total_queries += 1
+            self.queries_by_type[event.get('type', 'general')]["total"] += 1
+        
+        elif kind == 'response':
+            if event.get('correct'):
+                self.correct_responses += 1
+                self.queries_by_type[event.get('type', 'general')]["correct"] += 1
+            self.executions.append({
+                'query_id': event.get('query_id'),
+                'correct': event.get('correct'),
+                'timestamp': event.get('timestamp'),
+                'response_length': event.get('response_length', 0)
+            })
+        
+        elif kind == 'error':
+            self.error_count += 1
+            self.error_types[event.get('type')] += 1
+            self.errors.append({
+                'timestamp': event.get('timestamp'),
+                'type': event.get('type'),
+                'message': event.get('message'),
+                'context': event.get('context', {})
+            })
+        
+        elif kind == 'resources':
+            ts = _epoch(event.get('timestamp'))
+            self.sketches.add('latency_ms', event.get('latency_ms', 0), timestamp=ts)
+            if event.get('type'):
+                self.sketches.add('latency_ms', event.get('latency_ms', 0), f"type:{event['type']}", ts)
+            self.sketches.add('memory_mb', event.get('memory_mb', 0), timestamp=ts)
+            self.sketches.add('cpu_percent', event.get('cpu_percent', 0), timestamp=ts)
+            self.sketches.add('tokens', event.get('tokens_total', 0), timestamp=ts)
+        
+        elif kind == 'tool':
+            self.sketches.add('latency_ms', event.get('latency_ms', 0), f"tool:{event.get('tool')}",
+                              _epoch(event.get('timestamp')))
+        
+        elif kind == 'ttft':
+            self.sketches.add('ttft_ms', event.get('ttft_ms', 0), timestamp=_epoch(event.get('timestamp')))
+    
+    def _record(self, event: Dict[str, Any]):
+        """Aplica el evento y lo agrega al journal (O(1)); cada snapshot_every eventos avisa al compactador"""
+        event.setdefault('timestamp', datetime.now().isoformat())
+        with self._lock:
+            self._apply_event(event)
+            self.journal.append(event)
+            self._events_since_snapshot += 1
+            if self._events_since_snapshot >= self.snapshot_every:
+                self._compact_due.set()
+    
+    def _compaction_loop(self):
+        while True:
+            self._compact_due.wait()
+            if self._closed:
+                return
+            self._compact_due.clear()
+            self.compact()
+    
+    def _snapshot_data(self, position) -> Dict[str, Any]:
+        """Contenido del snapshot (compatible con lo que lee el dashboard)"""
+        return {
             'timestamp': datetime.now().isoformat(),
             'total_queries': self.total_queries,
             'correct_responses': self.correct_responses,
             'precision': self.calculate_precision(),
             'error_frequency': self.calculate_error_frequency(),
-            'executions': self.executions[-100:],  # Últimas 100
-            'errors': self.errors[-50:],  # Últimos 50 errores
+            'error_count': self.error_count,
+            'error_types': dict(self.error_types),
+            'queries_by_type': dict(self.queries_by_type),
+            'executions': list(self.executions),
+            'errors': list(self.errors),
+            'cache_stats': dict(self.cache_stats),
+            'latency_stats': self.get_latency_stats(),
+            'latency_percentiles': self.get_latency_percentiles(),
+            'ttft_stats': self.get_ttft_stats(),
+            'resource_stats': self.get_resource_stats(),
+            'sketches': self.sketches.to_dict(),
+            'journal_position': list(position) if position else None
         }
+    
+    @classmethod
+    def _replay(cls, journal: MetricsJournal) -> tuple:
+        """Estado agregado reconstruido solo desde disco: snapshot + todos los eventos posteriores"""
+        state = cls.__new__(cls)
+        state._reset_state()
+        state.cache_sources = {}
+        state.resource_sampler = None
+        snapshot = journal.read_snapshot()
+        state._load_state(snapshot)
+        position = tuple(snapshot['journal_position']) if snapshot.get('journal_position') else None
+        for position, event in journal.iter_events(position):
+            state._apply_event(event)
+        return state, position or journal.end_position()
+    
+    def compact(self):
+        """
+        Escribe un snapshot nuevo y sella el segmento activo si creció demasiado
+        El snapshot se arma desde el journal (no desde la memoria del proceso), así refleja a todos los escritores
+        """
+        with self._lock:
+            self._events_since_snapshot = 0
+            self.journal.flush()
+            live_cache_stats = self.get_cache_stats()
+        try:
+            with self.journal.exclusive():
+                state, position = self._replay(self.journal)
+                state.cache_stats.update(live_cache_stats)
+                state.resource_sampler = self.resource_sampler
+                self.journal.write_snapshot(state._snapshot_data(position))
+                self.journal.seal_if_needed()
+        except Exception as e:
+            print(f"⚠️ Error compactando métricas: {e}")
+    
+    def close(self):
+        """Detiene el compactador, compacta y cierra el journal (se registra en atexit)"""
+        if self._closed:
+            return
+        self._closed = True
+        self._compact_due.set()
+        self._compactor.join()
+        if self.journal.events_written:
+            self.compact()
+        self.journal.close()
+    
+    def iter_history(self, event_type: Optional[str] = None, since: Optional[str] = None) -> Iterator[Dict[str, Any]]:
+        """
+        Historial completo de eventos (todos los segmentos del journal)
         
-        with open(self.metrics_file, 'w', encoding='utf-8') as f:
-            json.dump(metrics_data, f, ensure_ascii=False, indent=2)
+        Args:
+            event_type: "query", "response", "error", "resources" o "ttft" (None = todos)
+            since: Timestamp ISO mínimo
+        """
+        self.journal.flush()
+        for _, event in self.journal.iter_events():
+            if event_type and event.get('event') != event_type:
+                continue
+            if since and event.get('timestamp', '') < since:
+                continue
+            yield event
+    
+    @classmethod
+    def read_current(cls, metrics_file: str = "./metrics/metrics.json") -> Dict[str, Any]:
+        """Métricas vigentes (snapshot + eventos aún no compactados) sin abrir el journal para escritura"""
+        state, position = cls._replay(MetricsJournal(metrics_file))
+        return state._snapshot_data(position)
     
     # ============= IE1: PRECISIÓN, CONSISTENCIA, ERRORES =============
     
@@ -100,16 +310,16 @@ class ObservabilityMetrics:
         """Errores por cada 100 consultas"""
         if self.total_queries == 0:
             return 0.0
-        return round((len(self.errors) / self.total_queries) * 100, 2)
+        return round((self.error_count / self.total_queries) * 100, 2)
     
     def record_query(self, query: str, query_type: str = "general"):
         """Registra inicio de una consulta"""
-        self.total_queries += 1
-        self.queries_by_type[query_type]["total"] += 1
+        timestamp = datetime.now().isoformat()
+        self._record({'event': 'query', 'timestamp': timestamp, 'type': query_type})
         
         return {
             'query_id': self.total_queries,
-            'timestamp': datetime.now().isoformat(),
+            'timestamp': timestamp,
             'query': query,
             'type': query_type
         }
@@ -122,30 +332,22 @@ class ObservabilityMetrics:
         query_type: str = "general"
     ):
         """Registra una respuesta evaluada"""
-        if is_correct:
-            self.correct_responses += 1
-            self.queries_by_type[query_type]["correct"] += 1
-        
-        self.executions.append({
+        self._record({
+            'event': 'response',
             'query_id': query_id,
             'correct': is_correct,
-            'timestamp': datetime.now().isoformat(),
+            'type': query_type,
             'response_length': len(response)
         })
-        
-        self._save_metrics()
     
     def record_error(self, error_type: str, error_message: str, context: Dict = None):
         """Registra un error ocurrido"""
-        error_record = {
-            'timestamp': datetime.now().isoformat(),
+        self._record({
+            'event': 'error',
             'type': error_type,
             'message': error_message,
             'context': context or {}
-        }
-        
-        self.errors.append(error_record)
-        self._save_metrics()
+        })
     
     # ============= IE2: LATENCIA Y RECURSOS =============
     
@@ -153,73 +355,146 @@ class ObservabilityMetrics:
         self,
         execution_time: float,
         tokens_prompt: int = 0,
-        tokens_response: int = 0
+        tokens_response: int = 0,
+        query_type: Optional[str] = None
     ) -> Dict[str, Any]:
         """
         Mide recursos utilizados en una ejecución
+        Lee la última muestra del sampler en segundo plano (O(1), sin dormir en el hilo de la consulta)
+        
+        Args:
+            execution_time: Segundos de la ejecución
+            tokens_prompt: Tokens del prompt
+            tokens_response: Tokens de la respuesta
+            query_type: Tipo de consulta (para los percentiles de latencia por tipo)
         """
-        process = psutil.Process()
-        memory_info = process.memory_info()
-        memory_mb = memory_info.rss / (1024 * 1024)
-        cpu_percent = psutil.cpu_percent(interval=0.1)
+        sample = self.resource_sampler.latest()
         
         resource_data = {
             'timestamp': datetime.now().isoformat(),
             'latency_ms': round(execution_time * 1000, 2),
-            'memory_mb': round(memory_mb, 2),
-            'cpu_percent': cpu_percent,
+            'memory_mb': sample.rss_mb,
+            'cpu_percent': sample.cpu_percent,
+            'threads': sample.threads,
+            'open_fds': sample.open_fds,
             'tokens_prompt': tokens_prompt,
             'tokens_response': tokens_response,
             'tokens_total': tokens_prompt + tokens_response
         }
         
-        # Guardar en listas
-        self.latencies.append(resource_data['latency_ms'])
-        self.memory_usage.append(memory_mb)
-        self.cpu_usage.append(cpu_percent)
-        self.tokens_used.append(tokens_prompt + tokens_response)
+        # CPU del proceso y pausas del GC durante la consulta (muestras del inicio y del final)
+        start = self.resource_sampler.since(sample.timestamp - execution_time)
+        if start is not None and start is not sample:
+            delta = self.resource_sampler.delta(start, sample)
+            resource_data['process_cpu_percent'] = delta['process_cpu_percent']
+            resource_data['gc_pause_ms'] = delta['gc_pause_ms']
+        if query_type:
+            resource_data['type'] = query_type
+        
+        self._record(dict(resource_data, event='resources'))
         
         return resource_data
     
-    def get_latency_stats(self) -> Dict[str, float]:
-        """Estadísticas de latencia"""
-        if not self.latencies:
+    def record_tool_latency(self, tool_name: str, execution_time: float):
+        """Registra la duración (segundos) de una llamada a herramienta"""
+        self._record({
+            'event': 'tool',
+            'tool': tool_name,
+            'latency_ms': round(execution_time * 1000, 2)
+        })
+    
+    def _sketch_stats(self, metric: str, label: str = "", unit: str = "ms",
+                      count_key: str = "total_queries", windows: bool = False) -> Dict[str, Any]:
+        """Resumen de un sketch con las claves históricas (min_ms, max_ms, avg_ms, ...) más los percentiles"""
+        summary = self.sketches.summary(metric, label, windows=windows)
+        if not summary:
             return {}
-        
+        stats = {f"{key}_{unit}": value for key, value in summary.items() if key not in ('count', 'windows')}
+        stats[count_key] = summary['count']
+        if windows:
+            stats['windows'] = {
+                name: {f"{key}_{unit}" if key != 'count' else key: value for key, value in view.items()}
+                for name, view in summary['windows'].items()
+            }
+        return stats
+    
+    def get_latency_stats(self) -> Dict[str, float]:
+        """Estadísticas de latencia (min/max/promedio y p50/p90/p99/p999)"""
+        return self._sketch_stats('latency_ms')
+    
+    def get_latency_percentiles(self) -> Dict[str, Any]:
+        """Percentiles de latencia global, por tipo de consulta y por herramienta, con ventanas 1m/5m/1h"""
         return {
-            'min_ms': min(self.latencies),
-            'max_ms': max(self.latencies),
-            'avg_ms': round(sum(self.latencies) / len(self.latencies), 2),
-            'total_queries': len(self.latencies)
+            'overall': self._sketch_stats('latency_ms', windows=True),
+            'by_type': {
+                label[len('type:'):]: self._sketch_stats('latency_ms', label, windows=True)
+                for label in self.sketches.labels('latency_ms', 'type:')
+            },
+            'by_tool': {
+                label[len('tool:'):]: self._sketch_stats('latency_ms', label, count_key='calls', windows=True)
+                for label in self.sketches.labels('latency_ms', 'tool:')
+            }
         }
     
+    def record_time_to_first_token(self, ttft_seconds: float):
+        """Registra el tiempo hasta el primer token visible de una respuesta en streaming"""
+        if ttft_seconds is not None:
+            self._record({'event': 'ttft', 'ttft_ms': round(ttft_seconds * 1000, 2)})
+    
+    def get_ttft_stats(self) -> Dict[str, float]:
+        """Estadísticas de tiempo al primer token (latencia percibida)"""
+        return self._sketch_stats('ttft_ms')
+    
     def get_resource_stats(self) -> Dict[str, Any]:
         """Estadísticas de recursos"""
         stats = {}
         
-        if self.memory_usage:
-            stats['memory'] = {
-                'min_mb': min(self.memory_usage),
-                'max_mb': max(self.memory_usage),
-                'avg_mb': round(sum(self.memory_usage) / len(self.memory_usage), 2)
-            }
+        memory = self._sketch_stats('memory_mb', unit='mb', count_key='samples')
+        if memory:
+            stats['memory'] = memory
         
-        if self.cpu_usage:
-            stats['cpu'] = {
-                'min_percent': min(self.cpu_usage),
-                'max_percent': max(self.cpu_usage),
-                'avg_percent': round(sum(self.cpu_usage) / len(self.cpu_usage), 2)
-            }
+        cpu = self._sketch_stats('cpu_percent', unit='percent', count_key='samples')
+        if cpu:
+            stats['cpu'] = cpu
         
-        if self.tokens_used:
+        tokens = self.sketches.get('tokens')
+        if tokens and tokens.total.count:
             stats['tokens'] = {
-                'total': sum(self.tokens_used),
-                'avg_per_query': round(sum(self.tokens_used) / len(self.tokens_used), 2),
-                'queries': len(self.tokens_used)
+                'total': int(tokens.total.total),
+                'avg_per_query': round(tokens.total.mean, 2),
+                'p99_per_query': round(tokens.total.quantile(0.99), 2),
+                'queries': tokens.total.count
             }
         
+        if self.resource_sampler is not None:
+            process = self.resource_sampler.summary(seconds=300)
+            if process:
+                stats['process'] = process
+        
         return stats
     
+    # ============= CACHES =============
+    
+    def register_cache(self, name: str, stats_fn):
+        """
+        Registra una fuente de estadísticas de cache (ej: EmbeddingCache.get_statistics)
+        Sus contadores de hit/miss aparecen en el resumen y en el archivo de métricas
+        """
+        self.cache_sources[name] = stats_fn
+    
+    def record_cache_stats(self, name: str, stats: Dict[str, Any]):
+        """Registra una instantánea de estadísticas de un cache"""
+        self.cache_stats[name] = dict(stats)
+    
+    def get_cache_stats(self) -> Dict[str, Dict[str, Any]]:
+        """Estadísticas actuales de todos los caches registrados"""
+        for name, stats_fn in self.cache_sources.items():
+            try:
+                self.cache_stats[name] = dict(stats_fn())
+            except Exception:
+                pass
+        return dict(self.cache_stats)
+    
     # ============= ESTADÍSTICAS GENERALES =============
     
     def get_summary(self) -> Dict[str, Any]:
@@ -228,17 +503,19 @@ class ObservabilityMetrics:
             'total_queries': self.total_queries,
             'precision': self.calculate_precision(),
             'error_frequency': self.calculate_error_frequency(),
-            'error_count': len(self.errors),
-            'error_types': Counter([e['type'] for e in self.errors]),
+            'error_count': self.error_count,
+            'error_types': Counter(self.error_types),
             'latency_stats': self.get_latency_stats(),
+            'ttft_stats': self.get_ttft_stats(),
             'resource_stats': self.get_resource_stats(),
             'top_errors': self._get_top_errors(5),
-            'queries_by_type': dict(self.queries_by_type)
+            'queries_by_type': dict(self.queries_by_type),
+            'cache_stats': self.get_cache_stats()
         }
     
     def _get_top_errors(self, top_n: int = 5) -> List[Dict]:
         """Retorna los N errores más frecuentes"""
-        error_types = Counter([e['type'] for e in self.errors])
+        error_types = self.error_types
         return [
             {'type': error_type, 'count': count}
             for error_type, count in error_types.most_common(top_n)
@@ -255,3 +532,27 @@ class ObservabilityMetrics:
             json.dump(summary, f, ensure_ascii=False, indent=2)
         
         return output_path
+
+
+_metrics: Optional[ObservabilityMetrics] = None
+_metrics_lock = threading.Lock()
+
+
+def get_observability_metrics(metrics_file: str = "./metrics/metrics.json") -> ObservabilityMetrics:
+    """
+    Métricas compartidas del proceso (un solo journal abierto por archivo)
+    La app registra aquí TTFT y latencias de herramientas; el dashboard las lee con read_current
+    """
+    global _metrics
+    with _metrics_lock:
+        if _metrics is None:
+            _metrics = ObservabilityMetrics(metrics_file)
+        return _metrics
+
+
+def _epoch(timestamp: Optional[str]) -> Optional[float]:
+    """Timestamp ISO del evento -> epoch (None = ahora)"""
+    try:
+        return datetime.fromisoformat(timestamp).timestamp()
+    except (TypeError, ValueError):
+        return None
@@ -0,0 +1,240 @@
+"""
+Journal append-only de eventos de métricas
+Cada evento es una línea JSON agregada al segmento activo (O(1) por evento, fsync en lotes).
+Los segmentos llenos se sellan comprimidos y un snapshot periódico guarda el estado agregado
+junto con la posición del journal, de modo que cargar = snapshot + eventos posteriores.
+"""
+
+import gzip
+import json
+import os
+import re
+import threading
+import time
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any, Dict, Iterator, Optional, Tuple
+
+try:
+    import fcntl
+except ImportError:  # Windows: solo exclusión dentro del proceso
+    fcntl = None
+
+_SEGMENT_RE = re.compile(r"\.(\d{6})\.jsonl\.gz$")
+
+# Posición en el journal: (último segmento sellado ya leído, bytes leídos del segmento siguiente)
+# El segmento siguiente puede ser el activo o uno sellado después de tomar la posición
+JournalPosition = Tuple[int, int]
+
+
+class MetricsJournal:
+    """
+    Archivos (con base "metrics"):
+        metrics.journal.jsonl           segmento activo (append-only)
+        metrics.journal.000001.jsonl.gz segmentos sellados (historial completo)
+        metrics.json                    snapshot (estado agregado + posición)
+        metrics.journal.lock            lock entre procesos para sellar y escribir snapshots
+    """
+
+    def __init__(
+        self,
+        snapshot_file: str,
+        fsync_every: int = 64,
+        fsync_interval: float = 1.0,
+        max_segment_bytes: int = 8 * 1024 * 1024
+    ):
+        """
+        Args:
+            snapshot_file: Archivo del snapshot (el journal vive a su lado)
+            fsync_every: Eventos máximos sin fsync
+            fsync_interval: Segundos máximos sin fsync
+            max_segment_bytes: Tamaño desde el cual el segmento activo se sella al compactar
+        """
+        self.snapshot_file = Path(snapshot_file)
+        self.snapshot_file.parent.mkdir(parents=True, exist_ok=True)
+        base = self.snapshot_file.with_suffix("")
+        self.active_path = Path(f"{base}.journal.jsonl")
+        self.lock_path = Path(f"{base}.journal.lock")
+        self.segment_prefix = f"{base.name}.journal."
+
+        self.fsync_every = fsync_every
+        self.fsync_interval = fsync_interval
+        self.max_segment_bytes = max_segment_bytes
+
+        self._lock = threading.Lock()
+        self._fd: Optional[int] = None
+        self._fd_inode = None
+        self._lock_fd = None
+        self._unsynced = 0
+        self._last_sync = time.monotonic()
+        self.events_written = 0
+
+    # ============= ESCRITURA =============
+
+    def _open(self):
+        """Abre (o reabre, si otro proceso selló el segmento) el archivo activo en modo append"""
+        try:
+            inode = os.stat(self.active_path).st_ino
+        except FileNotFoundError:
+            inode = None
+        if self._fd is not None and inode == self._fd_inode:
+            return
+        if self._fd is not None:
+            os.close(self._fd)
+        self._fd = os.open(self.active_path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+        self._fd_inode = os.fstat(self._fd).st_ino
+
+    def append(self, event: Dict[str, Any]):
+        """Agrega un evento; un solo write() con O_APPEND mantiene las líneas enteras entre procesos"""
+        line = (json.dumps(event, ensure_ascii=False, default=str) + "\n").encode("utf-8")
+        with self._lock:
+            # Lock compartido: varios escritores a la vez, pero nunca durante el sellado de un segmento
+            if self._lock_fd is None:
+                self._lock_fd = os.open(self.lock_path, os.O_RDWR | os.O_CREAT, 0o644)
+            if fcntl is not None:
+                fcntl.flock(self._lock_fd, fcntl.LOCK_SH)
+            try:
+                self._open()
+                os.write(self._fd, line)
+            finally:
+                if fcntl is not None:
+                    fcntl.flock(self._lock_fd, fcntl.LOCK_UN)
+            self.events_written += 1
+            self._unsynced += 1
+            if self._unsynced >= self.fsync_every or time.monotonic() - self._last_sync >= self.fsync_interval:
+                self._sync()
+
+    def _sync(self):
+        if self._fd is not None and self._unsynced:
+            os.fsync(self._fd)
+        self._unsynced = 0
+        self._last_sync = time.monotonic()
+
+    def flush(self):
+        with self._lock:
+            self._sync()
+
+    def close(self):
+        with self._lock:
+            self._sync()
+            if self._fd is not None:
+                os.close(self._fd)
+                self._fd = None
+            if self._lock_fd is not None:
+                os.close(self._lock_fd)
+                self._lock_fd = None
+
+    # ============= LECTURA =============
+
+    def sealed_segments(self):
+        segments = []
+        for path in self.snapshot_file.parent.glob(f"{self.segment_prefix}*.jsonl.gz"):
+            match = _SEGMENT_RE.search(path.name)
+            if match:
+                segments.append((int(match.group(1)), path))
+        return sorted(segments)
+
+    def iter_events(self, start: Optional[JournalPosition] = None) -> Iterator[Tuple[JournalPosition, Dict[str, Any]]]:
+        """
+        Eventos desde start (None = desde el principio), con la posición posterior a cada uno
+        Los segmentos sellados se leen solo si start no los cubre
+        """
+        sealed_from, offset = start or (0, 0)
+        segments = self.sealed_segments()
+        for number, path in segments:
+            if number <= sealed_from:
+                continue
+            skip = offset if number == sealed_from + 1 else 0
+            consumed = 0
+            with gzip.open(path, "rb") as f:
+                for line in f:
+                    consumed += len(line)
+                    if consumed <= skip:
+                        continue
+                    event = _parse(line.decode("utf-8"))
+                    if event is not None:
+                        yield (number - 1, consumed), event
+        last_sealed = segments[-1][0] if segments else 0
+        offset = offset if last_sealed == sealed_from else 0
+
+        if not self.active_path.exists():
+            return
+        with open(self.active_path, "rb") as f:
+            f.seek(offset)
+            while True:
+                line = f.readline()
+                # Una línea sin \n es un evento a medio escribir por otro proceso
+                if not line or not line.endswith(b"\n"):
+                    return
+                offset += len(line)
+                event = _parse(line.decode("utf-8"))
+                if event is not None:
+                    yield (last_sealed, offset), event
+
+    def end_position(self) -> JournalPosition:
+        segments = self.sealed_segments()
+        sealed = segments[-1][0] if segments else 0
+        size = self.active_path.stat().st_size if self.active_path.exists() else 0
+        return sealed, size
+
+    # ============= SNAPSHOTS Y COMPACTACIÓN =============
+
+    @contextmanager
+    def exclusive(self):
+        """Lock entre procesos (y entre hilos) para sellar segmentos o escribir el snapshot"""
+        with open(self.lock_path, "a") as lock_file:
+            if fcntl is not None:
+                fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                if fcntl is not None:
+                    fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def read_snapshot(self) -> Dict[str, Any]:
+        if not self.snapshot_file.exists():
+            return {}
+        try:
+            with open(self.snapshot_file, "r", encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def write_snapshot(self, data: Dict[str, Any]):
+        """Reemplazo atómico: los lectores ven el snapshot anterior o el nuevo, nunca uno parcial"""
+        tmp = self.snapshot_file.with_suffix(f".{os.getpid()}.tmp")
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(data, f, ensure_ascii=False, indent=2, default=str)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, self.snapshot_file)
+
+    def seal_if_needed(self, force: bool = False) -> bool:
+        """
+        Sella el segmento activo comprimiéndolo si superó max_segment_bytes
+        Debe llamarse dentro de exclusive() y justo después de escribir un snapshot que lo cubra
+        """
+        if not self.active_path.exists():
+            return False
+        size = self.active_path.stat().st_size
+        if size == 0 or (size < self.max_segment_bytes and not force):
+            return False
+
+        segments = self.sealed_segments()
+        number = (segments[-1][0] if segments else 0) + 1
+        sealing = self.active_path.with_suffix(".sealing")
+        # Los escritores detectan el cambio de inode y reabren un segmento activo nuevo
+        os.replace(self.active_path, sealing)
+        target = self.snapshot_file.parent / f"{self.segment_prefix}{number:06d}.jsonl.gz"
+        with open(sealing, "rb") as src, gzip.open(f"{target}.tmp", "wb") as dst:
+            dst.write(src.read())
+        os.replace(f"{target}.tmp", target)
+        os.remove(sealing)
+        return True
+
+
+def _parse(line: str) -> Optional[Dict[str, Any]]:
+    try:
+        return json.loads(line)
+    except ValueError:
+        return None
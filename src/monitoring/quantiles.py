@@ -0,0 +1,303 @@
+"""
+Sketches de cuantiles en streaming para latencias y recursos
+Histograma logarítmico (estilo DDSketch/HDR): error relativo acotado, memoria constante y
+fusionable entre procesos sumando buckets. Las vistas por ventana (1m/5m/1h) se arman
+fusionando sketches por intervalo de tiempo.
+"""
+
+import math
+import time
+from typing import Any, Dict, Iterable, Optional
+
+# Cuantiles reportados por defecto
+DEFAULT_QUANTILES = (0.5, 0.9, 0.99, 0.999)
+
+# Ventanas reportadas: nombre -> segundos
+WINDOWS = {"1m": 60, "5m": 300, "1h": 3600}
+
+
+def quantile_label(q: float) -> str:
+    """0.5 -> "p50", 0.999 -> "p999" """
+    return "p" + f"{q * 100:g}".replace(".", "")
+
+
+class QuantileSketch:
+    """
+    Cuenta valores en buckets geométricos: el bucket i cubre (gamma^(i-1), gamma^i]
+    Cualquier cuantil se estima con error relativo <= relative_accuracy
+    Con max_buckets se fusionan los buckets más bajos (la cola alta, la que importa, conserva su precisión)
+    """
+
+    __slots__ = ("relative_accuracy", "max_buckets", "_gamma", "_log_gamma",
+                 "buckets", "zero_count", "count", "total", "min", "max")
+
+    # Valores por debajo de este umbral cuentan como cero (ej: cpu_percent = 0.0)
+    MIN_VALUE = 1e-9
+
+    def __init__(self, relative_accuracy: float = 0.01, max_buckets: int = 2048):
+        """
+        Args:
+            relative_accuracy: Error relativo máximo de los cuantiles (0.01 = 1%)
+            max_buckets: Tope de buckets (memoria constante)
+        """
+        self.relative_accuracy = relative_accuracy
+        self.max_buckets = max_buckets
+        self._gamma = (1 + relative_accuracy) / (1 - relative_accuracy)
+        self._log_gamma = math.log(self._gamma)
+        self.buckets: Dict[int, int] = {}
+        self.zero_count = 0
+        self.count = 0
+        self.total = 0.0
+        self.min = math.inf
+        self.max = -math.inf
+
+    # ============= REGISTRO =============
+
+    def add(self, value: float, weight: int = 1):
+        """Registra un valor (O(1))"""
+        value = float(value)
+        self.count += weight
+        self.total += value * weight
+        if value < self.min:
+            self.min = value
+        if value > self.max:
+            self.max = value
+
+        if value <= self.MIN_VALUE:
+            self.zero_count += weight
+            return
+        index = math.ceil(math.log(value) / self._log_gamma)
+        self.buckets[index] = self.buckets.get(index, 0) + weight
+        if len(self.buckets) > self.max_buckets:
+            self._collapse()
+
+    def _collapse(self):
+        """Fusiona los buckets más bajos hasta volver al tope"""
+        keys = sorted(self.buckets)
+        excess = len(keys) - self.max_buckets
+        target = keys[excess]
+        for key in keys[:excess]:
+            self.buckets[target] += self.buckets.pop(key)
+
+    def merge(self, other: "QuantileSketch") -> "QuantileSketch":
+        """Suma otro sketch (deben compartir relative_accuracy)"""
+        if other.relative_accuracy != self.relative_accuracy:
+            raise ValueError("Solo se pueden fusionar sketches con la misma precisión relativa")
+        for index, weight in other.buckets.items():
+            self.buckets[index] = self.buckets.get(index, 0) + weight
+        self.zero_count += other.zero_count
+        self.count += other.count
+        self.total += other.total
+        self.min = min(self.min, other.min)
+        self.max = max(self.max, other.max)
+        if len(self.buckets) > self.max_buckets:
+            self._collapse()
+        return self
+
+    # ============= CONSULTA =============
+
+    def quantile(self, q: float) -> Optional[float]:
+        """Valor estimado del cuantil q (0..1); None si está vacío"""
+        if self.count == 0:
+            return None
+        if q <= 0:
+            return self.min
+        if q >= 1:
+            return self.max
+
+        rank = q * (self.count - 1)
+        seen = self.zero_count
+        if rank < seen:
+            return max(self.min, 0.0)
+        for index in sorted(self.buckets):
+            seen += self.buckets[index]
+            if seen > rank:
+                # Punto medio del bucket en escala relativa
+                estimate = 2 * self._gamma ** index / (self._gamma + 1)
+                return min(max(estimate, self.min), self.max)
+        return self.max
+
+    @property
+    def mean(self) -> Optional[float]:
+        return self.total / self.count if self.count else None
+
+    def summary(self, quantiles: Iterable[float] = DEFAULT_QUANTILES, digits: int = 2) -> Dict[str, Any]:
+        """count, min, max, avg y los cuantiles pedidos"""
+        if self.count == 0:
+            return {}
+        result = {
+            "count": self.count,
+            "min": round(self.min, digits),
+            "max": round(self.max, digits),
+            "avg": round(self.mean, digits)
+        }
+        for q in quantiles:
+            result[quantile_label(q)] = round(self.quantile(q), digits)
+        return result
+
+    # ============= SERIALIZACIÓN =============
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "alpha": self.relative_accuracy,
+            "buckets": {str(k): v for k, v in self.buckets.items()},
+            "zero": self.zero_count,
+            "count": self.count,
+            "sum": self.total,
+            "min": self.min if self.count else None,
+            "max": self.max if self.count else None
+        }
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any], max_buckets: int = 2048) -> "QuantileSketch":
+        sketch = cls(data.get("alpha", 0.01), max_buckets)
+        sketch.buckets = {int(k): v for k, v in data.get("buckets", {}).items()}
+        sketch.zero_count = data.get("zero", 0)
+        sketch.count = data.get("count", 0)
+        sketch.total = data.get("sum", 0.0)
+        if sketch.count:
+            sketch.min = data["min"]
+            sketch.max = data["max"]
+        return sketch
+
+
+class WindowedSketch:
+    """
+    Sketch acumulado desde el inicio + sketches por intervalo para vistas recientes
+    Intervalos de 10s (vista de 1m) y de 60s (vistas de 5m y 1h); los vencidos se descartan,
+    así la memoria queda acotada a 6 + 60 sketches
+    """
+
+    FINE_SECONDS = 10
+    COARSE_SECONDS = 60
+
+    def __init__(self, relative_accuracy: float = 0.01):
+        self.relative_accuracy = relative_accuracy
+        self.total = QuantileSketch(relative_accuracy)
+        self._fine: Dict[int, QuantileSketch] = {}
+        self._coarse: Dict[int, QuantileSketch] = {}
+        self._fine_keep = WINDOWS["1m"] // self.FINE_SECONDS
+        self._coarse_keep = WINDOWS["1h"] // self.COARSE_SECONDS
+
+    def add(self, value: float, timestamp: Optional[float] = None):
+        """
+        Args:
+            value: Valor observado
+            timestamp: Epoch en segundos del evento (None = ahora); permite reaplicar eventos del journal
+        """
+        timestamp = time.time() if timestamp is None else timestamp
+        self.total.add(value)
+        self._slot(self._fine, int(timestamp // self.FINE_SECONDS), self._fine_keep).add(value)
+        self._slot(self._coarse, int(timestamp // self.COARSE_SECONDS), self._coarse_keep).add(value)
+
+    def _slot(self, slots: Dict[int, QuantileSketch], index: int, keep: int) -> QuantileSketch:
+        sketch = slots.get(index)
+        if sketch is None:
+            sketch = slots[index] = QuantileSketch(self.relative_accuracy)
+            newest = max(slots)
+            for old in [i for i in slots if i <= newest - keep]:
+                del slots[old]
+        return sketch
+
+    def window(self, seconds: int, now: Optional[float] = None) -> QuantileSketch:
+        """Sketch fusionado de los últimos seconds segundos (granularidad del intervalo)"""
+        now = time.time() if now is None else now
+        if seconds <= WINDOWS["1m"]:
+            slots, size = self._fine, self.FINE_SECONDS
+        else:
+            slots, size = self._coarse, self.COARSE_SECONDS
+        first = int(now // size) - math.ceil(seconds / size) + 1
+        merged = QuantileSketch(self.relative_accuracy)
+        for index, sketch in slots.items():
+            if index >= first:
+                merged.merge(sketch)
+        return merged
+
+    def merge(self, other: "WindowedSketch") -> "WindowedSketch":
+        self.total.merge(other.total)
+        for mine, theirs, keep in ((self._fine, other._fine, self._fine_keep),
+                                   (self._coarse, other._coarse, self._coarse_keep)):
+            for index, sketch in theirs.items():
+                self._slot(mine, index, keep).merge(sketch)
+        return self
+
+    def summary(self, quantiles: Iterable[float] = DEFAULT_QUANTILES, windows: bool = True,
+                now: Optional[float] = None) -> Dict[str, Any]:
+        """Resumen acumulado y, si windows, el de cada ventana de WINDOWS"""
+        result = self.total.summary(quantiles)
+        if windows and result:
+            result["windows"] = {
+                name: self.window(seconds, now).summary(quantiles)
+                for name, seconds in WINDOWS.items()
+            }
+        return result
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "total": self.total.to_dict(),
+            "fine": {str(k): v.to_dict() for k, v in self._fine.items()},
+            "coarse": {str(k): v.to_dict() for k, v in self._coarse.items()}
+        }
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "WindowedSketch":
+        total = QuantileSketch.from_dict(data.get("total", {}))
+        sketch = cls(total.relative_accuracy)
+        sketch.total = total
+        sketch._fine = {int(k): QuantileSketch.from_dict(v) for k, v in data.get("fine", {}).items()}
+        sketch._coarse = {int(k): QuantileSketch.from_dict(v) for k, v in data.get("coarse", {}).items()}
+        return sketch
+
+
+class SketchRegistry:
+    """
+    Sketches con nombre y etiqueta, ej: ("latency_ms", "type:precio"), ("latency_ms", "tool:SearchProductsTool")
+    La etiqueta "" es el agregado global de la métrica
+    """
+
+    def __init__(self, relative_accuracy: float = 0.01):
+        self.relative_accuracy = relative_accuracy
+        self._sketches: Dict[str, Dict[str, WindowedSketch]] = {}
+
+    def add(self, metric: str, value: float, label: str = "", timestamp: Optional[float] = None):
+        by_label = self._sketches.setdefault(metric, {})
+        sketch = by_label.get(label)
+        if sketch is None:
+            sketch = by_label[label] = WindowedSketch(self.relative_accuracy)
+        sketch.add(value, timestamp)
+
+    def get(self, metric: str, label: str = "") -> Optional[WindowedSketch]:
+        return self._sketches.get(metric, {}).get(label)
+
+    def labels(self, metric: str, prefix: str = ""):
+        return sorted(label for label in self._sketches.get(metric, {}) if label and label.startswith(prefix))
+
+    def summary(self, metric: str, label: str = "", windows: bool = True) -> Dict[str, Any]:
+        sketch = self.get(metric, label)
+        return sketch.summary(windows=windows) if sketch else {}
+
+    def merge(self, other: "SketchRegistry") -> "SketchRegistry":
+        """Fusiona los sketches de otro proceso"""
+        for metric, by_label in other._sketches.items():
+            mine = self._sketches.setdefault(metric, {})
+            for label, sketch in by_label.items():
+                if label in mine:
+                    mine[label].merge(sketch)
+                else:
+                    mine[label] = WindowedSketch.from_dict(sketch.to_dict())
+        return self
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            metric: {label: sketch.to_dict() for label, sketch in by_label.items()}
+            for metric, by_label in self._sketches.items()
+        }
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any], relative_accuracy: float = 0.01) -> "SketchRegistry":
+        registry = cls(relative_accuracy)
+        for metric, by_label in (data or {}).items():
+            registry._sketches[metric] = {
+                label: WindowedSketch.from_dict(sketch) for label, sketch in by_label.items()
+            }
+        return registry
@@ -0,0 +1,207 @@
+"""
+Muestreo de recursos del proceso en un hilo de fondo
+RSS, CPU, hilos, descriptores abiertos y estadísticas del GC a intervalo fijo en un buffer circular,
+para que medir recursos en el camino de una consulta sea una lectura O(1) sin dormir.
+"""
+
+import gc
+import os
+import threading
+import time
+from collections import deque
+from typing import Any, Dict, List, Optional
+
+import psutil
+
+
+class ResourceSample:
+    """Una muestra de recursos del proceso"""
+
+    __slots__ = ("timestamp", "rss_mb", "cpu_percent", "process_cpu_percent", "cpu_seconds",
+                 "threads", "open_fds", "gc_counts", "gc_collections", "gc_pause_ms")
+
+    def __init__(self, timestamp: float, rss_mb: float, cpu_percent: float, process_cpu_percent: float,
+                 cpu_seconds: float, threads: int, open_fds: Optional[int], gc_counts: tuple,
+                 gc_collections: int, gc_pause_ms: float):
+        self.timestamp = timestamp
+        self.rss_mb = rss_mb
+        self.cpu_percent = cpu_percent
+        self.process_cpu_percent = process_cpu_percent
+        self.cpu_seconds = cpu_seconds
+        self.threads = threads
+        self.open_fds = open_fds
+        self.gc_counts = gc_counts
+        self.gc_collections = gc_collections
+        self.gc_pause_ms = gc_pause_ms
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {slot: getattr(self, slot) for slot in self.__slots__}
+
+
+class ResourceSampler:
+    """
+    Hilo daemon que toma una muestra cada interval segundos
+    Los porcentajes de CPU son del intervalo entre muestras (psutil sin interval no duerme)
+    """
+
+    def __init__(self, interval: float = 1.0, capacity: int = 600):
+        """
+        Args:
+            interval: Segundos entre muestras
+            capacity: Muestras retenidas en el buffer circular (600 x 1s = 10 minutos)
+        """
+        self.interval = interval
+        self.samples: deque = deque(maxlen=capacity)
+        self._process = psutil.Process()
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+        # Pausas del GC medidas con gc.callbacks (acumuladas desde el arranque)
+        self._gc_started: Optional[float] = None
+        self._gc_pause_ms = 0.0
+        self._gc_collections = 0
+        gc.callbacks.append(self._on_gc)
+
+        # La primera llamada de psutil fija la referencia y retorna 0.0
+        psutil.cpu_percent(interval=None)
+        self._process.cpu_percent(interval=None)
+
+    # ============= MUESTREO =============
+
+    def _on_gc(self, phase: str, info: Dict[str, Any]):
+        if phase == "start":
+            self._gc_started = time.perf_counter()
+        elif self._gc_started is not None:
+            self._gc_pause_ms += (time.perf_counter() - self._gc_started) * 1000
+            self._gc_collections += 1
+            self._gc_started = None
+
+    def sample(self) -> ResourceSample:
+        """Toma una muestra ahora (no duerme) y la agrega al buffer"""
+        process = self._process
+        with process.oneshot():
+            rss_mb = process.memory_info().rss / (1024 * 1024)
+            process_cpu = process.cpu_percent(interval=None)
+            cpu_times = process.cpu_times()
+            threads = process.num_threads()
+            try:
+                open_fds = process.num_fds() if os.name == "posix" else process.num_handles()
+            except (psutil.Error, AttributeError):
+                open_fds = None
+
+        record = ResourceSample(
+            timestamp=time.time(),
+            rss_mb=round(rss_mb, 2),
+            cpu_percent=psutil.cpu_percent(interval=None),
+            process_cpu_percent=process_cpu,
+            cpu_seconds=round(cpu_times.user + cpu_times.system, 3),
+            threads=threads,
+            open_fds=open_fds,
+            gc_counts=gc.get_count(),
+            gc_collections=self._gc_collections,
+            gc_pause_ms=round(self._gc_pause_ms, 3)
+        )
+        with self._lock:
+            self.samples.append(record)
+        return record
+
+    def latest(self) -> ResourceSample:
+        """Última muestra (O(1)); si aún no hay ninguna, la toma en el momento"""
+        with self._lock:
+            if self.samples:
+                return self.samples[-1]
+        return self.sample()
+
+    def since(self, timestamp: float) -> Optional[ResourceSample]:
+        """Muestra más reciente tomada hasta timestamp (referencia para calcular deltas)"""
+        with self._lock:
+            for record in reversed(self.samples):
+                if record.timestamp <= timestamp:
+                    return record
+        return None
+
+    def delta(self, start: ResourceSample, end: Optional[ResourceSample] = None) -> Dict[str, Any]:
+        """Diferencias entre dos muestras: CPU del proceso, RSS, colecciones y pausas del GC"""
+        end = end or self.latest()
+        elapsed = max(end.timestamp - start.timestamp, 1e-9)
+        cpu_seconds = end.cpu_seconds - start.cpu_seconds
+        return {
+            "elapsed_seconds": round(elapsed, 3),
+            "cpu_seconds": round(cpu_seconds, 3),
+            "process_cpu_percent": round(cpu_seconds / elapsed * 100, 2),
+            "rss_delta_mb": round(end.rss_mb - start.rss_mb, 2),
+            "gc_collections": end.gc_collections - start.gc_collections,
+            "gc_pause_ms": round(end.gc_pause_ms - start.gc_pause_ms, 3)
+        }
+
+    def history(self, seconds: Optional[float] = None) -> List[ResourceSample]:
+        """Muestras de los últimos seconds segundos (None = todo el buffer)"""
+        with self._lock:
+            samples = list(self.samples)
+        if seconds is None:
+            return samples
+        cutoff = time.time() - seconds
+        return [record for record in samples if record.timestamp >= cutoff]
+
+    def summary(self, seconds: Optional[float] = None) -> Dict[str, Any]:
+        """Última muestra más promedios y máximos de la ventana"""
+        samples = self.history(seconds)
+        if not samples:
+            return {}
+        rss = [record.rss_mb for record in samples]
+        cpu = [record.process_cpu_percent for record in samples]
+        return {
+            "latest": samples[-1].to_dict(),
+            "samples": len(samples),
+            "rss_mb": {"avg": round(sum(rss) / len(rss), 2), "max": max(rss)},
+            "process_cpu_percent": {"avg": round(sum(cpu) / len(cpu), 2), "max": max(cpu)},
+            "max_threads": max(record.threads for record in samples),
+            "gc_pause_ms": round(samples[-1].gc_pause_ms - samples[0].gc_pause_ms, 3)
+        }
+
+    # ============= SEGUNDO PLANO =============
+
+    @property
+    def running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self):
+        if self.running:
+            return
+        self._stop.clear()
+
+        def loop():
+            while not self._stop.is_set():
+                try:
+                    self.sample()
+                except Exception as e:
+                    print(f"⚠️ Error muestreando recursos: {e}")
+                self._stop.wait(self.interval)
+
+        self._thread = threading.Thread(target=loop, name="resource-sampler", daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout: Optional[float] = None):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=timeout)
+            self._thread = None
+
+
+_sampler: Optional[ResourceSampler] = None
+_sampler_lock = threading.Lock()
+
+
+def get_resource_sampler() -> ResourceSampler:
+    """
+    Sampler compartido del proceso (arrancado)
+    El intervalo se configura con la variable de entorno RESOURCE_SAMPLE_INTERVAL
+    """
+    global _sampler
+    with _sampler_lock:
+        if _sampler is None:
+            _sampler = ResourceSampler(interval=float(os.getenv("RESOURCE_SAMPLE_INTERVAL", "1.0")))
+        if not _sampler.running:
+            _sampler.start()
+        return _sampler
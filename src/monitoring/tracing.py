@@ -0,0 +1,365 @@
+"""
+Trazas por etapa del pipeline de consultas
+Spans como context managers con ids padre/hijo y tiempos de reloj monotónico; cada traza
+terminada se exporta como una línea OTLP/JSON (ExportTraceServiceRequest) a un archivo local.
+"""
+
+import contextvars
+import functools
+import json
+import os
+import secrets
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+# Span activo del contexto (se propaga en asyncio; a hilos nuevos con contextvars.copy_context)
+_current_span: contextvars.ContextVar = contextvars.ContextVar("current_span", default=None)
+
+# Códigos de estado OTLP
+STATUS_UNSET = 0
+STATUS_OK = 1
+STATUS_ERROR = 2
+
+SPAN_KIND_INTERNAL = 1
+
+SERVICE_NAME = "pasteleria-1000-sabores"
+
+
+class Span:
+    """Una etapa medida; el inicio se ancla al reloj de pared y la duración sale de perf_counter_ns"""
+
+    __slots__ = ("tracer", "trace_id", "span_id", "parent_id", "name", "attributes",
+                 "start_unix_ns", "end_unix_ns", "_start_perf_ns", "status", "status_message")
+
+    def __init__(self, tracer: "Tracer", name: str, trace_id: str, parent_id: Optional[str] = None,
+                 attributes: Optional[Dict[str, Any]] = None):
+        self.tracer = tracer
+        self.trace_id = trace_id
+        self.span_id = secrets.token_hex(8)
+        self.parent_id = parent_id
+        self.name = name
+        self.attributes = dict(attributes or {})
+        self.start_unix_ns = time.time_ns()
+        self._start_perf_ns = time.perf_counter_ns()
+        self.end_unix_ns: Optional[int] = None
+        self.status = STATUS_UNSET
+        self.status_message = ""
+
+    @property
+    def duration_ms(self) -> Optional[float]:
+        if self.end_unix_ns is None:
+            return None
+        return (self.end_unix_ns - self.start_unix_ns) / 1e6
+
+    def set_attribute(self, key: str, value: Any):
+        self.attributes[key] = value
+
+    def set_error(self, error: Any):
+        self.status = STATUS_ERROR
+        self.status_message = str(error)
+
+    def end(self):
+        if self.end_unix_ns is not None:
+            return
+        self.end_unix_ns = self.start_unix_ns + (time.perf_counter_ns() - self._start_perf_ns)
+        if self.status == STATUS_UNSET:
+            self.status = STATUS_OK
+        self.tracer._on_end(self)
+
+    def to_otlp(self) -> Dict[str, Any]:
+        span = {
+            "traceId": self.trace_id,
+            "spanId": self.span_id,
+            "name": self.name,
+            "kind": SPAN_KIND_INTERNAL,
+            "startTimeUnixNano": str(self.start_unix_ns),
+            "endTimeUnixNano": str(self.end_unix_ns or self.start_unix_ns),
+            "attributes": [_otlp_attribute(k, v) for k, v in self.attributes.items()],
+            "status": {"code": self.status}
+        }
+        if self.parent_id:
+            span["parentSpanId"] = self.parent_id
+        if self.status_message:
+            span["status"]["message"] = self.status_message
+        return span
+
+
+class _NoopSpan:
+    """Span que no registra nada (fuera de una traza activa)"""
+
+    span_id = None
+    trace_id = None
+
+    def set_attribute(self, key: str, value: Any):
+        pass
+
+    def set_error(self, error: Any):
+        pass
+
+    def end(self):
+        pass
+
+
+NOOP_SPAN = _NoopSpan()
+
+
+class OTLPJsonFileExporter:
+    """Agrega cada lote de spans como una línea OTLP/JSON (formato del file exporter de OpenTelemetry)"""
+
+    def __init__(self, path: str = "./logs/traces.jsonl"):
+        self.path = path
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._lock = threading.Lock()
+
+    def export(self, spans: List[Span]):
+        request = {
+            "resourceSpans": [{
+                "resource": {"attributes": [_otlp_attribute("service.name", SERVICE_NAME)]},
+                "scopeSpans": [{
+                    "scope": {"name": "src.monitoring.tracing"},
+                    "spans": [span.to_otlp() for span in spans]
+                }]
+            }]
+        }
+        line = json.dumps(request, ensure_ascii=False, default=str) + "\n"
+        with self._lock:
+            with open(self.path, "a", encoding="utf-8") as f:
+                f.write(line)
+
+
+class Tracer:
+    """
+    Crea spans y exporta cada traza cuando termina su span raíz
+    Los spans que terminan después que la raíz (trabajo en segundo plano) se exportan sueltos
+    """
+
+    def __init__(self, exporter: Optional[OTLPJsonFileExporter] = None, enabled: bool = True,
+                 keep_recent: int = 50):
+        """
+        Args:
+            exporter: Destino de las trazas terminadas (None = solo en memoria)
+            enabled: Si False, trace() y span() no registran nada
+            keep_recent: Trazas terminadas que se conservan en memoria (recent_traces)
+        """
+        self.exporter = exporter
+        self.enabled = enabled
+        self._pending: Dict[str, List[Span]] = {}
+        self._roots: Dict[str, str] = {}
+        self._lock = threading.Lock()
+        self.recent_traces: deque = deque(maxlen=keep_recent)
+
+    # ============= CREACIÓN DE SPANS =============
+
+    def start_span(self, name: str, parent: Optional[Span] = None, **attributes) -> Span:
+        """Span sin activarlo en el contexto (para callbacks que cierran en otro hilo)"""
+        if parent is None or parent is NOOP_SPAN:
+            span = Span(self, name, secrets.token_hex(16), attributes=attributes)
+            with self._lock:
+                self._pending[span.trace_id] = []
+                self._roots[span.trace_id] = span.span_id
+            return span
+        return Span(self, name, parent.trace_id, parent.span_id, attributes)
+
+    def start_detached(self, name: str, **attributes) -> Tuple[Any, contextvars.Context]:
+        """
+        Span sin activarlo en el contexto actual + copia del contexto donde sí está activo
+        Para generadores: activar el span en el generador lo dejaría activo entre yields (y el reset
+        podría ocurrir en otro contexto); el trabajo se corre con context.run y el span se cierra con end()
+        """
+        context = contextvars.copy_context()
+        if not self.enabled:
+            return NOOP_SPAN, context
+        span = self.start_span(name, _current_span.get(), **attributes)
+        context.run(_current_span.set, span)
+        return span, context
+
+    @contextmanager
+    def _activate(self, span: Span) -> Iterator[Span]:
+        token = _current_span.set(span)
+        try:
+            yield span
+        except BaseException as e:
+            span.set_error(f"{type(e).__name__}: {e}")
+            raise
+        finally:
+            _current_span.reset(token)
+            span.end()
+
+    @contextmanager
+    def trace(self, name: str, **attributes) -> Iterator[Span]:
+        """Span raíz de una traza nueva (o hijo, si ya hay una traza activa)"""
+        if not self.enabled:
+            yield NOOP_SPAN
+            return
+        with self._activate(self.start_span(name, _current_span.get(), **attributes)) as span:
+            yield span
+
+    @contextmanager
+    def span(self, name: str, **attributes) -> Iterator[Span]:
+        """Span hijo del activo; fuera de una traza no registra nada"""
+        parent = _current_span.get()
+        if not self.enabled or parent is None:
+            yield NOOP_SPAN
+            return
+        with self._activate(self.start_span(name, parent, **attributes)) as span:
+            yield span
+
+    # ============= EXPORTACIÓN =============
+
+    def _on_end(self, span: Span):
+        with self._lock:
+            spans = self._pending.get(span.trace_id)
+            if spans is None:
+                finished = [span]
+            else:
+                spans.append(span)
+                finished = None
+                if self._roots.get(span.trace_id) == span.span_id:
+                    finished = self._pending.pop(span.trace_id)
+                    del self._roots[span.trace_id]
+                    self.recent_traces.append(finished)
+        if finished and self.exporter is not None:
+            try:
+                self.exporter.export(finished)
+            except Exception as e:
+                print(f"⚠️ No se pudo exportar la traza: {e}")
+
+
+def current_span():
+    """Span activo del contexto (NOOP_SPAN si no hay traza)"""
+    return _current_span.get() or NOOP_SPAN
+
+
+_tracer: Optional[Tracer] = None
+_tracer_lock = threading.Lock()
+
+
+def get_tracer() -> Tracer:
+    """
+    Tracer compartido del proceso
+    Se configura con TRACING_ENABLED (default true) y TRACES_PATH (default ./logs/traces.jsonl)
+    """
+    global _tracer
+    with _tracer_lock:
+        if _tracer is None:
+            enabled = os.getenv("TRACING_ENABLED", "true").lower() == "true"
+            exporter = OTLPJsonFileExporter(os.getenv("TRACES_PATH", "./logs/traces.jsonl")) if enabled else None
+            _tracer = Tracer(exporter, enabled=enabled)
+        return _tracer
+
+
+def span(name: str, **attributes):
+    """Span hijo del activo con el tracer compartido"""
+    return get_tracer().span(name, **attributes)
+
+
+def traced(name: str):
+    """Decorador: ejecuta el método dentro de un span hijo (no-op fuera de una traza)"""
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with span(name):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+# ============= LECTURA (DASHBOARD) =============
+
+def load_traces(path: str = "./logs/traces.jsonl", limit: int = 20) -> List[Dict[str, Any]]:
+    """
+    Últimas trazas del archivo OTLP/JSON, más recientes primero
+    Cada traza: {"trace_id", "name", "start_ns", "duration_ms", "spans": [...]} con spans
+    ordenados por inicio y con su profundidad en el árbol
+    """
+    if not os.path.exists(path):
+        return []
+    with open(path, "r", encoding="utf-8") as f:
+        lines = deque(f, maxlen=limit * 4)
+
+    by_trace: Dict[str, List[Dict[str, Any]]] = {}
+    for line in lines:
+        try:
+            request = json.loads(line)
+        except ValueError:
+            continue
+        for resource in request.get("resourceSpans", []):
+            for scope in resource.get("scopeSpans", []):
+                for raw in scope.get("spans", []):
+                    by_trace.setdefault(raw["traceId"], []).append(_span_from_otlp(raw))
+
+    traces = []
+    for trace_id, spans in by_trace.items():
+        ids = {s["span_id"] for s in spans}
+        roots = [s for s in spans if not s["parent_id"] or s["parent_id"] not in ids]
+        if not roots:
+            continue
+        _assign_depth(spans)
+        spans.sort(key=lambda s: (s["start_ns"], s["depth"]))
+        start = min(s["start_ns"] for s in spans)
+        end = max(s["end_ns"] for s in spans)
+        traces.append({
+            "trace_id": trace_id,
+            "name": roots[0]["name"],
+            "start_ns": start,
+            "duration_ms": round((end - start) / 1e6, 3),
+            "spans": spans
+        })
+    traces.sort(key=lambda t: t["start_ns"], reverse=True)
+    return traces[:limit]
+
+
+def _span_from_otlp(raw: Dict[str, Any]) -> Dict[str, Any]:
+    start, end = int(raw["startTimeUnixNano"]), int(raw["endTimeUnixNano"])
+    return {
+        "span_id": raw["spanId"],
+        "parent_id": raw.get("parentSpanId"),
+        "name": raw["name"],
+        "start_ns": start,
+        "end_ns": end,
+        "duration_ms": round((end - start) / 1e6, 3),
+        "status": raw.get("status", {}).get("code", STATUS_UNSET),
+        "attributes": {a["key"]: _otlp_value(a["value"]) for a in raw.get("attributes", [])}
+    }
+
+
+def _assign_depth(spans: List[Dict[str, Any]]):
+    parents = {s["span_id"]: s["parent_id"] for s in spans}
+    for s in spans:
+        depth, parent = 0, s["parent_id"]
+        while parent in parents and depth < 64:
+            depth += 1
+            parent = parents[parent]
+        s["depth"] = depth
+
+
+def _otlp_attribute(key: str, value: Any) -> Dict[str, Any]:
+    return {"key": key, "value": _otlp_any(value)}
+
+
+def _otlp_any(value: Any) -> Dict[str, Any]:
+    if isinstance(value, bool):
+        return {"boolValue": value}
+    if isinstance(value, int):
+        return {"intValue": str(value)}
+    if isinstance(value, float):
+        return {"doubleValue": value}
+    if isinstance(value, (list, tuple)):
+        return {"arrayValue": {"values": [_otlp_any(v) for v in value]}}
+    return {"stringValue": str(value)}
+
+
+def _otlp_value(value: Dict[str, Any]) -> Any:
+    if "intValue" in value:
+        return int(value["intValue"])
+    if "arrayValue" in value:
+        return [_otlp_value(v) for v in value["arrayValue"].get("values", [])]
+    for key in ("stringValue", "boolValue", "doubleValue"):
+        if key in value:
+            return value[key]
+    return None
@@ -0,0 +1,159 @@
+"""
+Motor de búsqueda de productos basado en índice invertido
+Tokenización en español sin acentos, stemming liviano y ranking BM25
+"""
+
+import bisect
+import heapq
+import math
+from collections import defaultdict
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from .text_utils import normalizar_texto, tokenizar
+
+
+class ProductSearchIndex:
+    """
+    Índice invertido sobre el catálogo de productos
+    Se construye una vez; cada consulta solo recorre las posting lists de sus términos
+    """
+
+    # Peso de cada campo (se repiten los tokens del campo para reforzarlo en BM25)
+    PESOS_CAMPOS = {
+        "nombre": 3,
+        "categoria": 2,
+        "ingredientes": 2,
+        "descripcion": 1
+    }
+
+    def __init__(self, productos: Iterable[Dict[str, Any]], k1: float = 1.5, b: float = 0.75):
+        """
+        Construye el índice
+
+        Args:
+            productos: Diccionarios de producto (nombre, descripcion, categoria, ingredientes, precio)
+            k1: Saturación de frecuencia de término en BM25
+            b: Normalización por longitud de documento en BM25
+        """
+        self.k1 = k1
+        self.b = b
+        self.productos: List[Dict[str, Any]] = list(productos)
+
+        # término -> {doc_id: frecuencia ponderada}
+        self.postings: Dict[str, Dict[int, int]] = defaultdict(dict)
+        self.longitudes: List[int] = []
+
+        # categoría normalizada -> doc_ids (filtro por categoría)
+        self.por_categoria: Dict[str, List[int]] = defaultdict(list)
+
+        for doc_id, producto in enumerate(self.productos):
+            tokens = []
+            for campo, peso in self.PESOS_CAMPOS.items():
+                valor = producto.get(campo, "")
+                if isinstance(valor, list):
+                    valor = " ".join(valor)
+                tokens.extend(tokenizar(str(valor)) * peso)
+
+            frecuencias: Dict[str, int] = defaultdict(int)
+            for token in tokens:
+                frecuencias[token] += 1
+            for token, tf in frecuencias.items():
+                self.postings[token][doc_id] = tf
+
+            self.longitudes.append(len(tokens))
+            self.por_categoria[normalizar_texto(producto.get("categoria", ""))].append(doc_id)
+
+        n_docs = len(self.productos)
+        self.longitud_promedio = (sum(self.longitudes) / n_docs) if n_docs else 0.0
+        self.idf = {
+            termino: math.log(1 + (n_docs - len(docs) + 0.5) / (len(docs) + 0.5))
+            for termino, docs in self.postings.items()
+        }
+
+        # El aporte BM25 de cada (término, documento) no depende de la consulta:
+        # se precalcula para que buscar() solo sume pesos
+        self.impactos: Dict[str, Dict[int, float]] = {}
+        for termino, docs in self.postings.items():
+            idf = self.idf[termino]
+            self.impactos[termino] = {
+                doc_id: idf * tf * (k1 + 1) / (tf + k1 * (1 - b + b * self.longitudes[doc_id] / self.longitud_promedio))
+                for doc_id, tf in docs.items()
+            }
+
+        # Rango de cada documento en el orden por precio: doc cumple precio <= max
+        # si su rango es menor al punto de corte obtenido por bisect
+        orden_precio = sorted(range(n_docs), key=lambda i: self.productos[i].get("precio", 0))
+        self._precios_ordenados = [self.productos[i].get("precio", 0) for i in orden_precio]
+        self._rango_precio = [0] * n_docs
+        for rango, doc_id in enumerate(orden_precio):
+            self._rango_precio[doc_id] = rango
+
+        self._cache_categorias: Dict[str, frozenset] = {}
+
+    def __len__(self) -> int:
+        return len(self.productos)
+
+    def _docs_categoria(self, category: str) -> frozenset:
+        """Posting list del filtro de categoría (coincidencia parcial en ambos sentidos)"""
+        filtro = normalizar_texto(category)
+        if filtro not in self._cache_categorias:
+            docs = set()
+            for categoria, doc_ids in self.por_categoria.items():
+                if filtro in categoria or categoria in filtro:
+                    docs.update(doc_ids)
+            self._cache_categorias[filtro] = frozenset(docs)
+        return self._cache_categorias[filtro]
+
+    def buscar(
+        self,
+        query: str,
+        category: Optional[str] = None,
+        max_price: Optional[float] = None,
+        top_k: int = 10
+    ) -> List[Tuple[Dict[str, Any], float]]:
+        """
+        Busca productos ordenados por relevancia BM25
+
+        Args:
+            query: Texto de búsqueda
+            category: Filtro de categoría (opcional)
+            max_price: Precio máximo (opcional)
+            top_k: Cantidad máxima de resultados
+
+        Returns:
+            Lista de tuplas (producto, score) de mayor a menor score
+        """
+        terminos = [t for t in dict.fromkeys(tokenizar(query)) if t in self.postings]
+
+        # Acumular scores solo sobre las posting lists de los términos de la consulta,
+        # partiendo por la más larga para que las siguientes actualicen un dict existente
+        terminos.sort(key=lambda t: len(self.impactos[t]), reverse=True)
+        scores: Dict[int, float] = {}
+        for termino in terminos:
+            if not scores:
+                scores = dict(self.impactos[termino])
+                continue
+            for doc_id, impacto in self.impactos[termino].items():
+                scores[doc_id] = scores.get(doc_id, 0.0) + impacto
+
+        # Consulta con términos pero ninguno indexado: no hay coincidencias (aunque haya filtros)
+        if not terminos and query.split():
+            return []
+
+        # Consulta vacía con filtros: devolver lo que cumple los filtros
+        if not terminos and (category or max_price):
+            base = self._docs_categoria(category) if category else range(len(self.productos))
+            scores = {doc_id: 0.0 for doc_id in base}
+
+        # Intersección con la posting list de categoría
+        if category:
+            docs_categoria = self._docs_categoria(category)
+            scores = {d: s for d, s in scores.items() if d in docs_categoria}
+
+        # Intersección con el rango de precios [0, max_price]
+        if max_price:
+            corte = bisect.bisect_right(self._precios_ordenados, max_price)
+            scores = {d: s for d, s in scores.items() if self._rango_precio[d] < corte}
+
+        mejores = heapq.nlargest(top_k, scores.items(), key=lambda item: (item[1], -item[0]))
+        return [(self.productos[doc_id], round(score, 4)) for doc_id, score in mejores]
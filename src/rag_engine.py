@@ -1,12 +1,53 @@
 import numpy as np
 import random
 import re
+from collections import Counter
 from datetime import datetime
+from scipy import sparse
+
+from .text_utils import normalizar_texto, tokenizar
 
 class PasteleriaRAGEngine:
-    def __init__(self):
+    MODOS_BUSQUEDA = ("lexico", "denso", "hibrido")
+    
+    def __init__(
+        self,
+        k1=1.5,
+        b=0.75,
+        modo_busqueda="lexico",
+        tipo_indice="flat",
+        directorio_vectores="./data/vector_index",
+        rrf_k=60
+    ):
+        """
+        Args:
+            k1, b: Parámetros BM25 del componente léxico
+            modo_busqueda: "lexico" (BM25), "denso" (embeddings + FAISS) o "hibrido" (fusión RRF)
+            tipo_indice: "flat" (exacto) o "ivf" para el índice denso
+            directorio_vectores: Donde se persisten vectores e índices densos
+            rrf_k: Constante de Reciprocal Rank Fusion para el modo híbrido
+        """
+        if modo_busqueda not in self.MODOS_BUSQUEDA:
+            raise ValueError(f"Modo de búsqueda no soportado: {modo_busqueda}")
+        
         self.documents = []
         self.document_embeddings = None
+        
+        # Configuración de recuperación densa / híbrida
+        self.modo_busqueda = modo_busqueda
+        self.tipo_indice = tipo_indice
+        self.directorio_vectores = directorio_vectores
+        self.rrf_k = rrf_k
+        self.indice_denso = None
+        
+        # Parámetros BM25 y estructuras precalculadas en cargar_documentos
+        self.k1 = k1
+        self.b = b
+        self.vocabulario = {}
+        self.matriz_terminos = None
+        self._cota_terminos = None
+        self._bonus_longitud = None
+        self._mascaras_palabras_clave = {}
         print("🔄 Iniciando sistema RAG simulado - Optimizado para evaluación")
     
     def cargar_documentos(self, documentos):
@@ -16,6 +57,26 @@ class PasteleriaRAGEngine:
         
         # Crear embeddings simulados para búsqueda más inteligente
         self.crear_embeddings_simulados()
+        
+        # Tokenizar una sola vez y construir la matriz término-documento
+        self.construir_matriz_terminos()
+        
+        # Embeddings reales solo si se usa recuperación densa o híbrida
+        if self.modo_busqueda != "lexico":
+            self.crear_embeddings()
+    
+    def crear_embeddings(self):
+        """Embebe los documentos una vez (o recarga los vectores persistidos) y arma el índice FAISS"""
+        from .dense_index import DenseVectorIndex
+        
+        self.indice_denso = DenseVectorIndex(
+            cache_dir=self.directorio_vectores,
+            index_type=self.tipo_indice
+        ).build(self.documents)
+        self.document_embeddings = self.indice_denso.vectors
+        
+        origen = "recargados desde disco" if self.indice_denso.loaded_from_disk else "calculados"
+        print(f"✅ Embeddings de {len(self.documents)} documentos {origen} (índice {self.tipo_indice})")
     
     def crear_embeddings_simulados(self):
         """Crea representaciones simuladas de los documentos para búsqueda mejorada"""
@@ -29,21 +90,172 @@ class PasteleriaRAGEngine:
             'personalizacion': ['personalizar', 'mensaje', 'decoración', 'diseño']
         }
     
-    def buscar_documentos_relevantes(self, query, top_k=3):
-        """Búsqueda inteligente simulada usando palabras clave y similitud semántica básica"""
-        query_lower = query.lower()
-        scored_docs = []
+    def construir_matriz_terminos(self):
+        """
+        Pre-tokeniza los documentos y construye una matriz dispersa documento x término
+        con pesos BM25, más los vectores de bonus por palabras clave y longitud
+        """
+        tokens_docs = [tokenizar(doc) for doc in self.documents]
+        n_docs = len(self.documents)
+        
+        self.vocabulario = {}
+        filas, columnas, frecuencias = [], [], []
+        for doc_id, tokens in enumerate(tokens_docs):
+            for termino, tf in Counter(tokens).items():
+                columna = self.vocabulario.setdefault(termino, len(self.vocabulario))
+                filas.append(doc_id)
+                columnas.append(columna)
+                frecuencias.append(tf)
+        
+        filas = np.asarray(filas, dtype=np.int64)
+        columnas = np.asarray(columnas, dtype=np.int64)
+        tf = np.asarray(frecuencias, dtype=np.float32)
+        
+        longitudes = np.asarray([len(t) for t in tokens_docs], dtype=np.float32)
+        promedio = longitudes.mean() if n_docs and longitudes.mean() > 0 else 1.0
+        df = np.bincount(columnas, minlength=len(self.vocabulario))
+        idf = np.log(1 + (n_docs - df + 0.5) / (df + 0.5)).astype(np.float32)
+        
+        norma = self.k1 * (1 - self.b + self.b * longitudes / promedio)
+        pesos = idf[columnas] * tf * (self.k1 + 1) / (tf + norma[filas])
+        
+        # CSC: el producto con una consulta solo toca las columnas de sus términos
+        self.matriz_terminos = sparse.csc_matrix(
+            (pesos, (filas, columnas)),
+            shape=(n_docs, len(self.vocabulario)),
+            dtype=np.float32
+        )
+        
+        # Cota superior del aporte BM25 de cada término (tf -> infinito), para normalizar a [0, 1]
+        self._cota_terminos = idf * (self.k1 + 1)
         
-        for i, doc in enumerate(self.documents):
-            score = self.calcular_similitud_semantica(query_lower, doc.lower())
-            scored_docs.append((doc, score, i))
+        # Bonus por longitud del documento (documentos más largos pueden tener más info)
+        self._bonus_longitud = np.minimum(
+            np.asarray([len(doc) for doc in self.documents], dtype=np.float32) / 1000, 0.5
+        )
+        
+        # Máscara de documentos que contienen cada palabra clave semántica
+        textos_normalizados = [normalizar_texto(doc) for doc in self.documents]
+        self._mascaras_palabras_clave = {
+            palabra: np.fromiter(
+                (normalizar_texto(palabra) in texto for texto in textos_normalizados),
+                dtype=bool,
+                count=n_docs
+            )
+            for palabras_clave in self.categorias_palabras_clave.values()
+            for palabra in palabras_clave
+        }
+    
+    def _matriz_consultas(self, queries):
+        """Matriz dispersa término x consulta con peso normalizado por la cota de cada consulta"""
+        filas, columnas, valores = [], [], []
+        for q_id, query in enumerate(queries):
+            terminos = [self.vocabulario[t] for t in dict.fromkeys(tokenizar(query)) if t in self.vocabulario]
+            if not terminos:
+                continue
+            peso = 1.0 / float(self._cota_terminos[terminos].sum())
+            filas.extend(terminos)
+            columnas.extend([q_id] * len(terminos))
+            valores.extend([peso] * len(terminos))
+        
+        return sparse.csc_matrix(
+            (np.asarray(valores, dtype=np.float32), (filas, columnas)),
+            shape=(len(self.vocabulario), len(queries)),
+            dtype=np.float32
+        )
+    
+    def _bonus_semantico(self, query):
+        """Bonus de 0.5 por cada categoría semántica cuya palabra clave aparece en la consulta y el documento"""
+        query_normalizada = normalizar_texto(query)
+        bonus = np.zeros(len(self.documents), dtype=np.float32)
+        for palabras_clave in self.categorias_palabras_clave.values():
+            presentes = [p for p in palabras_clave if normalizar_texto(p) in query_normalizada]
+            if presentes:
+                bonus += 0.5 * np.logical_or.reduce([self._mascaras_palabras_clave[p] for p in presentes])
+        return bonus
+    
+    def calcular_scores(self, queries):
+        """
+        Calcula scores de todos los documentos para un lote de consultas
         
-        # Ordenar por score y tomar top_k
-        scored_docs.sort(key=lambda x: x[1], reverse=True)
-        documentos_relevantes = [doc for doc, score, idx in scored_docs[:top_k]]
-        scores = [score for doc, score, idx in scored_docs[:top_k]]
+        Returns:
+            Matriz numpy (n_documentos x n_consultas)
+        """
+        if self.matriz_terminos is None:
+            self.construir_matriz_terminos()
+        
+        # Componente léxico: un único producto matriz dispersa x matriz de consultas
+        lexico = (self.matriz_terminos @ self._matriz_consultas(queries)).toarray()
         
-        return documentos_relevantes, scores
+        bonus = np.stack([self._bonus_semantico(q) for q in queries], axis=1)
+        return lexico + bonus + self._bonus_longitud[:, None]
+    
+    def _top_k(self, scores, top_k):
+        """Índices de los top_k scores, ordenados de mayor a menor (empates por posición)"""
+        k = min(top_k, len(scores))
+        if k <= 0:
+            return np.asarray([], dtype=np.int64)
+        candidatos = np.argpartition(-scores, k - 1)[:k]
+        return candidatos[np.lexsort((candidatos, -scores[candidatos]))]
+    
+    def _buscar_lexico_batch(self, queries, top_k):
+        """Top-k léxico por consulta: lista de (índices, scores)"""
+        matriz_scores = self.calcular_scores(list(queries))
+        resultados = []
+        for q_id in range(matriz_scores.shape[1]):
+            scores = matriz_scores[:, q_id]
+            indices = self._top_k(scores, top_k)
+            resultados.append((
+                [int(i) for i in indices],
+                [float(min(scores[i], 1.0)) for i in indices]  # Normalizar a máximo 1.0
+            ))
+        return resultados
+    
+    def _fusionar_rrf(self, lexicos, densos, top_k):
+        """Reciprocal Rank Fusion de rankings léxico y denso, score normalizado a [0, 1]"""
+        fusionados = []
+        maximo = 2.0 / (self.rrf_k + 1)
+        for (idx_lex, _), (idx_den, _) in zip(lexicos, densos):
+            scores = {}
+            for ranking in (idx_lex, idx_den):
+                for posicion, doc_id in enumerate(ranking, 1):
+                    scores[doc_id] = scores.get(doc_id, 0.0) + 1.0 / (self.rrf_k + posicion)
+            mejores = sorted(scores.items(), key=lambda x: (-x[1], x[0]))[:top_k]
+            fusionados.append(([d for d, _ in mejores], [s / maximo for _, s in mejores]))
+        return fusionados
+    
+    def buscar_documentos_relevantes_batch(self, queries, top_k=3):
+        """Búsqueda vectorizada de varias consultas a la vez"""
+        if not self.documents or not queries:
+            return [([], []) for _ in queries]
+        
+        queries = list(queries)
+        if self.modo_busqueda != "lexico" and self.indice_denso is None:
+            self.crear_embeddings()
+        
+        if self.modo_busqueda == "lexico":
+            resultados = self._buscar_lexico_batch(queries, top_k)
+        elif self.modo_busqueda == "denso":
+            resultados = self.indice_denso.search(queries, top_k)
+        else:
+            # Se amplía la profundidad de cada ranking antes de fusionar
+            profundidad = max(top_k * 5, 20)
+            resultados = self._fusionar_rrf(
+                self._buscar_lexico_batch(queries, profundidad),
+                self.indice_denso.search(queries, profundidad),
+                top_k
+            )
+        
+        return [
+            ([self.documents[i] for i in indices], scores)
+            for indices, scores in resultados
+        ]
+    
+    def buscar_documentos_relevantes(self, query, top_k=3):
+        """Búsqueda inteligente simulada usando BM25 vectorizado y palabras clave semánticas"""
+        if not self.documents:
+            return [], []
+        return self.buscar_documentos_relevantes_batch([query], top_k)[0]
     
     def calcular_similitud_semantica(self, query, documento):
         """Calcula similitud semántica básica usando palabras clave categorizadas"""
@@ -247,6 +247,21 @@ class PrivacyProtector:
         
         return cleaned
     
+    def cleanup_long_term_memory(self, long_term_memory, archive_path: str = None,
+                                 max_batches: int = None) -> Dict[str, Any]:
+        """
+        Aplica la política de retención a la memoria de largo plazo (Chroma)
+        
+        Args:
+            long_term_memory: Instancia de LongTermMemory
+            archive_path: JSON lines donde archivar lo eliminado (None = solo eliminar)
+            max_batches: Tope de lotes por ejecución (None = hasta terminar)
+        """
+        from ..memory.retention import RetentionPolicy
+        
+        policy = RetentionPolicy(retention_days=self.data_retention_days, archive_path=archive_path)
+        return long_term_memory.run_retention(policy, max_batches=max_batches)
+    
     def log_data_access(self, user_id: str, data_type: str, action: str):
         """Registra acceso a datos para auditoría"""
         self.logged_data_access.append({
@@ -0,0 +1,54 @@
+"""
+Utilidades de procesamiento de texto en español
+Normalización sin acentos, tokenización y stemming liviano compartidos por los buscadores
+"""
+
+import re
+import unicodedata
+from functools import lru_cache
+from typing import List
+
+_TOKEN_RE = re.compile(r"[a-z0-9]+")
+
+STOPWORDS_ES = frozenset({
+    "a", "al", "algo", "algun", "alguna", "alguno", "con", "cual", "cuales", "de", "del",
+    "el", "en", "es", "esta", "este", "esto", "hay", "la", "las", "le", "lo", "los", "me",
+    "mi", "mis", "muestrame", "o", "para", "por", "que", "quiero", "se", "su", "sus", "te",
+    "tiene", "tienen", "tu", "un", "una", "uno", "unos", "unas", "y", "ya", "yo"
+})
+
+
+def normalizar_texto(texto: str) -> str:
+    """Pasa a minúsculas y elimina acentos/diacríticos ("Azúcar" -> "azucar")"""
+    descompuesto = unicodedata.normalize("NFKD", texto.lower())
+    return "".join(c for c in descompuesto if not unicodedata.combining(c))
+
+
+@lru_cache(maxsize=8192)
+def stem_es(palabra: str) -> str:
+    """
+    Stemming liviano para español
+    Unifica plural y género: "tortas"/"torta" -> "tort", "vegana"/"vegano" -> "vegan"
+    """
+    if len(palabra) <= 3:
+        return palabra
+
+    # Plural: "tortas" -> "torta", "pasteles" -> "pastele"
+    if palabra.endswith("s"):
+        palabra = palabra[:-1]
+
+    # Vocal final (género y plurales en -es): "vegana"/"vegano" -> "vegan", "pastele" -> "pastel"
+    if len(palabra) > 3 and palabra[-1] in "aoe":
+        palabra = palabra[:-1]
+
+    return palabra
+
+
+def tokenizar(texto: str, stemming: bool = True, quitar_stopwords: bool = True) -> List[str]:
+    """Tokeniza texto en español sin acentos, con stemming liviano opcional"""
+    tokens = _TOKEN_RE.findall(normalizar_texto(texto))
+    if quitar_stopwords:
+        tokens = [t for t in tokens if t not in STOPWORDS_ES]
+    if stemming:
+        tokens = [stem_es(t) for t in tokens]
+    return tokens
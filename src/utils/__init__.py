@@ -9,9 +9,38 @@ from .logger import (
     create_tracker
 )
 
+from .embedding_cache import (
+    EmbeddingCache,
+    get_embedding_cache
+)
+
+from .embedding_registry import (
+    EmbeddingModelRegistry,
+    SharedEmbeddings,
+    get_embedding_registry,
+    get_shared_embeddings,
+    warm_up_embeddings
+)
+
+from .tokens import (
+    TokenCounter,
+    get_context_window,
+    get_token_counter
+)
+
 __all__ = [
     'AgentLogger',
     'ExecutionTracker',
     'create_logger',
-    'create_tracker'
+    'create_tracker',
+    'EmbeddingCache',
+    'get_embedding_cache',
+    'EmbeddingModelRegistry',
+    'SharedEmbeddings',
+    'get_embedding_registry',
+    'get_shared_embeddings',
+    'warm_up_embeddings',
+    'TokenCounter',
+    'get_context_window',
+    'get_token_counter'
 ]
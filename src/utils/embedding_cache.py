@@ -0,0 +1,189 @@
+"""
+Cache de embeddings por hash de texto normalizado + modelo
+Nivel LRU en memoria y nivel opcional en disco (sqlite) compartido entre procesos
+"""
+
+import hashlib
+import os
+import re
+import sqlite3
+import threading
+from array import array
+from collections import OrderedDict
+from typing import Callable, Dict, List, Optional, Sequence
+
+_WHITESPACE_RE = re.compile(r"\s+")
+
+
+def normalize_text(text: str) -> str:
+    """Normalización usada para la clave: minúsculas y espacios colapsados"""
+    return _WHITESPACE_RE.sub(" ", text.strip().lower())
+
+
+class EmbeddingCache:
+    """
+    Cache de dos niveles para vectores de embeddings
+    - L1: LRU en memoria del proceso
+    - L2: sqlite en disco (opcional), sobrevive reinicios
+    """
+
+    def __init__(self, max_entries: int = 10000, disk_path: Optional[str] = None):
+        """
+        Args:
+            max_entries: Capacidad del LRU en memoria
+            disk_path: Archivo sqlite para el nivel en disco (None = solo memoria)
+        """
+        self.max_entries = max_entries
+        self.disk_path = disk_path
+
+        self._lru: "OrderedDict[str, List[float]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._db = None
+
+        self.stats = {
+            "memory_hits": 0,
+            "disk_hits": 0,
+            "misses": 0,
+            "evictions": 0
+        }
+
+        if disk_path:
+            directory = os.path.dirname(disk_path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            self._db = sqlite3.connect(disk_path, check_same_thread=False)
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS embeddings (key TEXT PRIMARY KEY, vector BLOB NOT NULL)"
+            )
+            self._db.commit()
+
+    @staticmethod
+    def make_key(text: str, model_name: str) -> str:
+        digest = hashlib.sha1(model_name.encode("utf-8"))
+        digest.update(b"\x00")
+        digest.update(normalize_text(text).encode("utf-8"))
+        return digest.hexdigest()
+
+    # ============= NIVELES =============
+
+    def _memory_put(self, key: str, vector: List[float]):
+        self._lru[key] = vector
+        self._lru.move_to_end(key)
+        while len(self._lru) > self.max_entries:
+            self._lru.popitem(last=False)
+            self.stats["evictions"] += 1
+
+    def _disk_get(self, key: str) -> Optional[List[float]]:
+        row = self._db.execute("SELECT vector FROM embeddings WHERE key = ?", (key,)).fetchone()
+        if row is None:
+            return None
+        return array("f", row[0]).tolist()
+
+    def _disk_put_many(self, items: Dict[str, List[float]]):
+        self._db.executemany(
+            "INSERT OR REPLACE INTO embeddings (key, vector) VALUES (?, ?)",
+            [(key, array("f", vector).tobytes()) for key, vector in items.items()]
+        )
+        self._db.commit()
+
+    # ============= API =============
+
+    def get(self, text: str, model_name: str) -> Optional[List[float]]:
+        """Busca un vector en memoria y luego en disco; None si no está"""
+        key = self.make_key(text, model_name)
+        with self._lock:
+            vector = self._lru.get(key)
+            if vector is not None:
+                self._lru.move_to_end(key)
+                self.stats["memory_hits"] += 1
+                return vector
+
+            if self._db is not None:
+                vector = self._disk_get(key)
+                if vector is not None:
+                    self._memory_put(key, vector)
+                    self.stats["disk_hits"] += 1
+                    return vector
+
+            self.stats["misses"] += 1
+            return None
+
+    def put_many(self, texts: Sequence[str], vectors: Sequence[Sequence[float]], model_name: str):
+        items = {self.make_key(t, model_name): list(v) for t, v in zip(texts, vectors)}
+        with self._lock:
+            for key, vector in items.items():
+                self._memory_put(key, vector)
+            if self._db is not None:
+                self._disk_put_many(items)
+
+    def get_or_compute(
+        self,
+        texts: Sequence[str],
+        model_name: str,
+        compute_fn: Callable[[List[str]], Sequence[Sequence[float]]]
+    ) -> List[List[float]]:
+        """
+        Retorna los vectores de texts, calculando en un solo lote solo los que faltan
+
+        Args:
+            texts: Textos a embeber
+            model_name: Modelo (forma parte de la clave)
+            compute_fn: Función que embebe una lista de textos
+        """
+        results: List[Optional[List[float]]] = [self.get(t, model_name) for t in texts]
+
+        # Faltantes únicos por clave normalizada (textos equivalentes se calculan una vez)
+        missing: Dict[str, str] = {}
+        for text, vector in zip(texts, results):
+            if vector is None:
+                missing.setdefault(self.make_key(text, model_name), text)
+
+        if missing:
+            computed = [list(v) for v in compute_fn(list(missing.values()))]
+            self.put_many(list(missing.values()), computed, model_name)
+            by_key = dict(zip(missing.keys(), computed))
+            results = [
+                v if v is not None else by_key[self.make_key(t, model_name)]
+                for t, v in zip(texts, results)
+            ]
+
+        return results
+
+    def clear(self):
+        with self._lock:
+            self._lru.clear()
+            if self._db is not None:
+                self._db.execute("DELETE FROM embeddings")
+                self._db.commit()
+
+    def get_statistics(self) -> Dict[str, float]:
+        """Contadores de hits/misses y tasa de acierto"""
+        with self._lock:
+            stats = dict(self.stats)
+            stats["memory_entries"] = len(self._lru)
+        hits = stats["memory_hits"] + stats["disk_hits"]
+        total = hits + stats["misses"]
+        stats["hits"] = hits
+        stats["hit_rate"] = round(hits / total * 100, 2) if total else 0.0
+        return stats
+
+
+_cache: Optional[EmbeddingCache] = None
+_cache_lock = threading.Lock()
+
+
+def get_embedding_cache() -> EmbeddingCache:
+    """
+    Cache de embeddings del proceso
+    El nivel en disco se activa con la variable de entorno EMBEDDING_CACHE_PATH
+    """
+    global _cache
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                _cache = EmbeddingCache(
+                    max_entries=int(os.getenv("EMBEDDING_CACHE_SIZE", "10000")),
+                    disk_path=os.getenv("EMBEDDING_CACHE_PATH") or None
+                )
+    return _cache
@@ -0,0 +1,189 @@
+"""
+Registro compartido de modelos de embeddings
+Un único modelo por proceso, cargado de forma perezosa y thread-safe, con warm-up opcional
+"""
+
+import threading
+import time
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+
+from langchain.embeddings.base import Embeddings
+
+from .embedding_cache import EmbeddingCache, get_embedding_cache
+
+
+DEFAULT_EMBEDDING_MODEL = "sentence-transformers/paraphrase-multilingual-MiniLM-L12-v2"
+
+
+class EmbeddingModelRegistry:
+    """
+    Mantiene un modelo de embeddings por nombre para todo el proceso
+    N sesiones concurrentes comparten el mismo modelo en memoria
+    """
+
+    def __init__(self):
+        self._models: Dict[str, Any] = {}
+        self._locks: Dict[str, threading.Lock] = {}
+        self._registry_lock = threading.Lock()
+        self._warmup_threads: Dict[str, threading.Thread] = {}
+        self._stats: Dict[str, Dict[str, Any]] = {}
+
+    def _lock_for(self, model_name: str) -> threading.Lock:
+        with self._registry_lock:
+            if model_name not in self._locks:
+                self._locks[model_name] = threading.Lock()
+                self._stats[model_name] = {
+                    "loaded": False,
+                    "load_time_seconds": None,
+                    "loaded_at": None,
+                    "requests": 0,
+                    "cold_requests": 0,
+                    "wait_time_seconds": 0.0
+                }
+            return self._locks[model_name]
+
+    def _load(self, model_name: str):
+        """Instancia el modelo (operación costosa, se ejecuta una sola vez por nombre)"""
+        from langchain.embeddings import HuggingFaceEmbeddings
+
+        return HuggingFaceEmbeddings(
+            model_name=model_name,
+            model_kwargs={'device': 'cpu'},
+            encode_kwargs={'normalize_embeddings': True}
+        )
+
+    def get(self, model_name: str = DEFAULT_EMBEDDING_MODEL):
+        """
+        Retorna el modelo compartido, cargándolo la primera vez
+
+        Args:
+            model_name: Nombre del modelo de HuggingFace
+
+        Returns:
+            Instancia de HuggingFaceEmbeddings compartida
+        """
+        lock = self._lock_for(model_name)
+        stats = self._stats[model_name]
+
+        model = self._models.get(model_name)
+        if model is not None:
+            with self._registry_lock:
+                stats["requests"] += 1
+            return model
+
+        wait_start = time.perf_counter()
+        with lock:
+            model = self._models.get(model_name)
+            if model is None:
+                print(f"🔄 Cargando modelo de embeddings compartido: {model_name}")
+                load_start = time.perf_counter()
+                model = self._load(model_name)
+                with self._registry_lock:
+                    stats["load_time_seconds"] = round(time.perf_counter() - load_start, 3)
+                    stats["loaded_at"] = datetime.now().isoformat()
+                    stats["loaded"] = True
+                self._models[model_name] = model
+                print(f"✅ Modelo de embeddings listo en {stats['load_time_seconds']}s")
+
+        with self._registry_lock:
+            stats["requests"] += 1
+            stats["cold_requests"] += 1
+            stats["wait_time_seconds"] = round(stats["wait_time_seconds"] + time.perf_counter() - wait_start, 3)
+        return model
+
+    def warm_up(self, model_name: str = DEFAULT_EMBEDDING_MODEL, background: bool = True) -> Optional[threading.Thread]:
+        """
+        Precarga el modelo para que la primera consulta no pague la carga
+
+        Args:
+            model_name: Modelo a precargar
+            background: Si True, carga en un hilo daemon y retorna inmediatamente
+
+        Returns:
+            El hilo de warm-up (o None si se cargó de forma síncrona / ya estaba cargado)
+        """
+        if model_name in self._models:
+            return None
+
+        if not background:
+            self.get(model_name)
+            return None
+
+        with self._registry_lock:
+            thread = self._warmup_threads.get(model_name)
+            if thread is not None and thread.is_alive():
+                return thread
+
+            def _warm():
+                try:
+                    self.get(model_name)
+                except Exception as e:
+                    print(f"⚠️ Error en warm-up de embeddings: {e}")
+
+            thread = threading.Thread(target=_warm, name="embeddings-warmup", daemon=True)
+            self._warmup_threads[model_name] = thread
+            thread.start()
+            return thread
+
+    def is_loaded(self, model_name: str = DEFAULT_EMBEDDING_MODEL) -> bool:
+        return model_name in self._models
+
+    def get_statistics(self) -> Dict[str, Dict[str, Any]]:
+        """Métricas de carga por modelo (tiempo de carga, solicitudes, esperas en frío)"""
+        with self._registry_lock:
+            return {name: dict(stats) for name, stats in self._stats.items()}
+
+
+class SharedEmbeddings(Embeddings):
+    """
+    Proxy de embeddings que resuelve el modelo compartido recién en el primer uso
+    Permite construir vector stores sin pagar la carga del modelo en __init__;
+    textos ya vistos se sirven desde el cache de embeddings sin tocar el modelo
+    """
+
+    def __init__(
+        self,
+        model_name: str = DEFAULT_EMBEDDING_MODEL,
+        registry: Optional[EmbeddingModelRegistry] = None,
+        cache: Optional[EmbeddingCache] = None,
+        use_cache: bool = True
+    ):
+        self.model_name = model_name
+        self.registry = registry or _registry
+        self.cache = (cache or get_embedding_cache()) if use_cache else None
+
+    @property
+    def model(self):
+        return self.registry.get(self.model_name)
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        if self.cache is None:
+            return self.model.embed_documents(texts)
+        return self.cache.get_or_compute(texts, self.model_name, self.model.embed_documents)
+
+    def embed_query(self, text: str) -> List[float]:
+        if self.cache is None:
+            return self.model.embed_query(text)
+        return self.cache.get_or_compute(
+            [text], self.model_name, lambda texts: [self.model.embed_query(texts[0])]
+        )[0]
+
+
+# Registro único del proceso
+_registry = EmbeddingModelRegistry()
+
+
+def get_embedding_registry() -> EmbeddingModelRegistry:
+    """Retorna el registro de modelos de embeddings del proceso"""
+    return _registry
+
+
+def get_shared_embeddings(model_name: str = DEFAULT_EMBEDDING_MODEL) -> SharedEmbeddings:
+    """Factory para obtener embeddings compartidos (carga perezosa)"""
+    return SharedEmbeddings(model_name=model_name)
+
+
+def warm_up_embeddings(model_name: str = DEFAULT_EMBEDDING_MODEL, background: bool = True):
+    """Inicia la precarga del modelo de embeddings compartido"""
+    return _registry.warm_up(model_name, background=background)
@@ -173,6 +173,13 @@ class ExecutionTracker:
             if tool not in self.current_execution["tools_used"]:
                 self.current_execution["tools_used"].append(tool)
     
+    def mark_first_token(self):
+        """Registra el tiempo al primer token de la respuesta (modo streaming)"""
+        if self.current_execution and "time_to_first_token" not in self.current_execution:
+            self.current_execution["time_to_first_token"] = (
+                datetime.now() - self.current_execution["start_time"]
+            ).total_seconds()
+    
     def finish_execution(self, result: str, error: str = None):
         """Finaliza el rastreo de la ejecución actual"""
         if self.current_execution:
@@ -198,11 +205,14 @@ class ExecutionTracker:
         all_tools = []
         total_steps = 0
         total_duration = 0
+        ttfts = []
         
         for execution in self.executions:
             all_tools.extend(execution.get("tools_used", []))
             total_steps += len(execution.get("steps", []))
             total_duration += execution.get("duration", 0)
+            if execution.get("time_to_first_token") is not None:
+                ttfts.append(execution["time_to_first_token"])
         
         # Contar herramientas más usadas
         tool_counts = {}
@@ -215,6 +225,7 @@ class ExecutionTracker:
             "success_rate": (successful / total_executions * 100),
             "avg_steps": total_steps / total_executions,
             "avg_duration": total_duration / total_executions,
+            "avg_time_to_first_token": sum(ttfts) / len(ttfts) if ttfts else None,
             "most_used_tools": sorted(
                 tool_counts.items(),
                 key=lambda x: x[1],
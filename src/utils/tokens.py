@@ -0,0 +1,88 @@
+"""
+Conteo de tokens con tiktoken
+Si el encoding no está disponible (ej: sin red para descargarlo) se usa una estimación por caracteres
+"""
+
+import math
+import threading
+from functools import lru_cache
+from typing import Optional
+
+# Aproximación usada por OpenAI para texto en español/inglés cuando no hay tokenizer
+CHARS_PER_TOKEN = 4
+
+# Ventana de contexto (prompt + respuesta) por prefijo de modelo
+MODEL_CONTEXT_WINDOWS = {
+    "gpt-3.5-turbo": 16385,
+    "gpt-4": 8192,
+    "gpt-4-32k": 32768,
+    "gpt-4-turbo": 128000,
+    "gpt-4o": 128000,
+    "gpt-4.1": 1047576
+}
+DEFAULT_CONTEXT_WINDOW = 4096
+
+
+class TokenCounter:
+    """Cuenta y recorta texto en tokens del modelo"""
+
+    def __init__(self, model_name: str = "gpt-3.5-turbo"):
+        self.model_name = model_name
+        self.encoding = None
+        self.exact = False
+
+        try:
+            import tiktoken
+            try:
+                self.encoding = tiktoken.encoding_for_model(model_name)
+            except KeyError:
+                self.encoding = tiktoken.get_encoding("cl100k_base")
+            self.exact = True
+        except Exception as e:
+            print(f"⚠️ tiktoken no disponible ({type(e).__name__}); se estimarán tokens por caracteres")
+
+        # Los mismos textos (prompt de sistema, turnos ya vistos) se cuentan muchas veces
+        self._count_cached = lru_cache(maxsize=4096)(self._count)
+
+    def _count(self, text: str) -> int:
+        if self.encoding is not None:
+            return len(self.encoding.encode(text, disallowed_special=()))
+        return math.ceil(len(text) / CHARS_PER_TOKEN)
+
+    def count(self, text: Optional[str]) -> int:
+        if not text:
+            return 0
+        return self._count_cached(text)
+
+    def truncate(self, text: str, max_tokens: int, suffix: str = "...") -> str:
+        """Recorta text a max_tokens (incluyendo el sufijo)"""
+        if max_tokens <= 0:
+            return ""
+        if self.count(text) <= max_tokens:
+            return text
+
+        budget = max(0, max_tokens - self.count(suffix))
+        if self.encoding is not None:
+            tokens = self.encoding.encode(text, disallowed_special=())
+            return self.encoding.decode(tokens[:budget]) + suffix
+        return text[:budget * CHARS_PER_TOKEN] + suffix
+
+
+def get_context_window(model_name: str) -> int:
+    """Ventana de contexto del modelo (el prefijo conocido más largo; DEFAULT_CONTEXT_WINDOW si no se conoce)"""
+    matches = [prefix for prefix in MODEL_CONTEXT_WINDOWS if model_name.startswith(prefix)]
+    if not matches:
+        return DEFAULT_CONTEXT_WINDOW
+    return MODEL_CONTEXT_WINDOWS[max(matches, key=len)]
+
+
+_counters = {}
+_counters_lock = threading.Lock()
+
+
+def get_token_counter(model_name: str = "gpt-3.5-turbo") -> TokenCounter:
+    """Contador compartido por modelo (cargar el encoding es costoso)"""
+    with _counters_lock:
+        if model_name not in _counters:
+            _counters[model_name] = TokenCounter(model_name)
+        return _counters[model_name]
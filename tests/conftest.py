@@ -0,0 +1,8 @@
+"""
+Configuración de pytest: permite importar el paquete src desde la raíz del repositorio
+"""
+
+import os
+import sys
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
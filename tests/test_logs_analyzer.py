@@ -0,0 +1,130 @@
+"""
+Tests del análisis incremental de logs (src/monitoring/logs_analyzer.py)
+Lectura por offsets, líneas a medio escribir, truncado/rotación y recarga del checkpoint
+"""
+
+import os
+
+import pytest
+
+from src.monitoring.logs_analyzer import STATE_FILE_NAME, LogsAnalyzer
+
+QUERY = "2026-10-16 10:00:00 | INFO | QUERY | User: u | Query: producto torta"
+ERROR = "2026-10-16 10:05:00 | ERROR | ERROR | ValueError boom | Context: None"
+METRICS = '2026-10-16 10:06:00 | INFO | METRICS | {"execution_time": 6.5}'
+
+
+@pytest.fixture
+def log_dir(tmp_path):
+    return tmp_path / "logs"
+
+
+def _write(path, *lines, mode="a"):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with open(path, mode, encoding="utf-8") as f:
+        f.write("".join(line + "\n" for line in lines))
+
+
+# ============= LECTURA INCREMENTAL =============
+
+def test_refresh_reads_only_new_lines(log_dir):
+    log_file = log_dir / "agent.log"
+    _write(log_file, QUERY, ERROR)
+    analyzer = LogsAnalyzer(str(log_dir))
+    assert analyzer.total_entries == 2
+
+    assert analyzer.refresh() == 0
+    _write(log_file, METRICS, QUERY)
+    assert analyzer.refresh() == 2
+
+    assert analyzer.total_entries == 4
+    assert analyzer.total_queries == 2
+    assert analyzer.get_errors_summary()["error_types"] == {"ValueError": 1}
+    assert analyzer.count_slow_operations(5000) == 1
+    assert analyzer.offsets["agent.log"]["offset"] == log_file.stat().st_size
+
+
+def test_partial_trailing_line_waits_for_newline(log_dir):
+    log_file = log_dir / "agent.log"
+    _write(log_file, QUERY)
+    with open(log_file, "a", encoding="utf-8") as f:
+        f.write("2026-10-16 10:07:00 | ERROR | ERROR | KeyError par")
+    analyzer = LogsAnalyzer(str(log_dir))
+
+    assert analyzer.total_entries == 1
+    assert analyzer.error_types == {}
+
+    with open(log_file, "a", encoding="utf-8") as f:
+        f.write("cial | Context: None\n")
+    assert analyzer.refresh() == 1
+    assert analyzer.error_types == {"KeyError": 1}
+    assert analyzer.logs[-1]["message"].endswith("KeyError parcial | Context: None")
+
+
+# ============= TRUNCADO Y ROTACIÓN =============
+
+def test_truncated_file_is_read_from_start(log_dir):
+    log_file = log_dir / "agent.log"
+    _write(log_file, QUERY, QUERY, QUERY)
+    analyzer = LogsAnalyzer(str(log_dir))
+    assert analyzer.total_queries == 3
+
+    _write(log_file, ERROR, mode="w")
+    assert analyzer.refresh() == 1
+    assert analyzer.error_types == {"ValueError": 1}
+    assert analyzer.total_entries == 4
+
+
+def test_rotated_file_is_read_from_start(log_dir):
+    log_file = log_dir / "agent.log"
+    _write(log_file, QUERY)
+    analyzer = LogsAnalyzer(str(log_dir))
+
+    # Rotación: el archivo se renombra y se crea otro con el mismo nombre (otro inode), más largo que el offset
+    rotated = log_dir / "agent.log.1"
+    os.rename(log_file, rotated)
+    _write(log_file, ERROR, METRICS, QUERY)
+    assert log_file.stat().st_size > analyzer.offsets["agent.log"]["offset"]
+
+    assert analyzer.refresh() == 3
+    assert analyzer.total_entries == 4
+    assert analyzer.total_queries == 2
+
+
+def test_deleted_file_drops_its_offset(log_dir):
+    _write(log_dir / "agent.log", QUERY)
+    _write(log_dir / "old.log", QUERY)
+    analyzer = LogsAnalyzer(str(log_dir))
+
+    os.remove(log_dir / "old.log")
+    _write(log_dir / "agent.log", ERROR)
+    analyzer.refresh()
+    assert set(analyzer.offsets) == {"agent.log"}
+
+
+# ============= CHECKPOINT =============
+
+def test_checkpoint_reload_does_not_double_count(log_dir):
+    log_file = log_dir / "agent.log"
+    _write(log_file, QUERY, ERROR, METRICS)
+    first = LogsAnalyzer(str(log_dir))
+    assert (log_dir / STATE_FILE_NAME).exists()
+
+    second = LogsAnalyzer(str(log_dir))
+    assert second.total_entries == 3
+    assert second.get_errors_summary() == first.get_errors_summary()
+    assert second.identify_patterns() == first.identify_patterns()
+    assert second.count_slow_operations(5000) == 1
+
+    _write(log_file, QUERY)
+    assert second.refresh() == 1
+    third = LogsAnalyzer(str(log_dir))
+    assert third.total_entries == 4
+    assert third.total_queries == 2
+
+
+def test_without_state_file_nothing_is_persisted(log_dir):
+    _write(log_dir / "agent.log", QUERY)
+    analyzer = LogsAnalyzer(str(log_dir), state_file=None)
+    assert analyzer.total_entries == 1
+    assert not (log_dir / STATE_FILE_NAME).exists()
@@ -0,0 +1,205 @@
+"""
+Tests de los sketches de cuantiles (src/monitoring/quantiles.py)
+Error relativo contra numpy, fusión entre sketches, ventanas por tiempo y latencias de herramientas
+"""
+
+import random
+
+import numpy as np
+import pytest
+
+from src.monitoring.metrics import ObservabilityMetrics
+from src.monitoring.quantiles import (
+    DEFAULT_QUANTILES,
+    QuantileSketch,
+    SketchRegistry,
+    WindowedSketch,
+)
+from src.monitoring.resource_sampler import ResourceSampler
+
+ALPHA = 0.01
+NOW = 1_700_000_000.0
+
+
+@pytest.fixture
+def latencias():
+    rng = random.Random(7)
+    return [rng.lognormvariate(6, 1) for _ in range(50_000)]
+
+
+def _relative_error(estimate, expected):
+    return abs(estimate - expected) / expected
+
+
+# ============= PRECISIÓN =============
+
+@pytest.mark.parametrize("q", DEFAULT_QUANTILES)
+def test_quantile_within_relative_accuracy(latencias, q):
+    sketch = QuantileSketch(ALPHA)
+    for value in latencias:
+        sketch.add(value)
+
+    expected = np.quantile(latencias, q, method="lower")
+    assert _relative_error(sketch.quantile(q), expected) <= ALPHA + 1e-9
+
+
+def test_summary_matches_exact_stats(latencias):
+    sketch = QuantileSketch(ALPHA)
+    for value in latencias:
+        sketch.add(value)
+
+    summary = sketch.summary(digits=6)
+    assert summary["count"] == len(latencias)
+    assert summary["min"] == pytest.approx(min(latencias), rel=1e-6)
+    assert summary["max"] == pytest.approx(max(latencias), rel=1e-6)
+    assert summary["avg"] == pytest.approx(np.mean(latencias), rel=1e-6)
+
+
+def test_zeros_are_counted_without_buckets():
+    sketch = QuantileSketch(ALPHA)
+    for value in [0.0] * 90 + [100.0] * 10:
+        sketch.add(value)
+
+    assert sketch.zero_count == 90
+    assert sketch.quantile(0.5) == 0.0
+    assert _relative_error(sketch.quantile(0.95), 100.0) <= ALPHA
+
+
+def test_collapse_keeps_high_quantiles_accurate(latencias):
+    sketch = QuantileSketch(ALPHA, max_buckets=64)
+    for value in latencias:
+        sketch.add(value)
+
+    assert len(sketch.buckets) <= 64
+    for q in (0.99, 0.999):
+        expected = np.quantile(latencias, q, method="lower")
+        assert _relative_error(sketch.quantile(q), expected) <= ALPHA + 1e-9
+
+
+# ============= FUSIÓN =============
+
+def test_merge_equals_single_sketch(latencias):
+    single, left, right = QuantileSketch(ALPHA), QuantileSketch(ALPHA), QuantileSketch(ALPHA)
+    for i, value in enumerate(latencias):
+        single.add(value)
+        (left if i % 3 else right).add(value)
+
+    merged = left.merge(right)
+    assert merged.buckets == single.buckets
+    assert merged.count == single.count
+    assert merged.min == single.min and merged.max == single.max
+    for q in DEFAULT_QUANTILES:
+        assert merged.quantile(q) == single.quantile(q)
+
+
+def test_merge_rejects_different_accuracy():
+    with pytest.raises(ValueError):
+        QuantileSketch(0.01).merge(QuantileSketch(0.02))
+
+
+def test_serialization_round_trip(latencias):
+    sketch = QuantileSketch(ALPHA)
+    for value in latencias[:1000]:
+        sketch.add(value)
+
+    restored = QuantileSketch.from_dict(sketch.to_dict())
+    assert restored.summary() == sketch.summary()
+
+
+def test_registry_merge_combines_processes():
+    a, b = SketchRegistry(), SketchRegistry()
+    for i in range(100):
+        a.add("latency_ms", 10.0, "tool:search_products", timestamp=NOW)
+        b.add("latency_ms", 1000.0, "tool:search_products", timestamp=NOW)
+    b.add("latency_ms", 5.0, "tool:check_inventory", timestamp=NOW)
+
+    a.merge(b)
+    merged = a.get("latency_ms", "tool:search_products").total
+    assert merged.count == 200
+    assert _relative_error(merged.quantile(0.99), 1000.0) <= ALPHA
+    assert a.labels("latency_ms", "tool:") == ["tool:check_inventory", "tool:search_products"]
+
+
+# ============= VENTANAS =============
+
+def test_windows_only_include_recent_values():
+    sketch = WindowedSketch(ALPHA)
+    # Un valor por segundo durante 2 horas; el valor es la antigüedad en segundos
+    for age in range(7200, 0, -1):
+        sketch.add(float(age), timestamp=NOW - age)
+
+    one_minute = sketch.window(60, now=NOW)
+    one_hour = sketch.window(3600, now=NOW)
+    # Granularidad de 10s (1m) y 60s (5m/1h): la ventana incluye el intervalo en curso
+    assert 50 <= one_minute.count <= 60
+    assert one_minute.max <= 60
+    assert 3540 <= one_hour.count <= 3600
+    assert one_hour.max <= 3600
+    assert sketch.total.count == 7200
+
+
+def test_windows_discard_expired_slots():
+    sketch = WindowedSketch(ALPHA)
+    for age in range(7200, 0, -1):
+        sketch.add(1.0, timestamp=NOW - age)
+
+    assert len(sketch._fine) <= 60 // WindowedSketch.FINE_SECONDS
+    assert len(sketch._coarse) <= 3600 // WindowedSketch.COARSE_SECONDS
+
+
+def test_windowed_merge_keeps_time_slots():
+    old, recent = WindowedSketch(ALPHA), WindowedSketch(ALPHA)
+    for i in range(100):
+        old.add(500.0, timestamp=NOW - 1800)
+        recent.add(5.0, timestamp=NOW - 5)
+
+    old.merge(recent)
+    assert old.total.count == 200
+    assert old.window(60, now=NOW).count == 100
+    assert _relative_error(old.window(60, now=NOW).quantile(0.99), 5.0) <= ALPHA
+    assert old.window(3600, now=NOW).count == 200
+
+
+# ============= MÉTRICAS DE HERRAMIENTAS =============
+
+def test_tool_latency_recorded_and_reloaded(tmp_path):
+    metrics_file = str(tmp_path / "metrics.json")
+    metrics = ObservabilityMetrics(metrics_file, track_embedding_cache=False, snapshot_every=50,
+                                   resource_sampler=ResourceSampler())
+    rng = random.Random(3)
+    samples = [rng.uniform(0.001, 0.5) for _ in range(120)]
+    for seconds in samples:
+        metrics.record_tool_latency("search_products", seconds)
+    metrics.close()
+
+    current = ObservabilityMetrics.read_current(metrics_file)
+    stats = current["latency_percentiles"]["by_tool"]["search_products"]
+    assert stats["calls"] == len(samples)
+    expected_p99 = np.quantile([s * 1000 for s in samples], 0.99, method="lower")
+    # Los ms se redondean a 2 decimales al registrar y al resumir
+    assert _relative_error(stats["p99_ms"], expected_p99) <= ALPHA + 1e-3
+    assert stats["windows"]["1h"]["count"] == len(samples)
+
+
+def test_tools_record_latency_in_the_given_sink():
+    from src.agent.tools import initialize_tools
+    from src.data_loader import PasteleriaDataLoader
+    from src.discount_calculator import DiscountCalculator
+    from src.monitoring import metrics as metrics_module
+
+    class Sink:
+        def __init__(self):
+            self.calls = []
+
+        def record_tool_latency(self, tool_name, seconds):
+            self.calls.append((tool_name, seconds))
+
+    sink = Sink()
+    tools = {tool.name: tool for tool in initialize_tools(PasteleriaDataLoader(), DiscountCalculator(), metrics=sink)}
+    tools["search_products"].run({"query": "torta chocolate"})
+    tools["search_products"].run({"query": "torta chocolate"})  # acierto de cache: también se mide
+
+    assert [name for name, _ in sink.calls] == ["search_products", "search_products"]
+    assert all(seconds >= 0 for _, seconds in sink.calls)
+    # Las herramientas no crean las métricas globales del proceso
+    assert metrics_module._metrics is None